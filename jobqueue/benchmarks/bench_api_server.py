@@ -0,0 +1,118 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+# Configuration constants
+N_REQUESTS = 10000
+CONCURRENCY = 64
+NUM_WORKERS = 2
+API_PROCESSES = max(2, os.cpu_count() or 1)
+MODES = ["flask", "async", "async-multi"]
+
+BODY = json.dumps({"task": "sum", "payload": {"numbers": [1, 2, 3]}}).encode()
+REQUEST = (b"POST /jobs HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+           b"Content-Length: " + str(len(BODY)).encode() + b"\r\n\r\n" + BODY)
+
+def serve(mode, port):
+    """Run one API mode with workers, as main.py would, until killed."""
+    from job_store import JobStore
+    from job_queue import JobQueue
+    from tasks import TASKS
+    from worker import Worker
+    from api import app, init_api
+    from async_api import AsyncApiServer, serve_store, start_api_processes
+    from metrics import REGISTRY
+
+    logging.disable(logging.INFO)
+    job_store = JobStore()
+    job_queue = JobQueue()
+    init_api(job_store, job_queue)
+    for _ in range(NUM_WORKERS):
+        Worker(job_queue, job_store, TASKS).start()
+
+    if mode == "flask":
+        # The development server main.py runs, minus the reloader.
+        app.run(port=port, threaded=True, use_reloader=False)
+    elif mode == "async":
+        AsyncApiServer("127.0.0.1", port).serve_forever()
+    else:
+        authkey = os.urandom(32)
+        store_port = port + 1
+        serve_store(job_store, job_queue, REGISTRY, ("127.0.0.1", store_port), authkey)
+        for process in start_api_processes(API_PROCESSES, "127.0.0.1", port, ("127.0.0.1", store_port), authkey):
+            process.join()
+
+async def client(port, count, latencies):
+    reader = writer = None
+    for _ in range(count):
+        if writer is None:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        start = time.perf_counter()
+        writer.write(REQUEST)
+        head = await reader.readuntil(b"\r\n\r\n")
+        headers = head.decode("latin-1").lower()
+        length = int(headers.split("content-length:")[1].split("\r\n")[0])
+        await reader.readexactly(length)
+        latencies.append(time.perf_counter() - start)
+        if not head.startswith(b"HTTP/1.1 201"):
+            raise RuntimeError(head.decode("latin-1"))
+        if "connection: close" in headers or head.startswith(b"HTTP/1.0"):
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+async def load(port):
+    latencies = []
+    per_client = N_REQUESTS // CONCURRENCY
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, per_client, latencies) for _ in range(CONCURRENCY)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99) - 1]
+
+def wait_for_port(port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def main():
+    print(f"{N_REQUESTS} POST /jobs requests, {CONCURRENCY} concurrent connections, "
+          f"{os.cpu_count()} cores, {API_PROCESSES} processes in async-multi")
+    print(f"{'mode':<12} {'req/s':>8} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for mode in MODES:
+        port = free_port()
+        server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "serve", mode, str(port)],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_port(port)
+            time.sleep(0.5)
+            rate, p50, p99 = asyncio.run(load(port))
+            print(f"{mode:<12} {rate:>8.0f} {p50 * 1000:>9.1f} {p99 * 1000:>9.1f}")
+        finally:
+            server.kill()
+            server.wait()
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "serve":
+        serve(sys.argv[2], int(sys.argv[3]))
+    else:
+        main()
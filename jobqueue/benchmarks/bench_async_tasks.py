@@ -0,0 +1,67 @@
+import gc
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from executors import get_event_loop_runner
+from job_queue import JobQueue
+from job_store import JobStore
+from tasks import TASKS
+from worker import Worker
+
+# Configuration constants
+N_ASYNC_JOBS = 10_000
+N_SYNC_JOBS = 20
+SLEEP_SECONDS = 1.0
+SYNC_SLEEP_SECONDS = 0.1
+
+def run_on_one_worker(task_name, count, seconds):
+    """Submit count sleep jobs to a single worker; return (wall seconds, peak jobs in flight, peak threads)."""
+    job_store = JobStore()
+    job_queue = JobQueue()
+    job_ids = [job_id for job_id, _, _ in job_store.create_jobs(
+        [{"task_name": task_name, "payload": {"seconds": seconds}} for _ in range(count)])]
+    worker = Worker(job_queue, job_store, TASKS)
+    worker.start()
+
+    peak = [0, threading.active_count()]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(0.05):
+            peak[0] = max(peak[0], job_store.count_jobs()["running"])
+            peak[1] = max(peak[1], threading.active_count())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    job_queue.enqueue_many((job_id, 0, None, None, task_name) for job_id in job_ids)
+    for job_id in job_ids:
+        job_store.wait_for_job(job_id, 60)
+    elapsed = time.perf_counter() - start
+    done.set()
+    sampler.join()
+
+    assert all(job_store.get_job(job_id)["status"] == "success" for job_id in job_ids)
+    worker.stop()
+    worker.join(timeout=2)
+    return elapsed, peak[0], peak[1]
+
+def main():
+    gc.disable()
+    logging.disable(logging.INFO)
+    get_event_loop_runner()
+    print(f"{'scenario':<48} {'wall':>8} {'jobs/sec':>10} {'peak running':>13} {'threads':>8}")
+    for label, task_name, count, seconds in [
+        (f"{N_SYNC_JOBS} x {SYNC_SLEEP_SECONDS}s sleep, 1 worker", "sleep", N_SYNC_JOBS, SYNC_SLEEP_SECONDS),
+        (f"{N_ASYNC_JOBS:,} x {SLEEP_SECONDS}s async_sleep, 1 worker", "async_sleep", N_ASYNC_JOBS, SLEEP_SECONDS),
+    ]:
+        elapsed, peak, threads = run_on_one_worker(task_name, count, seconds)
+        print(f"{label:<48} {elapsed:>7.2f}s {count / elapsed:>10,.0f} {peak:>13,} {threads:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from job_store import JobStore
+from job_queue import JobQueue
+from tasks import TASKS
+from worker import Worker
+from worker_pool import ScalingPolicy, WorkerPool
+
+# Configuration constants
+JOB_SECONDS = 0.05
+# (seconds, jobs submitted per second): quiet, a billing spike, quiet again.
+PHASES = [(3, 10), (4, 150), (6, 10)]
+FIXED_WORKERS = 2
+MAX_WORKERS = 16
+SCALE_INTERVAL_SECONDS = 0.25
+
+def submit_load(job_store, job_queue):
+    job_ids = []
+    for seconds, rate in PHASES:
+        phase_end = time.perf_counter() + seconds
+        while time.perf_counter() < phase_end:
+            tick = time.perf_counter()
+            for _ in range(max(1, rate // 10)):
+                job_id = job_store.create_job("sleep", {"seconds": JOB_SECONDS})
+                job_queue.enqueue(job_id)
+                job_ids.append(job_id)
+            time.sleep(max(0, 0.1 - (time.perf_counter() - tick)))
+    return job_ids
+
+def run(min_workers, max_workers):
+    job_store = JobStore()
+    job_queue = JobQueue()
+    policy = ScalingPolicy(min_workers, max_workers, down_samples=8)
+    pool = WorkerPool(lambda: Worker(job_queue, job_store, TASKS), job_queue, min_workers, max_workers,
+                      policy, interval=SCALE_INTERVAL_SECONDS)
+    pool.start()
+
+    sizes = []
+    sampling = threading.Event()
+
+    def sample_size():
+        while not sampling.wait(0.1):
+            sizes.append(pool.size())
+
+    sampler = threading.Thread(target=sample_size)
+    sampler.start()
+    job_ids = submit_load(job_store, job_queue)
+    jobs = [job_store.wait_for_job(job_id, 60) for job_id in job_ids]
+    sampling.set()
+    sampler.join()
+    final_size = pool.size()
+    pool.stop()
+
+    latencies = sorted(job["updated_at"] - job["created_at"] for job in jobs)
+    p95 = latencies[int(len(latencies) * 0.95)]
+    return statistics.median(latencies), p95, max(sizes), statistics.mean(sizes), final_size
+
+def main():
+    logging.disable(logging.WARNING)
+    total = sum(seconds * rate for seconds, rate in PHASES)
+    print(f"~{total} sleep jobs of {JOB_SECONDS}s, load phases (seconds, jobs/sec): {PHASES}")
+    print(f"{'pool':>14} {'p50 latency':>12} {'p95 latency':>12} {'peak':>5} {'mean size':>10} {'final':>6}")
+    for label, min_workers, max_workers in [("fixed", FIXED_WORKERS, FIXED_WORKERS),
+                                            ("autoscaled", FIXED_WORKERS, MAX_WORKERS)]:
+        p50, p95, peak, mean_size, final_size = run(min_workers, max_workers)
+        print(f"{label:>14} {p50 * 1000:>10.0f}ms {p95 * 1000:>10.0f}ms {peak:>5} {mean_size:>10.1f} {final_size:>6}")
+
+if __name__ == "__main__":
+    main()
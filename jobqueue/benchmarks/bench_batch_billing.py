@@ -0,0 +1,99 @@
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from job_store import JobStore
+from job_queue import JobQueue
+from tasks import TASKS, generate_monthly_bill, generate_monthly_bills
+from worker import Worker
+from executors import shutdown_executors
+
+random.seed(42)
+
+# Configuration constants
+N_JOBS = 20000
+MAX_PURCHASES_PER_BILL = 10
+BATCH_SIZE = 64
+NUM_WORKERS = os.cpu_count() or 1
+DEADLINE = 300  # seconds
+
+def generate_billing_payload(user_id):
+    return {
+        "user_id": user_id,
+        "billing_period": "2026-01",
+        "subscription_plan": "prime",
+        "base_price": 14.99,
+        "purchases": [
+            {"item_id": f"item_{i}", "price": round(random.uniform(2.99, 9.99), 2)}
+            for i in range(random.randint(0, MAX_PURCHASES_PER_BILL))
+        ]
+    }
+
+def function_throughput(payloads, batch_size):
+    start = time.perf_counter()
+    if batch_size is None:
+        for payload in payloads:
+            generate_monthly_bill(payload)
+    else:
+        for offset in range(0, len(payloads), batch_size):
+            generate_monthly_bills(payloads[offset:offset + batch_size])
+    return len(payloads) / (time.perf_counter() - start)
+
+def worker_throughput(payloads, options):
+    job_store = JobStore()
+    job_queue = JobQueue()
+    task_options = {"generate_monthly_bill": options}
+
+    workers = [Worker(job_queue, job_store, TASKS, task_options) for _ in range(NUM_WORKERS)]
+    for worker in workers:
+        worker.daemon = True
+        worker.start()
+
+    start = time.perf_counter()
+    results = job_store.create_jobs([
+        {"task_name": "generate_monthly_bill", "payload": payload} for payload in payloads
+    ])
+    job_ids = [job_id for job_id, _, _ in results]
+    job_queue.enqueue_many((job_id, 0, None, None, "generate_monthly_bill") for job_id in job_ids)
+
+    while time.perf_counter() - start < DEADLINE:
+        if all(job_store.get_job(job_id)["status"] in ("success", "failed") for job_id in job_ids):
+            break
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+
+    for worker in workers:
+        worker.stop()
+    return len(job_ids) / elapsed
+
+def main():
+    print(f"Generating {N_JOBS} bills with up to {MAX_PURCHASES_PER_BILL} purchases each...")
+    payloads = [generate_billing_payload(f"user_{i}") for i in range(N_JOBS)]
+
+    single_fn = function_throughput(payloads, None)
+    batch_fn = function_throughput(payloads, BATCH_SIZE)
+
+    print(f"Running workers: {NUM_WORKERS} on {os.cpu_count()} cores")
+    batch_options = {"batch": generate_monthly_bills, "batch_size": BATCH_SIZE}
+    rows = [
+        ("thread, one job per call", worker_throughput(payloads, {})),
+        (f"thread, batches of {BATCH_SIZE}", worker_throughput(payloads, batch_options)),
+        ("process, one job per call", worker_throughput(payloads, {"executor": "process"})),
+        (f"process, batches of {BATCH_SIZE}", worker_throughput(payloads, dict(batch_options, executor="process")))
+    ]
+    shutdown_executors()
+
+    print("\n" + "=" * 60)
+    print("BATCH BILLING BENCHMARK")
+    print("=" * 60)
+    print(f"Function only, single:   {single_fn:>10.0f} bills/sec")
+    print(f"Function only, batched:  {batch_fn:>10.0f} bills/sec")
+    for label, rate in rows:
+        print(f"{label + ':':<32} {rate:>10.0f} jobs/sec")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from job_store import JobStore
+
+# Configuration constants
+N_PARENTS = 100_000
+N_CHILDREN = 100_000
+
+def finish_all(job_store, job_ids):
+    start = time.perf_counter()
+    for job_id in job_ids:
+        job_store.update_job_status(job_id, "success", result="ok")
+    return (time.perf_counter() - start) / len(job_ids) * 1e6
+
+def naive_check(job_store, parents):
+    """What releasing without counts costs: re-read every parent's status after each completion."""
+    start = time.perf_counter()
+    all(job_store.get_job(parent)["status"] == "success" for parent in parents)
+    return time.perf_counter() - start
+
+def fan_in():
+    job_store = JobStore()
+    released = []
+    job_store.set_ready_callback(released.extend)
+    parents = [job_store.create_job("generate_monthly_bill", {"user_id": f"user_{i}"}) for i in range(N_PARENTS)]
+
+    start = time.perf_counter()
+    child = job_store.create_job("sum", {"numbers": [1]}, depends_on=parents)
+    created = time.perf_counter() - start
+
+    plain_store = JobStore()
+    plain = [plain_store.create_job("generate_monthly_bill", {"user_id": f"user_{i}"}) for i in range(N_PARENTS)]
+    without = finish_all(plain_store, plain)
+    with_child = finish_all(job_store, parents)
+    assert released == [(child, 0, None, None, "sum")]
+
+    print(f"fan-in: one job depending on {N_PARENTS:,} parents")
+    print(f"  create the child:                       {created * 1e3:>9.1f} ms")
+    print(f"  finish a parent, no dependents:         {without:>9.2f} us")
+    print(f"  finish a parent of the fan-in child:    {with_child:>9.2f} us")
+    print(f"  naive release check per completion:     {naive_check(job_store, parents) * 1e3:>9.1f} ms")
+
+def fan_out():
+    job_store = JobStore()
+    released = []
+    job_store.set_ready_callback(released.extend)
+    parent = job_store.create_job("sum", {"numbers": [1]})
+    specs = [{"task_name": "generate_monthly_bill", "payload": {"user_id": f"user_{i}"}, "depends_on": [parent]}
+             for i in range(N_CHILDREN)]
+    job_store.create_jobs(specs)
+
+    start = time.perf_counter()
+    job_store.update_job_status(parent, "success", result="ok")
+    elapsed = time.perf_counter() - start
+    assert len(released) == N_CHILDREN
+    print(f"fan-out: {N_CHILDREN:,} jobs depending on one parent")
+    print(f"  finish the parent, release every child: {elapsed * 1e3:>9.1f} ms "
+          f"({elapsed / N_CHILDREN * 1e6:.2f} us/child)")
+
+def main():
+    gc.disable()
+    fan_in()
+    fan_out()
+
+if __name__ == "__main__":
+    main()
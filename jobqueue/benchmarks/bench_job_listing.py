@@ -0,0 +1,99 @@
+import gc
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from job_store import JobStore
+
+# Configuration constants
+N_JOBS = 1_000_000
+BILL_SHARE = 0.1
+FAILED_BILL_SHARE = 0.01
+PAGE_SIZE = 100
+REPEATS = 5
+# created_after is set so this many of the newest jobs match.
+RECENT_JOBS = 1000
+
+def populate():
+    """N_JOBS finished jobs: mostly sums, some bills, and a few failed bills spread through."""
+    random.seed(1)
+    job_store = JobStore()
+    failed_bills = []
+    recent = None
+    start = time.perf_counter()
+    for i in range(N_JOBS):
+        if i == N_JOBS - RECENT_JOBS:
+            recent = time.time()
+        is_bill = random.random() < BILL_SHARE
+        job_id = job_store.create_job("generate_monthly_bill" if is_bill else "sum", {"n": i})
+        job_store.start_job(job_id)
+        if is_bill and random.random() < FAILED_BILL_SHARE:
+            job_store.update_job_status(job_id, "failed", error="missing prices")
+            failed_bills.append(job_id)
+        else:
+            job_store.update_job_status(job_id, "success", result="ok")
+    per_job = (time.perf_counter() - start) / N_JOBS * 1e6
+    return job_store, failed_bills, recent, per_job
+
+def best_of(func):
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1e3
+
+def all_pages(job_store, **filters):
+    jobs, cursor = [], 0
+    while cursor is not None:
+        page, cursor = job_store.list_jobs(cursor=cursor, limit=PAGE_SIZE, **filters)
+        jobs.extend(page)
+    return jobs
+
+def full_scan(job_store, status, task_name):
+    """What listing without an index costs: filter every job, then sort by creation time."""
+    matches = []
+    for shard in job_store._shards:
+        with shard.lock:
+            matches.extend(job for job in shard.jobs.values()
+                           if job.status == status and job.task_name == task_name)
+    matches.sort(key=lambda job: job.seq)
+    return matches[:PAGE_SIZE]
+
+def index_bytes(job_store):
+    """Memory held by the listing index: bucket dicts, their keys, and the outer dicts."""
+    total = 0
+    for shard in job_store._shards:
+        total += sys.getsizeof(shard.index) + sys.getsizeof(shard.status_counts)
+        for key, bucket in shard.index.items():
+            total += sys.getsizeof(key) + sys.getsizeof(bucket)
+    # Creation numbers above 256 are int objects of their own.
+    return total + N_JOBS * sys.getsizeof(N_JOBS)
+
+def main():
+    gc.disable()
+    job_store, failed_bills, recent, per_job = populate()
+    gc.enable()
+    print(f"{N_JOBS:,} jobs, {len(failed_bills):,} failed generate_monthly_bill jobs")
+    print(f"create + start + finish, index maintained: {per_job:.2f} us/job")
+    print(f"index memory: {index_bytes(job_store) / N_JOBS:.0f} bytes/job")
+
+    filters = {"status": "failed", "task_name": "generate_monthly_bill"}
+    assert [job["job_id"] for job in all_pages(job_store, **filters)] == failed_bills
+
+    rows = [
+        ("first page, failed bills (index)", lambda: job_store.list_jobs(limit=PAGE_SIZE, **filters)),
+        ("first page, failed bills (full scan)", lambda: full_scan(job_store, "failed", "generate_monthly_bill")),
+        (f"all {len(failed_bills):,} failed bills, paged", lambda: all_pages(job_store, **filters)),
+        ("first page, all jobs", lambda: job_store.list_jobs(limit=PAGE_SIZE)),
+        (f"first page, created in the last {RECENT_JOBS:,}", lambda: job_store.list_jobs(created_after=recent, limit=PAGE_SIZE)),
+        ("counts per status for one task", lambda: job_store.count_jobs("generate_monthly_bill")),
+    ]
+    for label, func in rows:
+        print(f"{label:<42} {best_of(func):>9.2f} ms")
+
+if __name__ == "__main__":
+    main()
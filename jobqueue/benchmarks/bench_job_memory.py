@@ -0,0 +1,92 @@
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from job_store import JobStore
+from job_archive import JobArchive
+
+# Configuration constants
+N_JOBS = 1_000_000
+BATCH_SIZE = 1000
+MAX_RETAINED_JOBS = 100_000
+
+PAYLOAD = {"user_id": "user_0", "billing_period": "2026-01"}
+RESULT = {"total_charge": 18.98}
+
+def dict_job(task_name):
+    """A job as the store kept it before JobRecord: a dict with datetime timestamps."""
+    now = datetime.now()
+    return {
+        "job_id": str(uuid.uuid4()),
+        "task_name": task_name,
+        "payload": PAYLOAD,
+        "status": "pending",
+        "attempts": 0,
+        "max_retries": 3,
+        "result": None,
+        "error": None,
+        "timeout": None,
+        "priority": 0,
+        "tenant": None,
+        "run_at": None,
+        "retry_delay": None,
+        "max_retry_delay": None,
+        "created_at": now,
+        "updated_at": now
+    }
+
+def measure(build):
+    """Bytes per job still allocated once build() returns, with its result kept alive."""
+    gc.collect()
+    tracemalloc.start()
+    kept = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return size / N_JOBS
+
+def build_dicts():
+    # Task names arrive from JSON, so each job carries its own string.
+    return {job["job_id"]: job for job in (dict_job("generate_monthly_" + "bill") for _ in range(N_JOBS))}
+
+def build_records(job_store):
+    spec = {"task_name": "generate_monthly_" + "bill", "payload": PAYLOAD}
+    for offset in range(0, N_JOBS, BATCH_SIZE):
+        count = min(BATCH_SIZE, N_JOBS - offset)
+        job_store.create_jobs([spec] * count)
+    return job_store
+
+def complete_all(job_store):
+    for shard in job_store._shards:
+        for job_id in list(shard.jobs):
+            job_store.update_job_status(job_id, "success", result=RESULT)
+    return job_store
+
+def main():
+    print(f"Measuring memory for {N_JOBS} jobs (payload shared, so only per-job overhead counts)...")
+    dict_bytes = measure(build_dicts)
+    record_bytes = measure(lambda: build_records(JobStore()))
+
+    tmp_dir = tempfile.mkdtemp()
+    archive = JobArchive(os.path.join(tmp_dir, "archive.db"))
+    job_store = JobStore(archive=archive, max_retained_jobs=MAX_RETAINED_JOBS)
+    retained_bytes = measure(lambda: complete_all(build_records(job_store)))
+    retained_jobs = sum(len(shard.jobs) for shard in job_store._shards)
+    archived_jobs = archive.count()
+    archive.close()
+
+    print(f"{'store':<44} {'bytes/job':>10}")
+    print(f"{'dict + datetime (before)':<44} {dict_bytes:>10.0f}")
+    print(f"{'JobRecord (after)':<44} {record_bytes:>10.0f}")
+    print(f"{'JobRecord, all finished, ' + str(MAX_RETAINED_JOBS) + ' retained':<44} {retained_bytes:>10.0f}")
+    print(f"Retained in memory: {retained_jobs}, archived: {archived_jobs}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import gc
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from job_store import JobStore
+from job_queue import JobQueue
+from leases import Heartbeat, LeaseReaper, LeaseSet, store_renewer
+from tasks import TASKS
+from worker import Worker
+
+# Configuration constants
+N_JOBS = 1_000_000
+LEASE_SECONDS = 1.0
+HEARTBEAT_SECONDS = 0.25
+REAP_INTERVAL_SECONDS = 0.1
+RECOVERY_RUNS = 5
+
+def start_cost(job_store, job_ids, lease_seconds=None):
+    start = time.perf_counter()
+    if lease_seconds is not None:
+        for job_id in job_ids:
+            job_store.start_job(job_id, owner="worker-1", lease_seconds=lease_seconds)
+    else:
+        for job_id in job_ids:
+            job_store.start_job(job_id)
+    return (time.perf_counter() - start) / len(job_ids) * 1e6
+
+def full_scan(job_store):
+    """What a reaper without a deadline index would do: look at every job."""
+    stuck = 0
+    for shard in job_store._shards:
+        with shard.lock:
+            for job in shard.jobs.values():
+                if job.status == "running":
+                    stuck += 1
+    return stuck
+
+def new_store():
+    job_store = JobStore()
+    job_ids = [job_store.create_job("sum", {"numbers": [i]}) for i in range(N_JOBS)]
+    return job_store, job_ids
+
+def reaper_costs():
+    job_store, job_ids = new_store()
+    plain = start_cost(job_store, job_ids)
+    # Leases long enough that none expire during the measurement.
+    leased = start_cost(job_store, job_ids, lease_seconds=3600)
+    print(f"start_job without lease: {plain:>8.2f} us/job")
+    print(f"start_job with lease:    {leased:>8.2f} us/job")
+
+    start = time.perf_counter()
+    job_store.reap_expired_leases()
+    idle_pass = time.perf_counter() - start
+    start = time.perf_counter()
+    full_scan(job_store)
+    scan = time.perf_counter() - start
+    print(f"Reaper pass, {N_JOBS:,} live leases, none expired: {idle_pass * 1e3:>8.3f} ms")
+    print(f"Full scan of {N_JOBS:,} jobs (no deadline index):   {scan * 1e3:>8.3f} ms")
+
+    del job_store, job_ids
+    job_store, job_ids = new_store()
+    start_cost(job_store, job_ids, lease_seconds=0)
+    start = time.perf_counter()
+    reaped = len(job_store.reap_expired_leases())
+    elapsed = time.perf_counter() - start
+    print(f"Reaper pass, {reaped:,} leases expired: {elapsed:.2f} s ({elapsed / reaped * 1e6:.2f} us/job)")
+
+def recovery_latency():
+    """Seconds from a worker thread dying mid-job to another worker finishing the job."""
+
+    class VanishingWorker(Worker):
+        def _process(self, job):
+            self.running = False
+
+    job_store = JobStore()
+    job_queue = JobQueue()
+    leases = LeaseSet()
+    heartbeat = Heartbeat(store_renewer(job_store, LEASE_SECONDS), leases, HEARTBEAT_SECONDS)
+    reaper = LeaseReaper(job_store, job_queue, REAP_INTERVAL_SECONDS)
+    heartbeat.start()
+    reaper.start()
+
+    latencies = []
+    for _ in range(RECOVERY_RUNS):
+        doomed = VanishingWorker(job_queue, job_store, TASKS, leases=leases, lease_seconds=LEASE_SECONDS)
+        doomed.start()
+        job_id = job_store.create_job("sum", {"numbers": [1]})
+        job_queue.enqueue(job_id)
+        doomed.join()
+        died_at = time.perf_counter()
+
+        survivor = Worker(job_queue, job_store, TASKS, leases=leases, lease_seconds=LEASE_SECONDS)
+        survivor.start()
+        job_store.wait_for_job(job_id, 10)
+        latencies.append(time.perf_counter() - died_at)
+        survivor.stop()
+        job_queue.enqueue(job_store.create_job("sum", {"numbers": [0]}))
+        survivor.join()
+
+    heartbeat.stop()
+    reaper.stop()
+    print(f"Recovery after a worker dies (lease {LEASE_SECONDS}s, reaper every {REAP_INTERVAL_SECONDS}s): "
+          f"mean {statistics.mean(latencies):.2f} s, max {max(latencies):.2f} s")
+
+def main():
+    logging.disable(logging.WARNING)
+    gc.disable()
+    reaper_costs()
+    gc.enable()
+    recovery_latency()
+
+if __name__ == "__main__":
+    main()
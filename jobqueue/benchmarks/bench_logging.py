@@ -0,0 +1,110 @@
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from job_queue import JobQueue
+from job_store import JobStore
+from log_pipeline import LOG_DATEFMT, LOG_FORMAT, configure_logging, set_sampling
+from tasks import TASKS
+from worker import Worker
+
+# Configuration constants
+N_JOBS = 10_000
+N_STORM_JOBS = 2_000
+STORM_RETRIES = 5
+PURCHASES = 20
+REPEATS = 3  # the fastest repeat is reported, to filter scheduler noise
+SAMPLING = {"job.started": {"sample": 0.01}, "job.succeeded": {"sample": 0.01}}
+STORM_LIMIT = {"job.retry": {"per_second": 10, "burst": 20}, "job.failed": {"per_second": 10, "burst": 20}}
+# configure_logging turns these off; the sync baseline gets them back.
+LOGGING_DEFAULTS = {name: getattr(logging, name) for name in
+                    ("_srcfile", "logThreads", "logProcesses", "logMultiprocessing")}
+
+def bill_payload(i):
+    return {"user_id": f"user_{i}", "billing_period": "2026-01", "subscription_plan": "prime", "base_price": 14.99,
+            "purchases": [{"item_id": f"movie_{n:03d}", "price": 3.99} for n in range(PURCHASES)]}
+
+def sync_logging(stream):
+    """The previous setup: logging.basicConfig, formatting and writing in the calling thread."""
+    logging.disable(logging.NOTSET)
+    for name, value in LOGGING_DEFAULTS.items():
+        setattr(logging, name, value)
+    set_sampling(None)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT, LOG_DATEFMT))
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    return None
+
+def pipeline(json_format=False, sampling=None):
+    def setup(stream):
+        logging.disable(logging.NOTSET)
+        return configure_logging(logging.INFO, json_format, sampling, stream)
+    return setup
+
+def logging_off(stream):
+    logging.disable(logging.INFO)
+    return None
+
+def run_jobs(setup, task_name, payloads, max_retries):
+    """Run every job on this thread through Worker._process; return (us/job on the worker, us/job until written, lines)."""
+    with tempfile.TemporaryFile("w+") as stream:
+        writer = setup(stream)
+        job_store = JobStore()
+        job_queue = JobQueue()
+        worker = Worker(job_queue, job_store, TASKS, {"fail": {"retry_delay": 0, "max_retry_delay": 0}})
+        job_ids = [job_id for job_id, _, _ in job_store.create_jobs(
+            [{"task_name": task_name, "payload": payload, "max_retries": max_retries} for payload in payloads])]
+        job_queue.enqueue_many((job_id, 0, None, None, task_name) for job_id in job_ids)
+
+        start = time.perf_counter()
+        job_id = job_queue.dequeue_nowait()
+        while job_id is not None:
+            worker._process(job_store.start_job(job_id))
+            job_id = job_queue.dequeue_nowait()
+        on_worker = time.perf_counter() - start
+        if writer is not None:
+            writer.stop()
+        written = time.perf_counter() - start
+
+        stream.seek(0)
+        lines = sum(1 for _ in stream)
+    return on_worker / len(payloads) * 1e6, written / len(payloads) * 1e6, lines
+
+def best_of(setup, task_name, payloads, max_retries=3):
+    runs = [run_jobs(setup, task_name, payloads, max_retries) for _ in range(REPEATS)]
+    return min(run[0] for run in runs), min(run[1] for run in runs), runs[0][2]
+
+def main():
+    payloads = [bill_payload(i) for i in range(N_JOBS)]
+    modes = [
+        ("logging off", logging_off),
+        ("sync StreamHandler (previous)", sync_logging),
+        ("queue + batched writer, text", pipeline()),
+        ("queue + batched writer, JSON", pipeline(json_format=True)),
+        ("queue + batched writer, 1% sampled", pipeline(sampling=SAMPLING)),
+    ]
+    print(f"{N_JOBS:,} generate_monthly_bill jobs on one worker thread, logs to a file")
+    print(f"  {'mode':<38} {'us/job on worker':>17} {'us/job written':>15} {'lines':>8}")
+    for label, setup in modes:
+        on_worker, written, lines = best_of(setup, "generate_monthly_bill", payloads)
+        print(f"  {label:<38} {on_worker:>17.1f} {written:>15.1f} {lines:>8,}")
+
+    storm = [{} for _ in range(N_STORM_JOBS)]
+    print(f"\nRetry storm: {N_STORM_JOBS:,} failing jobs x {STORM_RETRIES} attempts, no backoff")
+    print(f"  {'mode':<38} {'us/attempt':>17} {'lines':>8}")
+    for label, setup in [("sync StreamHandler (previous)", sync_logging),
+                         ("queue + batched writer, rate limited", pipeline(sampling=STORM_LIMIT))]:
+        on_worker, _, lines = best_of(setup, "fail", storm, STORM_RETRIES)
+        print(f"  {label:<38} {on_worker / STORM_RETRIES:>17.1f} {lines:>8,}")
+    logging.disable(logging.INFO)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import metrics
+from job_store import JobStore
+from job_queue import JobQueue
+from tasks import TASKS
+from worker import Worker
+from api import app, init_api
+
+# Configuration constants
+N_JOBS = 20000
+N_REQUESTS = 2000
+REPEATS = 7  # the fastest repeat is reported, to filter scheduler noise
+
+def job_lifecycle_cost(enabled):
+    """Microseconds per job to create, queue, start, run and complete a trivial job.
+
+    Runs on one thread, calling the worker's own processing method, so every
+    instrumented step is exercised and thread scheduling does not add noise.
+    """
+    metrics.set_enabled(enabled)
+    job_store = JobStore()
+    job_queue = JobQueue()
+    worker = Worker(job_queue, job_store, TASKS)
+
+    start = time.perf_counter()
+    for _ in range(N_JOBS):
+        job_id = job_store.create_job("sum", {"numbers": [1]})
+        job_queue.enqueue(job_id)
+        worker._process(job_store.start_job(job_queue.dequeue()))
+        job_store.get_job(job_id)
+    return (time.perf_counter() - start) / N_JOBS * 1e6
+
+def request_cost():
+    """Microseconds per POST /jobs request through Flask, without instrumentation."""
+    metrics.set_enabled(False)
+    init_api(JobStore(), JobQueue())
+    client = app.test_client()
+
+    start = time.perf_counter()
+    for _ in range(N_REQUESTS):
+        client.post("/jobs", json={"task": "sum", "payload": {"numbers": [1]}})
+    return (time.perf_counter() - start) / N_REQUESTS * 1e6
+
+def main():
+    # Job logging would dominate the measurement.
+    logging.disable(logging.INFO)
+
+    # Alternate the two modes so drift in machine load affects both alike.
+    off, on = [], []
+    for _ in range(REPEATS):
+        off.append(job_lifecycle_cost(False))
+        on.append(job_lifecycle_cost(True))
+    off, on = min(off), min(on)
+    request = min(request_cost() for _ in range(REPEATS))
+    metrics.set_enabled(True)
+
+    added = on - off
+    print(f"Job lifecycle, instrumentation off: {off:>8.1f} us/job")
+    print(f"Job lifecycle, instrumentation on:  {on:>8.1f} us/job")
+    print(f"Added by instrumentation:           {added:>8.1f} us/job ({added / off * 100:.1f}% of the bare job path)")
+    print(f"POST /jobs request:                 {request:>8.1f} us/request")
+    print(f"Overhead per job submitted over HTTP: {added / (request + off) * 100:.1f}%")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import gc
+import os
+import pickle
+import sys
+import time
+from functools import partial
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import handlers
+import job_store as job_store_module
+from job_store import JobStore
+from payloads import decode_payload, encode_payload, run_task
+from tasks import generate_monthly_bill
+
+# Configuration constants
+N_JOBS = 20_000
+PURCHASES = 20
+REPEATS = 5
+
+def bill_payload(i):
+    return {
+        "user_id": f"user_{i}",
+        "billing_period": "2026-01",
+        "subscription_plan": "prime",
+        "base_price": 14.99,
+        "purchases": [{"item_id": f"movie_{n:03d}", "price": 3.99} for n in range(PURCHASES)]
+    }
+
+def best_of(func, bodies):
+    """Best per-job time in microseconds over REPEATS passes of func over bodies."""
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func(bodies)
+        times.append(time.perf_counter() - start)
+    return min(times) / len(bodies) * 1e6
+
+def submit_to_execute(bodies):
+    """The in-process path of a job: validate, create, start, run on a thread worker, finish."""
+    job_store = JobStore()
+    for body in bodies:
+        spec, _ = handlers.parse_job_spec(body)
+        job_id = job_store.create_jobs([spec])[0][0]
+        job = job_store.start_job(job_id)
+        result = generate_monthly_bill(decode_payload(job.payload))
+        job_store.update_job_status(job_id, "success", result=result)
+
+def deep_size(value):
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_size(key) + deep_size(item) for key, item in value.items())
+    elif isinstance(value, list):
+        size += sum(deep_size(item) for item in value)
+    return size
+
+def main():
+    gc.disable()
+    bodies = [{"task": "generate_monthly_bill", "payload": bill_payload(i)} for i in range(N_JOBS)]
+    payloads = [body["payload"] for body in bodies]
+    encoded = [encode_payload(payload) for payload in payloads]
+    validate = handlers.payload_validators["generate_monthly_bill"]
+    print(f"{N_JOBS:,} generate_monthly_bill jobs with {PURCHASES} purchases each, us/job")
+
+    encoded_path = best_of(submit_to_execute, bodies)
+    job_store_module.encode_payload = lambda payload: payload
+    handlers.payload_validators = {}
+    plain_path = best_of(submit_to_execute, bodies)
+    print(f"{'submit to execute, dict payloads, no schema':<52} {plain_path:>8.2f}")
+    print(f"{'submit to execute, schema + encoded payloads':<52} {encoded_path:>8.2f}")
+
+    rows = [
+        ("schema validation at submission", lambda items: [validate(payload) for payload in items], payloads),
+        ("encode at creation", lambda items: [encode_payload(payload) for payload in items], payloads),
+        ("decode before running on a thread", lambda items: [decode_payload(payload) for payload in items], encoded),
+        ("send to a process worker, dict payload",
+         lambda items: [pickle.dumps((generate_monthly_bill, payload)) for payload in items], payloads),
+        ("send to a process worker, encoded payload",
+         lambda items: [pickle.dumps((partial(run_task, generate_monthly_bill), payload)) for payload in items], encoded),
+        ("journal create record, dict payload",
+         lambda items: [pickle.dumps(("create", ("job-id", "generate_monthly_bill", payload), None)) for payload in items],
+         payloads),
+        ("journal create record, encoded payload",
+         lambda items: [pickle.dumps(("create", ("job-id", "generate_monthly_bill", payload), None)) for payload in items],
+         encoded),
+    ]
+    for label, func, items in rows:
+        print(f"{label:<52} {best_of(func, items):>8.2f}")
+
+    dict_bytes = sum(deep_size(payload) for payload in payloads) / N_JOBS
+    encoded_bytes = sum(sys.getsizeof(payload) for payload in encoded) / N_JOBS
+    print(f"payload memory: {dict_bytes:,.0f} bytes as dicts, {encoded_bytes:,.0f} bytes encoded")
+
+if __name__ == "__main__":
+    main()
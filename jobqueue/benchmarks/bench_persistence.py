@@ -0,0 +1,95 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from job_store import JobStore
+from job_journal import WriteAheadLog
+
+# Configuration constants
+N_JOBS = 1_000_000
+WRITER_THREADS = 16
+BATCH_SIZE = 1000  # jobs per create_jobs call when bulk loading
+
+PAYLOAD = {
+    "user_id": "user_0",
+    "billing_period": "2026-01",
+    "subscription_plan": "prime",
+    "base_price": 14.99,
+    "purchases": [{"item_id": "item_100", "price": 3.99}]
+}
+
+def write_jobs(job_store, n_jobs, threads):
+    """Create and complete n_jobs across threads; each job waits for its fsync."""
+    per_thread = n_jobs // threads
+
+    def writer():
+        for _ in range(per_thread):
+            job_id = job_store.create_job("generate_monthly_bill", PAYLOAD)
+            job_store.update_job_status(job_id, "success", result={"total_charge": 18.98})
+
+    workers = [threading.Thread(target=writer) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (per_thread * threads) / (time.perf_counter() - start)
+
+def bulk_load(job_store, n_jobs):
+    start = time.perf_counter()
+    for offset in range(0, n_jobs, BATCH_SIZE):
+        count = min(BATCH_SIZE, n_jobs - offset)
+        job_store.create_jobs([{"task_name": "generate_monthly_bill", "payload": PAYLOAD}] * count)
+    return n_jobs / (time.perf_counter() - start)
+
+def recover(wal_path):
+    journal = WriteAheadLog(wal_path)
+    job_store = JobStore(journal=journal)
+    start = time.perf_counter()
+    pending = job_store.recover()
+    elapsed = time.perf_counter() - start
+    journal.close()
+    return elapsed, len(pending)
+
+def main():
+    tmp_dir = tempfile.mkdtemp()
+    wal_path = os.path.join(tmp_dir, "bench.wal")
+    write_sample = min(N_JOBS, 20000)
+
+    try:
+        memory_rate = write_jobs(JobStore(), write_sample, WRITER_THREADS)
+
+        journal = WriteAheadLog(wal_path)
+        wal_rate = write_jobs(JobStore(journal=journal), write_sample, WRITER_THREADS)
+        journal.close()
+        os.remove(wal_path)
+
+        print(f"Bulk loading {N_JOBS} pending jobs through the WAL...")
+        journal = WriteAheadLog(wal_path)
+        bulk_rate = bulk_load(JobStore(journal=journal), N_JOBS)
+        journal.close()
+        wal_size = os.path.getsize(wal_path)
+
+        recovery_time, recovered = recover(wal_path)
+        compacted_recovery_time, _ = recover(wal_path)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    print("\n" + "=" * 60)
+    print("PERSISTENCE BENCHMARK")
+    print("=" * 60)
+    print(f"Create+complete, in-memory:  {memory_rate:,.0f} jobs/sec ({WRITER_THREADS} threads)")
+    print(f"Create+complete, WAL:        {wal_rate:,.0f} jobs/sec ({WRITER_THREADS} threads)")
+    print(f"Bulk load, WAL:              {bulk_rate:,.0f} jobs/sec")
+    print(f"WAL size:                    {wal_size / 1e6:.1f} MB for {N_JOBS:,} jobs")
+    print(f"Recovery:                    {recovery_time:.2f}s ({recovered:,} jobs re-enqueued)")
+    print(f"Recovery after compaction:   {compacted_recovery_time:.2f}s")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from job_store import JobStore
+from job_queue import JobQueue
+from tasks import TASKS
+from worker import Worker
+from executors import shutdown_executors
+
+random.seed(42)
+
+# Configuration constants
+N_JOBS = 200
+PURCHASES_PER_BILL = 20000
+NUM_WORKERS = os.cpu_count() or 1
+DEADLINE = 300  # seconds
+
+def generate_billing_payload(user_id):
+    return {
+        "user_id": user_id,
+        "billing_period": "2026-01",
+        "subscription_plan": "prime",
+        "base_price": 14.99,
+        "purchases": [
+            {"item_id": f"item_{i}", "price": round(random.uniform(2.99, 9.99), 2)}
+            for i in range(PURCHASES_PER_BILL)
+        ]
+    }
+
+def run_billing(payloads, executor):
+    job_store = JobStore()
+    job_queue = JobQueue()
+    task_options = {"generate_monthly_bill": {"executor": executor}}
+
+    workers = [Worker(job_queue, job_store, TASKS, task_options) for _ in range(NUM_WORKERS)]
+    for worker in workers:
+        worker.daemon = True
+        worker.start()
+
+    start = time.perf_counter()
+    results = job_store.create_jobs([
+        {"task_name": "generate_monthly_bill", "payload": payload} for payload in payloads
+    ])
+    job_ids = [job_id for job_id, _, _ in results]
+    job_queue.enqueue_many((job_id, 0, None, None, "generate_monthly_bill") for job_id in job_ids)
+
+    while time.perf_counter() - start < DEADLINE:
+        if all(job_store.get_job(job_id)["status"] in ("success", "failed") for job_id in job_ids):
+            break
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+
+    for worker in workers:
+        worker.stop()
+    return len(job_ids) / elapsed
+
+def main():
+    print(f"Generating {N_JOBS} bills with {PURCHASES_PER_BILL} purchases each...")
+    payloads = [generate_billing_payload(f"user_{i}") for i in range(N_JOBS)]
+
+    print(f"Running with {NUM_WORKERS} workers on {os.cpu_count()} cores")
+    thread_throughput = run_billing(payloads, "thread")
+    process_throughput = run_billing(payloads, "process")
+    shutdown_executors()
+
+    print("\n" + "=" * 60)
+    print("PROCESS POOL BENCHMARK")
+    print("=" * 60)
+    print(f"Thread mode:       {thread_throughput:.2f} jobs/sec")
+    print(f"Process mode:      {process_throughput:.2f} jobs/sec")
+    print(f"Speedup:           {process_throughput / thread_throughput:.2f}x")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from job_queue import JobQueue
+from job_store import JobStore
+from profiling import TASK_PROFILES, format_collapsed, sample_stacks
+from tasks import TASKS
+from worker import Worker
+
+# Configuration constants
+N_JOBS = 10_000
+PURCHASES = 20
+REPEATS = 3  # the fastest repeat is reported, to filter scheduler noise
+WINDOW_SECONDS = 2.0
+N_IDLE_THREADS = 16  # idle threads the sampler also walks, like a worker pool
+N_QUEUED_JOBS = 50_000  # more than the worker finishes in WINDOW_SECONDS
+
+def bill_payload(i):
+    return {"user_id": f"user_{i}", "billing_period": "2026-01", "subscription_plan": "prime", "base_price": 14.99,
+            "purchases": [{"item_id": f"movie_{n:03d}", "price": 3.99} for n in range(PURCHASES)]}
+
+def job_cost(task_options):
+    """us per generate_monthly_bill job through Worker._process on this thread."""
+    best = None
+    for _ in range(REPEATS):
+        TASK_PROFILES.reset()
+        job_store = JobStore()
+        worker = Worker(JobQueue(), job_store, TASKS, task_options)
+        jobs = [job_store.start_job(job_store.create_job("generate_monthly_bill", bill_payload(i))) for i in range(N_JOBS)]
+        start = time.perf_counter()
+        for job in jobs:
+            worker._process(job)
+        elapsed = (time.perf_counter() - start) / N_JOBS * 1e6
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def throughput_while_sampling(sampling):
+    """Jobs/sec of a worker thread over WINDOW_SECONDS, with or without sample_stacks running."""
+    job_store = JobStore()
+    job_queue = JobQueue()
+    job_ids = [job_store.create_job("generate_monthly_bill", bill_payload(i)) for i in range(N_QUEUED_JOBS)]
+    worker = Worker(job_queue, job_store, TASKS)
+    stop = threading.Event()
+    idle = [threading.Thread(target=stop.wait, daemon=True) for _ in range(N_IDLE_THREADS)]
+    for thread in idle:
+        thread.start()
+    job_queue.enqueue_many((job_id, 0, None, None, "generate_monthly_bill") for job_id in job_ids)
+    worker.start()
+    stacks = None
+    if sampling:
+        stacks = sample_stacks(WINDOW_SECONDS)
+    else:
+        time.sleep(WINDOW_SECONDS)
+    done = job_store.count_jobs()["success"]
+    worker.stop()
+    worker.join(timeout=2)
+    stop.set()
+    return done / WINDOW_SECONDS, stacks
+
+def main():
+    logging.disable(logging.INFO)
+    print(f"{N_JOBS:,} generate_monthly_bill jobs (thread executor) on one thread, us/job")
+    for label, options in [("no profile_every", {}),
+                           ("profile_every 100", {"profile_every": 100}),
+                           ("profile_every 10", {"profile_every": 10}),
+                           ("profile_every 1", {"profile_every": 1})]:
+        print(f"  {label:<28} {job_cost({'generate_monthly_bill': options}):>8.1f}")
+
+    print(f"\nOne worker thread for {WINDOW_SECONDS}s, {N_IDLE_THREADS} idle threads, jobs/sec")
+    runs = {sampling: [throughput_while_sampling(sampling) for _ in range(REPEATS)] for sampling in (False, True)}
+    off = max(rate for rate, _ in runs[False])
+    on = max(rate for rate, _ in runs[True])
+    stacks = runs[True][0][1]
+    print(f"  {'no sampling':<28} {off:>8,.0f}")
+    print(f"  {'sample_stacks, 5 ms':<28} {on:>8,.0f}  ({(on / off - 1) * 100:+.1f}%, "
+          f"{sum(stacks.values()):,} samples, {len(stacks)} distinct stacks)")
+    print("\nHottest worker stacks:")
+    worker_stacks = {stack: count for stack, count in stacks.items() if stack.startswith("Worker;")}
+    for line in format_collapsed(worker_stacks).splitlines()[:5]:
+        print(f"  {line}")
+
+if __name__ == "__main__":
+    main()
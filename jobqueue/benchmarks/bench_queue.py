@@ -0,0 +1,69 @@
+import os
+import random
+import sys
+import time
+from queue import Queue
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from job_queue import JobQueue
+
+random.seed(42)
+
+# Configuration constants
+QUEUE_SIZES = [10_000, 100_000, 1_000_000]
+N_TENANTS = 50
+N_PRIORITIES = 5
+
+class FifoQueue:
+    """The original JobQueue: a thin wrapper around queue.Queue."""
+
+    def __init__(self):
+        self._queue = Queue()
+
+    def enqueue(self, job_id, priority=0, tenant=None):
+        self._queue.put(job_id)
+
+    def dequeue(self):
+        return self._queue.get()
+
+def measure(job_queue, entries):
+    start = time.perf_counter()
+    for job_id, priority, tenant in entries:
+        job_queue.enqueue(job_id, priority, tenant)
+    enqueue_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(len(entries)):
+        job_queue.dequeue()
+    dequeue_time = time.perf_counter() - start
+
+    return enqueue_time / len(entries) * 1e6, dequeue_time / len(entries) * 1e6
+
+def main():
+    print("\n" + "=" * 72)
+    print("QUEUE BENCHMARK (microseconds per operation)")
+    print("=" * 72)
+    print(f"{'queued ids':>12} {'scenario':<28} {'enqueue':>12} {'dequeue':>12}")
+
+    for size in QUEUE_SIZES:
+        job_ids = [f"job-{i}" for i in range(size)]
+        single_tenant = [(job_id, 0, None) for job_id in job_ids]
+        multi_tenant = [
+            (job_id, random.randrange(N_PRIORITIES), f"tenant-{random.randrange(N_TENANTS)}")
+            for job_id in job_ids
+        ]
+
+        scenarios = [
+            ("FIFO queue.Queue", FifoQueue(), single_tenant),
+            ("JobQueue, one tenant", JobQueue(), single_tenant),
+            (f"JobQueue, {N_TENANTS} tenants", JobQueue(), multi_tenant)
+        ]
+        for name, job_queue, entries in scenarios:
+            enqueue_us, dequeue_us = measure(job_queue, entries)
+            print(f"{size:>12,} {name:<28} {enqueue_us:>12.2f} {dequeue_us:>12.2f}")
+
+    print("=" * 72)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import logging
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+from job_store import JobStore
+from job_queue import JobQueue
+from broker import Broker, serve_broker, AUTHKEY_ENV
+
+# Configuration constants
+N_JOBS = 5000
+AUTHKEY = b"bench-broker-key"
+# (worker processes, threads per process, prefetch)
+CONFIGS = [(1, 2, 1), (1, 2, 8), (1, 2, 32), (2, 2, 8), (4, 2, 8)]
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def run(processes, threads, prefetch):
+    """Jobs/sec for N_JOBS trivial jobs leased by remote worker processes."""
+    job_store = JobStore()
+    job_queue = JobQueue()
+    finished = []
+    done = threading.Event()
+
+    def on_finished(job):
+        finished.append(job)
+        if len(finished) == N_JOBS:
+            done.set()
+
+    job_store.add_listener(on_finished)
+    port = free_port()
+    serve_broker(Broker(job_store, job_queue), ("127.0.0.1", port), AUTHKEY)
+
+    env = dict(os.environ, **{AUTHKEY_ENV: AUTHKEY.decode()})
+    workers = [
+        subprocess.Popen([sys.executable, os.path.join(SRC, "remote_worker.py"), "--broker", f"127.0.0.1:{port}",
+                          "--threads", str(threads), "--prefetch", str(prefetch)],
+                         env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for _ in range(processes)
+    ]
+    try:
+        # Let the workers connect before the clock starts.
+        time.sleep(1.5)
+        job_ids = [job_store.create_job("sum", {"numbers": [i]}) for i in range(N_JOBS)]
+        start = time.perf_counter()
+        job_queue.enqueue_many((job_id, 0, None, None, "sum") for job_id in job_ids)
+        done.wait()
+        return N_JOBS / (time.perf_counter() - start)
+    finally:
+        for worker in workers:
+            worker.kill()
+            worker.wait()
+
+def main():
+    logging.disable(logging.WARNING)
+    print(f"{N_JOBS} sum jobs through the broker, {os.cpu_count()} cores")
+    print(f"{'processes':>9} {'threads':>8} {'prefetch':>9} {'jobs/sec':>10}")
+    for processes, threads, prefetch in CONFIGS:
+        rate = run(processes, threads, prefetch)
+        print(f"{processes:>9} {threads:>8} {prefetch:>9} {rate:>10.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from job_store import JobStore
+from job_queue import JobQueue
+from result_store import ResultStore
+from result_cache import ResultCache
+from tasks import TASKS, TASK_OPTIONS, generate_monthly_bill
+from executors import shutdown_executors
+from worker import Worker
+from api import app, init_api
+
+# Configuration constants
+N_POLLS = 2000
+N_JOBS = 2000
+DISTINCT_RESULTS = 20
+STATEMENT_LINES = 2000  # about 75 KB of JSON per result
+N_BILLS = 5000
+PURCHASES_PER_BILL = 20
+
+def bill_payload(user, purchases=PURCHASES_PER_BILL):
+    return {
+        "user_id": f"user_{user}",
+        "billing_period": "2026-01",
+        "subscription_plan": "pro",
+        "base_price": 14.99,
+        "purchases": [{"item": f"item_{i}", "price": 0.99} for i in range(purchases)]
+    }
+
+def statement(user):
+    """A full billing statement, the kind of result that gets offloaded."""
+    payload = bill_payload(user, STATEMENT_LINES)
+    return {"user_id": payload["user_id"], "lines": payload["purchases"],
+            "total_charge": generate_monthly_bill(payload)["total_charge"]}
+
+def poll_cost(result_store, query):
+    """Microseconds per GET /jobs/<job_id> poll of a finished job with a large result."""
+    job_store = JobStore(result_store=result_store)
+    init_api(job_store, JobQueue())
+    client = app.test_client()
+    job_id = job_store.create_job("generate_monthly_bill", {})
+    job_store.update_job_status(job_id, "success", result=statement(0))
+
+    start = time.perf_counter()
+    for _ in range(N_POLLS):
+        client.get(f"/jobs/{job_id}{query}")
+    return (time.perf_counter() - start) / N_POLLS * 1e6
+
+def memory_per_job(result_store):
+    """Bytes retained per finished job, with DISTINCT_RESULTS different results among N_JOBS jobs."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    job_store = JobStore(result_store=result_store)
+    for i in range(N_JOBS):
+        job_id = job_store.create_job("generate_monthly_bill", {})
+        # Each job builds its own result object, as the task would.
+        job_store.update_job_status(job_id, "success", result=statement(i % DISTINCT_RESULTS))
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return retained / N_JOBS
+
+def bills_per_second(result_cache):
+    """Billing jobs per second on one worker, in the process pool, with DISTINCT_RESULTS distinct payloads."""
+    job_store = JobStore()
+    worker = Worker(JobQueue(), job_store, TASKS, TASK_OPTIONS, result_cache)
+    payloads = [bill_payload(i) for i in range(DISTINCT_RESULTS)]
+
+    start = time.perf_counter()
+    for i in range(N_BILLS):
+        job_id = job_store.create_job("generate_monthly_bill", payloads[i % DISTINCT_RESULTS])
+        worker._process(job_store.start_job(job_id))
+    return N_BILLS / (time.perf_counter() - start)
+
+def main():
+    logging.disable(logging.INFO)
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        store = ResultStore(tmp_dir)
+        print(f"GET /jobs/<job_id>, result inline, included:    {poll_cost(None, '?include_result=1'):>9.1f} us/poll")
+        print(f"GET /jobs/<job_id>, result inline, omitted:     {poll_cost(None, ''):>9.1f} us/poll")
+        print(f"GET /jobs/<job_id>, result offloaded, omitted:  {poll_cost(store, ''):>9.1f} us/poll")
+        print(f"Memory per job, results inline:    {memory_per_job(None):>10.0f} bytes")
+        print(f"Memory per job, results offloaded: {memory_per_job(ResultStore(tmp_dir)):>10.0f} bytes")
+        print(f"Billing, no result cache:  {bills_per_second(None):>9.0f} jobs/sec")
+        print(f"Billing, memoized:         {bills_per_second(ResultCache()):>9.0f} jobs/sec")
+    finally:
+        shutil.rmtree(tmp_dir)
+        shutdown_executors()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from job_store import JobStore, NUM_SHARDS
+
+# Configuration constants
+THREAD_COUNTS = [8, 32, 64]
+OPS_PER_THREAD = 5000
+PAYLOAD = {"user_id": "user_0", "billing_period": "2026-01"}
+
+def job_lifecycle(job_store, latencies):
+    """One API create, a worker start, three status polls and a completion."""
+    start = time.perf_counter()
+    job_id = job_store.create_job("generate_monthly_bill", PAYLOAD)
+    job_store.start_job(job_id)
+    for _ in range(3):
+        job_store.get_job(job_id)
+    job_store.update_job_status(job_id, "success", result={"total_charge": 18.98})
+    latencies.append(time.perf_counter() - start)
+
+def run(num_shards, threads):
+    job_store = JobStore(num_shards=num_shards)
+    per_thread = OPS_PER_THREAD * 8 // threads
+    barrier = threading.Barrier(threads + 1)
+    latencies = []
+
+    def client():
+        local = []
+        barrier.wait()
+        for _ in range(per_thread):
+            job_lifecycle(job_store, local)
+        latencies.extend(local)
+
+    workers = [threading.Thread(target=client) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    return len(latencies) / elapsed, p99 * 1e6
+
+def main():
+    print(f"{'threads':>8} {'store':>12} {'jobs/s':>10} {'p99 (us)':>10}")
+    for threads in THREAD_COUNTS:
+        for label, num_shards in (("single lock", 1), (f"{NUM_SHARDS} shards", NUM_SHARDS)):
+            rate, p99 = run(num_shards, threads)
+            print(f"{threads:>8} {label:>12} {rate:>10.0f} {p99:>10.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from job_queue import JobQueue
+from job_store import JobStore
+from task_limits import TaskLimit
+from tasks import TASKS
+from worker import Worker
+
+# Configuration constants
+N_QUEUE_OPS = 100_000
+N_WORKERS = 4
+N_SLOW = 40
+N_FAST = 200
+SLOW_SECONDS = 0.05
+SLOW_MAX_IN_FLIGHT = 2
+
+def queue_overhead(task_limits):
+    """us per enqueue + dequeue of unlimited jobs, with task_limits configured for another task."""
+    job_queue = JobQueue(task_limits=task_limits)
+    entries = [(f"job-{i}", i % 5, f"tenant-{i % 10}", None, "sum") for i in range(N_QUEUE_OPS)]
+    start = time.perf_counter()
+    job_queue.enqueue_many(entries)
+    for job_id, _, _, _, _ in entries:
+        job_queue.dequeue_nowait()
+        job_queue.task_done(job_id)
+    return (time.perf_counter() - start) / N_QUEUE_OPS * 1e6
+
+def slow_backlog(mode):
+    """Run N_SLOW slow jobs queued ahead of N_FAST sums; return (fast done, slow done, peak slow) in seconds."""
+    running = [0, 0]
+    lock = threading.Lock()
+    semaphore = threading.Semaphore(SLOW_MAX_IN_FLIGHT)
+
+    def slow_task(payload):
+        with lock:
+            running[0] += 1
+            running[1] = max(running[1], running[0])
+        time.sleep(SLOW_SECONDS)
+        with lock:
+            running[0] -= 1
+        return "slow"
+
+    def blocking_slow_task(payload):
+        # The limit enforced inside the task: a worker that takes a slow job
+        # waits for a slot, holding up whatever is queued behind it.
+        with semaphore:
+            return slow_task(payload)
+
+    limits = {"slow": TaskLimit(max_in_flight=SLOW_MAX_IN_FLIGHT)} if mode == "queue" else None
+    tasks = dict(TASKS, slow=blocking_slow_task if mode == "blocking" else slow_task)
+    job_store = JobStore()
+    job_queue = JobQueue(task_limits=limits)
+    workers = [Worker(job_queue, job_store, tasks) for _ in range(N_WORKERS)]
+    for worker in workers:
+        worker.start()
+
+    slow_ids = [job_store.create_job("slow", {}) for _ in range(N_SLOW)]
+    fast_ids = [job_store.create_job("sum", {"numbers": [i]}) for i in range(N_FAST)]
+    start = time.perf_counter()
+    job_queue.enqueue_many((job_id, 0, None, None, "slow") for job_id in slow_ids)
+    job_queue.enqueue_many((job_id, 0, None, None, "sum") for job_id in fast_ids)
+    for job_id in fast_ids:
+        job_store.wait_for_job(job_id, 30)
+    fast_done = time.perf_counter() - start
+    for job_id in slow_ids:
+        job_store.wait_for_job(job_id, 30)
+    slow_done = time.perf_counter() - start
+
+    for worker in workers:
+        worker.stop()
+    for worker in workers:
+        worker.join(timeout=2)
+    return fast_done, slow_done, running[1]
+
+def main():
+    print(f"{N_QUEUE_OPS:,} enqueue + dequeue + task_done, us/job")
+    print(f"  {'no task limits':<40} {queue_overhead(None):>8.2f}")
+    print(f"  {'limit on another task':<40} {queue_overhead({'slow': TaskLimit(max_in_flight=1)}):>8.2f}")
+
+    print(f"\n{N_SLOW} x {SLOW_SECONDS * 1e3:.0f} ms slow jobs queued ahead of {N_FAST} sums, {N_WORKERS} workers, "
+          f"slow limited to {SLOW_MAX_IN_FLIGHT} at once")
+    print(f"  {'scenario':<40} {'sums done':>10} {'all done':>10} {'peak slow':>10}")
+    for label, mode in [("no limit", "none"), ("semaphore in the task", "blocking"), ("max_in_flight in the queue", "queue")]:
+        fast_done, slow_done, peak = slow_backlog(mode)
+        print(f"  {label:<40} {fast_done * 1e3:>8.0f}ms {slow_done * 1e3:>8.0f}ms {peak:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from tasks import TASKS
+from worker import Worker
+from executors import shutdown_executors
+
+# Configuration constants
+N_JOBS = 5000
+N_PROCESS_JOBS = 1000
+N_TIMEOUT_JOBS = 200
+TIMEOUT = 5
+STUCK_TASK_SECONDS = 0.5
+STUCK_TASK_TIMEOUT = 0.01
+
+def legacy_execute(task_func, payload, timeout):
+    """Per-job executor, as Worker.run used to do it."""
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(task_func, payload)
+    try:
+        result = future.result(timeout=timeout)
+        executor.shutdown(wait=True)
+        return result
+    except FutureTimeoutError:
+        executor.shutdown(wait=False)
+        raise TimeoutError(f"Job exceeded timeout of {timeout} seconds")
+
+def per_job_overhead(execute, n_jobs):
+    payload = {"numbers": [1, 2, 3]}
+    start = time.perf_counter()
+    for _ in range(n_jobs):
+        execute(payload)
+    return (time.perf_counter() - start) / n_jobs * 1e6
+
+def peak_threads_under_timeouts(execute):
+    baseline = threading.active_count()
+    peak = baseline
+    for _ in range(N_TIMEOUT_JOBS):
+        try:
+            execute({"seconds": STUCK_TASK_SECONDS})
+        except TimeoutError:
+            pass
+        peak = max(peak, threading.active_count())
+    time.sleep(STUCK_TASK_SECONDS)
+    return peak - baseline
+
+def main():
+    worker = Worker(None, None, TASKS, {"sum": {"executor": "thread"}})
+    process_worker = Worker(None, None, TASKS, {"sum": {"executor": "process"}, "sleep": {"executor": "process"}})
+    sum_task = TASKS["sum"]
+    sleep_task = TASKS["sleep"]
+
+    overheads = [
+        ("thread, no timeout", per_job_overhead(lambda p: worker._execute("sum", p, None), N_JOBS)),
+        ("thread, timeout (shared pool)", per_job_overhead(lambda p: worker._execute("sum", p, TIMEOUT), N_JOBS)),
+        ("thread, timeout (per-job pool)", per_job_overhead(lambda p: legacy_execute(sum_task, p, TIMEOUT), N_JOBS)),
+        ("process, no timeout", per_job_overhead(lambda p: process_worker._execute("sum", p, None), N_PROCESS_JOBS)),
+        ("process, timeout", per_job_overhead(lambda p: process_worker._execute("sum", p, TIMEOUT), N_PROCESS_JOBS))
+    ]
+
+    thread_growth = [
+        ("shared pool", peak_threads_under_timeouts(lambda p: worker._execute("sleep", p, STUCK_TASK_TIMEOUT))),
+        ("per-job pool", peak_threads_under_timeouts(lambda p: legacy_execute(sleep_task, p, STUCK_TASK_TIMEOUT))),
+        ("process pool (killed)", peak_threads_under_timeouts(
+            lambda p: process_worker._execute("sleep", p, STUCK_TASK_TIMEOUT)))
+    ]
+    shutdown_executors()
+
+    print("\n" + "=" * 60)
+    print("TIMEOUT BENCHMARK")
+    print("=" * 60)
+    print("Per-job overhead (sum task):")
+    for name, overhead in overheads:
+        print(f"  {name:<34} {overhead:>10.1f} us")
+    print(f"Extra threads after {N_TIMEOUT_JOBS} timed-out jobs:")
+    for name, growth in thread_growth:
+        print(f"  {name:<34} {growth:>10}")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""In-process benchmark suite for the queue engine, with JSON output and baseline comparison.
+
+Every scenario runs against JobQueue, JobStore and Worker directly, with
+seeded inputs and no network, and reports p50/p95/p99/max latency in
+microseconds plus throughput. Worker scenarios submit their jobs in one
+burst, so their latency includes time spent queued behind earlier jobs.
+Results are printed as JSON (or written to --output) and compared against a
+stored baseline; the exit status is 1 when any scenario regressed by more
+than --tolerance.
+
+    python benchmarks/suite.py                      # run, compare with baseline.json
+    python benchmarks/suite.py --save-baseline      # run and store as the new baseline
+    python benchmarks/suite.py --only queue_enqueue,store_contention --quick
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from executors import shutdown_executors
+from job_queue import JobQueue
+from job_store import JobStore
+from tasks import TASKS, TASK_OPTIONS
+from worker import Worker
+
+# Configuration constants
+SEED = 42
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# A scenario regresses when a latency percentile grows, or its throughput
+# drops, by more than this fraction of the baseline.
+DEFAULT_TOLERANCE = 0.25
+# Percentiles compared against the baseline; max is reported but too noisy to gate on.
+GATED_PERCENTILES = ("p50", "p95", "p99")
+
+QUEUE_OPS = 200_000
+# Queue operations are timed in chunks; each chunk gives one per-op sample.
+QUEUE_CHUNK = 100
+TENANTS = 8
+STORE_THREADS = 16
+STORE_LIFECYCLES = 40_000
+CPU_JOBS = 4000
+CPU_WORKERS = 4
+IO_JOBS = 2000
+IO_WORKERS = 32
+IO_SLEEP_SECONDS = 0.005
+STORM_FAILING_JOBS = 500
+STORM_HEALTHY_JOBS = 500
+STORM_WORKERS = 8
+TIMEOUT_JOBS = 200
+TIMEOUT_WORKERS = 16
+TIMEOUT_SECONDS = 0.02
+# --quick divides every job and operation count by this.
+QUICK_DIVISOR = 10
+# Each scenario first runs once at a tenth of its size (forking the process
+# pool, warming allocators), then REPEATS times; the run with the highest
+# throughput is reported, since slower runs are this machine's noise.
+REPEATS = 5
+
+
+def summarize(samples, operations, elapsed, **extra):
+    """Percentiles in microseconds of samples (seconds), and operations per second."""
+    samples = sorted(samples)
+
+    def percentile(fraction):
+        # Nearest rank.
+        return samples[max(0, int(len(samples) * fraction + 0.5) - 1)] * 1e6
+
+    summary = {
+        "count": len(samples),
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "max": samples[-1] * 1e6,
+        "ops_per_sec": operations / elapsed
+    }
+    summary.update(extra)
+    return summary
+
+
+def queue_entries(count):
+    rng = random.Random(SEED)
+    return [(f"job-{i}", rng.randrange(-2, 3), f"tenant-{rng.randrange(TENANTS)}", None, "sum") for i in range(count)]
+
+
+def bench_queue_enqueue(scale):
+    """JobQueue.enqueue of ready jobs with mixed priorities and tenants."""
+    entries = queue_entries(QUEUE_OPS // scale)
+    job_queue = JobQueue()
+    samples = []
+    start = time.perf_counter()
+    for offset in range(0, len(entries), QUEUE_CHUNK):
+        chunk = entries[offset:offset + QUEUE_CHUNK]
+        chunk_start = time.perf_counter()
+        for job_id, priority, tenant, run_at, task_name in chunk:
+            job_queue.enqueue(job_id, priority, tenant, run_at, task_name)
+        samples.append((time.perf_counter() - chunk_start) / len(chunk))
+    return summarize(samples, len(entries), time.perf_counter() - start)
+
+
+def bench_queue_dequeue(scale):
+    """JobQueue.dequeue_nowait across tenants and priorities until the queue is empty."""
+    entries = queue_entries(QUEUE_OPS // scale)
+    job_queue = JobQueue()
+    job_queue.enqueue_many(entries)
+    samples = []
+    start = time.perf_counter()
+    for _ in range(0, len(entries), QUEUE_CHUNK):
+        chunk_start = time.perf_counter()
+        for _ in range(QUEUE_CHUNK):
+            job_queue.dequeue_nowait()
+        samples.append((time.perf_counter() - chunk_start) / QUEUE_CHUNK)
+    return summarize(samples, len(entries), time.perf_counter() - start)
+
+
+def bench_store_contention(scale):
+    """STORE_THREADS threads each running create, start, get and finish on their own jobs."""
+    job_store = JobStore()
+    per_thread = STORE_LIFECYCLES // scale // STORE_THREADS
+    barrier = threading.Barrier(STORE_THREADS + 1)
+    samples = []
+
+    def client(index):
+        local = []
+        payload = {"numbers": [index]}
+        barrier.wait()
+        for _ in range(per_thread):
+            op_start = time.perf_counter()
+            job_id = job_store.create_job("sum", payload)
+            job_store.start_job(job_id)
+            job_store.get_job(job_id)
+            job_store.update_job_status(job_id, "success", result="Sum is 1")
+            local.append(time.perf_counter() - op_start)
+        samples.extend(local)
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(STORE_THREADS)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return summarize(samples, len(samples), time.perf_counter() - start, threads=STORE_THREADS)
+
+
+def run_workers(job_store, job_queue, workers, submit):
+    """Start workers, call submit() for the job ids to wait for, and return (latencies, jobs, elapsed).
+
+    Latency is from a job's creation to its final status.
+    """
+    pool = [Worker(job_queue, job_store, TASKS, TASK_OPTIONS) for _ in range(workers)]
+    for worker in pool:
+        worker.start()
+    start = time.perf_counter()
+    job_ids = submit()
+    jobs = [job_store.wait_for_job(job_id, 120) for job_id in job_ids]
+    elapsed = time.perf_counter() - start
+    for worker in pool:
+        worker.stop()
+    for worker in pool:
+        worker.join()
+    return [job.updated_at - job.created_at for job in jobs], jobs, elapsed
+
+
+def submit(job_store, job_queue, specs):
+    results = job_store.create_jobs(specs)
+    job_queue.enqueue_many((job_id, spec.get("priority", 0), spec.get("tenant"), spec.get("run_at"), spec["task_name"])
+                           for spec, (job_id, _, _) in zip(specs, results))
+    return [job_id for job_id, _, _ in results]
+
+
+def bill_specs(count):
+    rng = random.Random(SEED)
+    return [{
+        "task_name": "generate_monthly_bill",
+        "payload": {
+            "user_id": f"user_{i}",
+            "billing_period": "2026-01",
+            "subscription_plan": "prime",
+            "base_price": 14.99,
+            "purchases": [{"item_id": f"item_{n}", "price": round(rng.uniform(2.99, 9.99), 2)}
+                          for n in range(rng.randrange(6))]
+        }
+    } for i in range(count)]
+
+
+def bench_worker_cpu(scale):
+    """Monthly bills, CPU-bound, through the process pool in batches as TASK_OPTIONS configures."""
+    job_store, job_queue = JobStore(), JobQueue()
+    specs = bill_specs(CPU_JOBS // scale)
+    latencies, jobs, elapsed = run_workers(job_store, job_queue, CPU_WORKERS,
+                                           lambda: submit(job_store, job_queue, specs))
+    assert all(job.status == "success" for job in jobs)
+    return summarize(latencies, len(jobs), elapsed, workers=CPU_WORKERS)
+
+
+def bench_worker_io(scale):
+    """Sleep jobs, I/O-bound, on worker threads."""
+    job_store, job_queue = JobStore(), JobQueue()
+    specs = [{"task_name": "sleep", "payload": {"seconds": IO_SLEEP_SECONDS}} for _ in range(IO_JOBS // scale)]
+    latencies, jobs, elapsed = run_workers(job_store, job_queue, IO_WORKERS,
+                                           lambda: submit(job_store, job_queue, specs))
+    assert all(job.status == "success" for job in jobs)
+    return summarize(latencies, len(jobs), elapsed, workers=IO_WORKERS)
+
+
+def bench_retry_storm(scale):
+    """Healthy sum jobs submitted alongside jobs that fail every attempt and retry with short backoff.
+
+    Latency is of the healthy jobs; throughput counts every attempt.
+    """
+    job_store, job_queue = JobStore(), JobQueue()
+    failing = [{"task_name": "fail", "payload": {}, "max_retries": 3, "retry_delay": 0.001, "max_retry_delay": 0.01}
+               for _ in range(STORM_FAILING_JOBS // scale)]
+    healthy = [{"task_name": "sum", "payload": {"numbers": [i, i]}} for i in range(STORM_HEALTHY_JOBS // scale)]
+    specs = [spec for pair in zip(failing, healthy) for spec in pair]
+    latencies, jobs, elapsed = run_workers(job_store, job_queue, STORM_WORKERS,
+                                           lambda: submit(job_store, job_queue, specs))
+    healthy_latencies = [latency for latency, job in zip(latencies, jobs) if job.task_name == "sum"]
+    attempts = sum(job.attempts if job.status == "failed" else 1 for job in jobs)
+    assert all(job.status == ("failed" if job.task_name == "fail" else "success") for job in jobs)
+    return summarize(healthy_latencies, attempts, elapsed, workers=STORM_WORKERS)
+
+
+def bench_timeouts(scale):
+    """Thread tasks that overrun their timeout; latency is creation to failure, timeout included."""
+    job_store, job_queue = JobStore(), JobQueue()
+    specs = [{"task_name": "sleep", "payload": {"seconds": TIMEOUT_SECONDS * 2}, "timeout": TIMEOUT_SECONDS,
+              "max_retries": 1} for _ in range(TIMEOUT_JOBS // scale)]
+    latencies, jobs, elapsed = run_workers(job_store, job_queue, TIMEOUT_WORKERS,
+                                           lambda: submit(job_store, job_queue, specs))
+    assert all(job.status == "failed" for job in jobs)
+    return summarize(latencies, len(jobs), elapsed, workers=TIMEOUT_WORKERS)
+
+
+SCENARIOS = {
+    "queue_enqueue": bench_queue_enqueue,
+    "queue_dequeue": bench_queue_dequeue,
+    "store_contention": bench_store_contention,
+    "worker_cpu": bench_worker_cpu,
+    "worker_io": bench_worker_io,
+    "retry_storm": bench_retry_storm,
+    "timeouts": bench_timeouts,
+}
+
+
+def compare(results, baseline, tolerance):
+    """Compare each scenario with the baseline; returns ({scenario: {metric: ...}}, [regressions])."""
+    comparison = {}
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        metrics = {}
+        for metric in GATED_PERCENTILES + ("ops_per_sec",):
+            before, after = previous[metric], current[metric]
+            change = (after - before) / before if before else 0.0
+            # Latency regresses when it grows, throughput when it drops.
+            worse = change if metric != "ops_per_sec" else -change
+            metrics[metric] = {"baseline": before, "current": after, "change": change, "regressed": worse > tolerance}
+            if worse > tolerance:
+                regressions.append(f"{name}.{metric}")
+        comparison[name] = metrics
+    return comparison, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the in-process queue engine benchmark suite.")
+    parser.add_argument("--only", help="comma-separated scenarios to run (default: all)")
+    parser.add_argument("--quick", action="store_true", help=f"divide every workload by {QUICK_DIVISOR}")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline report to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed fractional regression per metric")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}; choose from {', '.join(SCENARIOS)}")
+    scale = QUICK_DIVISOR if args.quick else 1
+
+    logging.disable(logging.CRITICAL)
+    results = {}
+    try:
+        for name in names:
+            SCENARIOS[name](scale * QUICK_DIVISOR)
+            runs = []
+            for _ in range(REPEATS):
+                random.seed(SEED)
+                runs.append(SCENARIOS[name](scale))
+            summary = results[name] = max(runs, key=lambda run: run["ops_per_sec"])
+            print(f"{name:<18} p50 {summary['p50']:>10.1f}us  p95 {summary['p95']:>10.1f}us  "
+                  f"p99 {summary['p99']:>10.1f}us  max {summary['max']:>10.1f}us  "
+                  f"{summary['ops_per_sec']:>10.0f} ops/s", file=sys.stderr)
+    finally:
+        shutdown_executors()
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "scale": scale,
+            "timestamp": time.time()
+        },
+        "scenarios": results
+    }
+
+    regressions = []
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["meta"]["scale"] != scale:
+            print(f"Baseline was recorded at scale {baseline['meta']['scale']}, not {scale}; not comparing",
+                  file=sys.stderr)
+        else:
+            report["comparison"], regressions = compare(results, baseline["scenarios"], args.tolerance)
+            report["regressions"] = regressions
+            for regression in regressions:
+                print(f"REGRESSION {regression}", file=sys.stderr)
+
+    encoded = json.dumps(report, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            f.write(encoded + "\n")
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(encoded + "\n")
+    elif not args.save_baseline:
+        print(encoded)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
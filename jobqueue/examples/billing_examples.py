@@ -30,7 +30,7 @@ def submit_billing_job(user_data):
     return response.json()
 
 def get_job_status(job_id):
-    response = requests.get(f"{API_BASE}/jobs/{job_id}")
+    response = requests.get(f"{API_BASE}/jobs/{job_id}", params={"include_result": 1})
     return response.json()
 
 def print_billing_summary(job_status):
@@ -1,3 +1,4 @@
+import json
 import random
 import time
 import requests
@@ -13,6 +14,9 @@ JOB_TIMEOUT = 5
 MAX_RETRIES = 1
 BILLING_PERIOD = "2026-01"
 GLOBAL_DEADLINE = 60  # seconds
+USE_BATCH_SUBMISSION = False  # submit through POST /jobs/batch instead of POST /jobs
+BATCH_SIZE = 500
+COMPLETION_MODE = "events"  # "events" streams completions from /jobs/events, "poll" polls GET /jobs/<id>
 
 def generate_billing_payload(user_id, billing_period):
     plans = {
@@ -80,6 +84,35 @@ def submit_all_jobs(n_jobs, concurrency):
     
     return job_data
 
+def submit_all_jobs_batched(n_jobs, batch_size):
+    run_id = f"loadtest_{int(time.time())}"
+    job_data = []
+
+    for start in range(0, n_jobs, batch_size):
+        jobs = []
+        for i in range(start, min(start + batch_size, n_jobs)):
+            user_id = f"user_{i}"
+            jobs.append({
+                "task": "generate_monthly_bill",
+                "payload": generate_billing_payload(user_id, BILLING_PERIOD),
+                "client_job_id": f"{run_id}:{user_id}:{BILLING_PERIOD}",
+                "max_retries": MAX_RETRIES,
+                "timeout": JOB_TIMEOUT
+            })
+
+        submit_time = time.time()
+        try:
+            response = requests.post(f"{API_BASE}/jobs/batch", json={"jobs": jobs})
+            response.raise_for_status()
+        except Exception as e:
+            print(f"Submission error: {e}")
+            continue
+
+        for item in response.json()["jobs"]:
+            job_data.append((item["job_id"], submit_time))
+
+    return job_data
+
 def get_job_status(job_id):
     response = requests.get(f"{API_BASE}/jobs/{job_id}")
     response.raise_for_status()
@@ -130,6 +163,36 @@ def poll_until_complete(job_data, deadline):
     
     return job_statuses
 
+def wait_for_completion_events(job_data, deadline):
+    job_statuses = {}
+    for job_id, submit_time in job_data:
+        job_statuses[job_id] = {
+            "status": "pending",
+            "submit_time": submit_time,
+            "completed_time": None
+        }
+
+    try:
+        response = requests.post(
+            f"{API_BASE}/jobs/events",
+            json={"job_ids": list(job_statuses)},
+            stream=True,
+            timeout=deadline
+        )
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data: "):
+                continue
+            event = json.loads(line[len("data: "):])
+            job_id = event.get("job_id")
+            if job_id in job_statuses:
+                job_statuses[job_id]["status"] = event.get("status", "failed")
+                job_statuses[job_id]["completed_time"] = time.time()
+    except Exception as e:
+        print(f"Event stream error: {e}")
+
+    return job_statuses
+
 def compute_stats(job_statuses, wall_time):
     total_jobs = len(job_statuses)
     successes = sum(1 for info in job_statuses.values() if info["status"] == "success")
@@ -180,12 +243,19 @@ def run_load_test(n_jobs, concurrency, deadline):
 
     submit_start = time.time()
     print("\nSubmitting jobs...")
-    job_data = submit_all_jobs(n_jobs, concurrency)
+    if USE_BATCH_SUBMISSION:
+        job_data = submit_all_jobs_batched(n_jobs, BATCH_SIZE)
+    else:
+        job_data = submit_all_jobs(n_jobs, concurrency)
     submit_time = time.time() - submit_start
     print(f"Submitted {len(job_data)} jobs in {submit_time:.2f}s")
 
-    print("\nPolling for completion...")
-    job_statuses = poll_until_complete(job_data, deadline)
+    if COMPLETION_MODE == "events":
+        print("\nWaiting for completion events...")
+        job_statuses = wait_for_completion_events(job_data, deadline)
+    else:
+        print("\nPolling for completion...")
+        job_statuses = poll_until_complete(job_data, deadline)
 
     wall_time = time.time() - submit_start
 
@@ -1,10 +1,16 @@
-from flask import Flask, request, jsonify
-from job_store import JobStore
-from job_queue import JobQueue
+from flask import Flask, Response, request, jsonify, stream_with_context
+from job_store import TERMINAL_STATUSES
+from handlers import (submit_job, submit_batch, list_jobs, lookup_job, lookup_result, render_metrics,
+                      profile_threads, task_profile, reset_task_profiles, serialize_job, parse_flag)
+from result_store import iter_chunks
+from queue import Queue, Empty
+import handlers
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+EVENT_STREAM_KEEPALIVE_SECONDS = 15
 
 job_store = None
 job_queue = None
@@ -14,56 +20,124 @@ def init_api(store, queue):
     global job_store, job_queue
     job_store = store
     job_queue = queue
+    handlers.init(store, queue)
 
 app = Flask(__name__)
 
+def _submission_response(body, status):
+    if status == 429:
+        return jsonify(body), status, {"Retry-After": str(body["retry_after"])}
+    return jsonify(body), status
+
 @app.route("/jobs", methods=['POST'])
 def create_job():
-    data = request.get_json()
-
-    task = data.get("task")
-    payload = data.get("payload", {})
-    max_retries = data.get("max_retries", 3)
-
-    if not task:
-        return jsonify({"error": "task is required"}), 400
-
-    client_job_id = data.get("client_job_id")
-    timeout = data.get("timeout")
-    
-    logger.info(f"Job creation requested - task: {task}, client_job_id: {client_job_id}")
-    job_id = job_store.create_job(task, payload, max_retries, client_job_id, timeout)
-
-    job = job_store.get_job(job_id)
-    if job and job["status"] == "pending":
-        job_queue.enqueue(job_id)
-        logger.info(f"Job {job_id} created and enqueued")
-    else:
-        logger.info(f"Job {job_id} already exists - returning existing job")
-
-    actual_status = job["status"] if job else "pending"
-    return jsonify({"job_id": job_id, "status": actual_status}), 201
-
+    return _submission_response(*submit_job(request.get_json()))
+
+
+@app.route("/jobs", methods=['GET'])
+def get_jobs():
+    body, status = list_jobs(request.args.to_dict())
+    return jsonify(body), status
+
+
+@app.route("/jobs/batch", methods=['POST'])
+def create_jobs_batch():
+    return _submission_response(*submit_batch(request.get_json()))
+
+
+@app.route("/jobs/events", methods=['GET', 'POST'])
+def job_events():
+    """Stream a server-sent event for each listed job as it finishes.
+
+    Jobs are selected with ?job_ids=a,b,c, ?batch_id=..., or a JSON body with
+    "job_ids" or "batch_id". The stream closes once every job has reported.
+    Results are included with include_result, as for GET /jobs/<job_id>.
+    """
+    data = request.get_json(silent=True) or {}
+    job_ids = data.get("job_ids") or request.args.get("job_ids", "").split(",")
+    batch_id = data.get("batch_id") or request.args.get("batch_id")
+    include_result = bool(data.get("include_result")) or parse_flag(request.args.get("include_result"))
+
+    if batch_id:
+        job_ids = job_store.get_batch(batch_id)
+        if job_ids is None:
+            return jsonify({"error": "Batch not found"}), 404
+
+    remaining = set(job_id for job_id in job_ids if job_id)
+    if not remaining:
+        return jsonify({"error": "job_ids or batch_id is required"}), 400
+
+    events = Queue()
+
+    def on_finished(job):
+        if job["job_id"] in remaining:
+            events.put(job)
+
+    def generate():
+        # Subscribe before reading current state so no transition falls between.
+        job_store.add_listener(on_finished)
+        try:
+            for job_id in list(remaining):
+                job = job_store.get_job(job_id)
+                if job is None or job["status"] in TERMINAL_STATUSES:
+                    remaining.discard(job_id)
+                    event = serialize_job(job, include_result) if job else {"job_id": job_id, "error": "Job not found"}
+                    yield f"event: job\ndata: {json.dumps(event)}\n\n"
+
+            while remaining:
+                try:
+                    job = events.get(timeout=EVENT_STREAM_KEEPALIVE_SECONDS)
+                except Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if job["job_id"] not in remaining:
+                    continue
+                remaining.discard(job["job_id"])
+                yield f"event: job\ndata: {json.dumps(serialize_job(job, include_result))}\n\n"
+
+            yield "event: done\ndata: {}\n\n"
+        finally:
+            job_store.remove_listener(on_finished)
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache"})
+
+
+@app.route("/metrics", methods=['GET'])
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+def _text_response(body, status):
+    if isinstance(body, dict):
+        return jsonify(body), status
+    return Response(body, status=status, mimetype="text/plain")
+
+@app.route("/admin/profile", methods=['POST'])
+def profile():
+    return _text_response(*profile_threads(request.args.get("seconds")))
+
+@app.route("/admin/profile/tasks", methods=['GET', 'DELETE'])
+def task_profiles():
+    if request.method == 'DELETE':
+        return jsonify(reset_task_profiles()[0])
+    return _text_response(*task_profile(request.args.get("task")))
 
 @app.route('/jobs/<job_id>', methods=['GET'])
 def get_job(job_id):
-    job = job_store.get_job(job_id)
+    body, status = lookup_job(job_id, request.args.get("wait"),
+                              parse_flag(request.args.get("include_result")))
+    return jsonify(body), status
 
-    if job is None:
-        return jsonify({"error": "Job not found"}), 404
 
-    return jsonify({
-        "job_id": job["job_id"],
-        "status": job["status"],
-        "task_name": job["task_name"],
-        "attempts": job["attempts"],
-        "max_retries": job["max_retries"],
-        "result": job.get("result"),
-        "error": job.get("error"),
-        "created_at": str(job["created_at"]),
-        "updated_at": str(job["updated_at"])
-    }), 200
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Stream the job's result as JSON, straight from its blob for offloaded results."""
+    body, status = lookup_result(job_id)
+    if isinstance(body, dict):
+        return jsonify(body), status
+    return Response(iter_chunks(body), status=status, mimetype="application/json",
+                    headers={"Content-Length": str(len(body))})
 
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5001)
\ No newline at end of file
+    app.run(debug=True, port=5001)
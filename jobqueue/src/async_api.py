@@ -0,0 +1,284 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.managers import BaseManager
+from urllib.parse import parse_qs, unquote
+import handlers
+from result_store import iter_chunks
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 16 * 1024 * 1024
+STORE_CALL_THREADS = 32
+# Long-polls block a thread each for up to MAX_WAIT_SECONDS, so they get their
+# own pool and cannot starve job submission.
+LONG_POLL_THREADS = 256
+STORE_CONNECT_TIMEOUT = 10
+
+_REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            409: "Conflict", 410: "Gone", 413: "Payload Too Large", 429: "Too Many Requests", 431: "Request Header Fields Too Large", 500: "Internal Server Error"}
+
+
+class AsyncApiServer:
+    """HTTP/1.1 API server on asyncio, serving the same contracts as the Flask app.
+
+    Supports POST /jobs, GET /jobs (filtered listing), POST /jobs/batch,
+    GET /jobs/<job_id> (with ?wait= and ?include_result=),
+    GET /jobs/<job_id>/result, GET /metrics and /admin/profile, with keep-alive
+    connections. Handlers from handlers.py run inline on the event loop when the store is in memory, since each
+    call takes microseconds. With offload=True (a journaled store that waits
+    for fsync, or a store proxy in another process) they run on a thread
+    pool so the loop keeps accepting requests while they block.
+    """
+
+    def __init__(self, host="0.0.0.0", port=5001, offload=False, reuse_port=False):
+        self.host = host
+        self.port = port
+        self.offload = offload
+        self.reuse_port = reuse_port
+        self._executor = None
+        self._long_poll_executor = None
+
+    def serve_forever(self):
+        asyncio.run(self._serve())
+
+    async def _serve(self):
+        self._executor = ThreadPoolExecutor(max_workers=STORE_CALL_THREADS, thread_name_prefix="api-store")
+        self._long_poll_executor = ThreadPoolExecutor(max_workers=LONG_POLL_THREADS, thread_name_prefix="api-wait")
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port,
+                                            reuse_port=self.reuse_port or None, backlog=1024,
+                                            limit=MAX_HEADER_BYTES)
+        logger.info(f"Async API server listening on http://{self.host}:{self.port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._long_poll_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except _HttpError as e:
+                    writer.write(_response(e.status, {"error": e.message}, keep_alive=False))
+                    await writer.drain()
+                    return
+                if request is None:
+                    return
+
+                method, target, keep_alive, body = request
+                try:
+                    payload, status = await self._dispatch(method, target, body)
+                except Exception:
+                    logger.exception(f"Unhandled error serving {method} {target}")
+                    payload, status = {"error": "Internal server error"}, 500
+                if isinstance(payload, (dict, str)):
+                    writer.write(_response(status, payload, keep_alive))
+                    await writer.drain()
+                else:
+                    await _stream_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, target, body):
+        """Route a request to its handler and return (body, status)."""
+        path, _, query = target.partition("?")
+
+        if path == "/jobs" and method == "GET":
+            params = {name: values[0] for name, values in parse_qs(query).items()}
+            return await self._call(self._executor, handlers.list_jobs, params)
+
+        if path == "/jobs" or path == "/jobs/batch":
+            if method != "POST":
+                return {"error": "Method not allowed"}, 405
+            try:
+                data = json.loads(body) if body else None
+            except ValueError:
+                return {"error": "Request body must be valid JSON"}, 400
+            handler = handlers.submit_job if path == "/jobs" else handlers.submit_batch
+            return await self._call(self._executor, handler, data)
+
+        if path == "/metrics":
+            if method != "GET":
+                return {"error": "Method not allowed"}, 405
+            return await self._call(self._executor, handlers.render_metrics), 200
+
+        if path == "/admin/profile":
+            if method != "POST":
+                return {"error": "Method not allowed"}, 405
+            seconds = parse_qs(query).get("seconds", [None])[0]
+            # Blocks for the whole sample, like a long-poll.
+            return await self._call(self._long_poll_executor, handlers.profile_threads, seconds, offload=True)
+
+        if path == "/admin/profile/tasks":
+            if method == "DELETE":
+                return await self._call(self._executor, handlers.reset_task_profiles)
+            if method != "GET":
+                return {"error": "Method not allowed"}, 405
+            return await self._call(self._executor, handlers.task_profile, parse_qs(query).get("task", [None])[0])
+
+        if path.startswith("/jobs/") and path.endswith("/result") and path.count("/") == 3:
+            if method != "GET":
+                return {"error": "Method not allowed"}, 405
+            job_id = unquote(path[len("/jobs/"):-len("/result")])
+            return await self._call(self._executor, handlers.lookup_result, job_id)
+
+        if path.startswith("/jobs/") and "/" not in path[len("/jobs/"):]:
+            if method != "GET":
+                return {"error": "Method not allowed"}, 405
+            # Path segments are percent-decoded, as Flask does.
+            job_id = unquote(path[len("/jobs/"):])
+            params = parse_qs(query)
+            include_result = handlers.parse_flag(params.get("include_result", [None])[0])
+            wait, error = handlers.parse_wait(params.get("wait", [None])[0])
+            if error:
+                return {"error": error}, 400
+            if wait:
+                return await self._call(self._long_poll_executor, handlers.lookup_job, job_id, wait,
+                                        include_result, offload=True)
+            return await self._call(self._executor, handlers.lookup_job, job_id, None, include_result)
+
+        return {"error": "Not found"}, 404
+
+    async def _call(self, executor, func, *args, offload=False):
+        if not (offload or self.offload):
+            return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+
+class _HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+async def _read_request(reader):
+    """Read one request; returns (method, target, keep_alive, body) or None at EOF."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as e:
+        if e.partial.strip():
+            raise _HttpError(400, "Incomplete request")
+        return None
+    except asyncio.LimitOverrunError:
+        raise _HttpError(431, "Request headers too large")
+
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, version = lines[0].split(" ", 2)
+    except ValueError:
+        raise _HttpError(400, "Malformed request line")
+
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    connection = headers.get("connection", "").lower()
+    keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        raise _HttpError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise _HttpError(413, "Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method, target, keep_alive, body
+
+
+def _response(status, payload, keep_alive):
+    if isinstance(payload, str):
+        body = payload.encode()
+        content_type = "text/plain; version=0.0.4"
+    else:
+        body = json.dumps(payload).encode()
+        content_type = "application/json"
+    extra = f"Retry-After: {payload['retry_after']}\r\n" if status == 429 else ""
+    return _head(status, content_type, len(body), keep_alive, extra) + body
+
+
+async def _stream_response(writer, status, body, keep_alive):
+    """Write an already JSON-encoded body (bytes or an mmap) in chunks."""
+    writer.write(_head(status, "application/json", len(body), keep_alive))
+    for chunk in iter_chunks(body):
+        writer.write(chunk)
+        await writer.drain()
+
+
+def _head(status, content_type, length, keep_alive, extra=""):
+    return (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"{extra}"
+            f"Content-Length: {length}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode("latin-1")
+
+
+class StoreManager(BaseManager):
+    """Serves one process's JobStore, JobQueue and metrics registry to API processes."""
+
+
+def serve_store(job_store, job_queue, registry, address, authkey):
+    """Start serving the store on address from a daemon thread in this process."""
+    StoreManager.register("job_store", callable=lambda: job_store)
+    StoreManager.register("job_queue", callable=lambda: job_queue)
+    StoreManager.register("registry", callable=lambda: registry, exposed=("render",))
+    server = StoreManager(address=address, authkey=authkey).get_server()
+    thread = threading.Thread(target=server.serve_forever, name="store-server", daemon=True)
+    thread.start()
+    return server
+
+
+def connect_store(address, authkey, timeout=STORE_CONNECT_TIMEOUT):
+    """Return (job_store, job_queue, registry) proxies to a serve_store process."""
+    StoreManager.register("job_store")
+    StoreManager.register("job_queue")
+    StoreManager.register("registry")
+    manager = StoreManager(address=address, authkey=authkey)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            manager.connect()
+            break
+        except ConnectionError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+    return manager.job_store(), manager.job_queue(), manager.registry()
+
+
+def start_api_processes(count, host, port, store_address, authkey):
+    """Fork count API server processes sharing port through SO_REUSEPORT.
+
+    Each one reaches the store through proxies, so every store call is a
+    round trip to the serving process and runs on the server's thread pool.
+    """
+    context = multiprocessing.get_context("fork")
+    processes = []
+    for _ in range(count):
+        process = context.Process(target=_api_process_main, args=(host, port, store_address, authkey), daemon=True)
+        process.start()
+        processes.append(process)
+    return processes
+
+
+def _api_process_main(host, port, store_address, authkey):
+    # The parent owns shutdown and terminates API processes itself.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    job_store, job_queue, registry = connect_store(store_address, authkey)
+    handlers.init(job_store, job_queue, registry)
+    AsyncApiServer(host, port, offload=True, reuse_port=True).serve_forever()
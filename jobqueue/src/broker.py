@@ -0,0 +1,138 @@
+import logging
+import threading
+import time
+from multiprocessing.managers import BaseManager
+from leases import DEFAULT_LEASE_SECONDS, REAP_INTERVAL_SECONDS, LeaseReaper, requeue_expired
+from worker import JOBS_FINISHED, RETRIES, TIMEOUTS
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on how long one lease call blocks waiting for work.
+MAX_LEASE_WAIT_SECONDS = 30
+BROKER_CONNECT_TIMEOUT = 10
+# Environment variable holding the shared authkey for the broker socket.
+AUTHKEY_ENV = "JOBQUEUE_BROKER_AUTHKEY"
+
+
+class Broker:
+    """Leases queued jobs to workers running in other processes.
+
+    Workers call lease to take up to max_jobs ready jobs in one round trip
+    (prefetch), renew to keep their leases alive while the jobs run, and
+    complete or fail to report outcomes. A job whose lease expires because
+    its worker crashed or hung is reaped: the attempt counts against
+    max_retries and the job is enqueued again for another worker. Outcomes
+    reported after a lease was lost are dropped, so a job is only finished
+    by the worker that holds it.
+
+    All state lives in the JobStore and JobQueue; the broker only holds the
+    lease duration, so it can be served to any number of workers with
+    serve_broker. Expired leases are reaped by the same LeaseReaper that
+    serves local workers, or by start_reaper when the broker runs alone.
+    """
+
+    def __init__(self, job_store, job_queue, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.job_store = job_store
+        self.job_queue = job_queue
+        self.lease_seconds = lease_seconds
+        self._reaper = None
+
+    def lease(self, worker_id, max_jobs=1, wait=1.0):
+        """Lease up to max_jobs ready jobs, waiting up to wait seconds for the first.
+
+        Returns a list of job snapshots, empty if no job became ready in time.
+        """
+        job_id = self.job_queue.dequeue(timeout=min(wait, MAX_LEASE_WAIT_SECONDS))
+        jobs = []
+        while job_id is not None:
+            job = self.job_store.start_job(job_id, owner=worker_id, lease_seconds=self.lease_seconds)
+            if job is not None:
+                jobs.append(job)
+            else:
+                self.job_queue.task_done(job_id)
+            if len(jobs) >= max_jobs:
+                break
+            job_id = self.job_queue.dequeue_nowait()
+        return jobs
+
+    def renew(self, worker_id, job_ids):
+        """Extend worker_id's leases on job_ids; returns the ids whose lease was lost."""
+        return [job_id for job_id in job_ids
+                if not self.job_store.renew_lease(job_id, worker_id, self.lease_seconds)]
+
+    def complete(self, worker_id, job_id, result):
+        """Record a successful result; False if worker_id no longer holds the job."""
+        self.job_queue.task_done(job_id)
+        task_name = self._task_name(job_id)
+        if not self.job_store.update_job_status(job_id, "success", result=result, owner=worker_id):
+            logger.warning(f"Dropped result for job {job_id} from {worker_id}: lease lost")
+            return False
+        JOBS_FINISHED.inc(labels=(task_name, "success"))
+        return True
+
+    def fail(self, worker_id, job_id, error, retry_at=None, timed_out=False):
+        """Record a failed attempt; returns the job's new status, or None if the lease was lost."""
+        self.job_queue.task_done(job_id)
+        job = self.job_store.fail_attempt(job_id, error, retry_at=retry_at, owner=worker_id)
+        if job is None:
+            logger.warning(f"Dropped failure for job {job_id} from {worker_id}: lease lost")
+            return None
+        task_name = job["task_name"]
+        if timed_out:
+            TIMEOUTS.inc(labels=(task_name,))
+        if job["status"] == "pending":
+            RETRIES.inc(labels=(task_name,))
+            self.job_queue.enqueue(job_id, job["priority"], job["tenant"], job["run_at"], task_name)
+        else:
+            JOBS_FINISHED.inc(labels=(task_name, "failed"))
+        return job["status"]
+
+    def reap(self):
+        """Requeue or fail jobs whose leases expired; returns how many were reaped."""
+        return requeue_expired(self.job_store, self.job_queue)
+
+    def start_reaper(self, interval=REAP_INTERVAL_SECONDS):
+        self._reaper = LeaseReaper(self.job_store, self.job_queue, interval)
+        self._reaper.start()
+
+    def stop(self):
+        if self._reaper is not None:
+            self._reaper.stop()
+
+    def _task_name(self, job_id):
+        job = self.job_store.get_job(job_id)
+        return job["task_name"] if job else None
+
+
+class BrokerManager(BaseManager):
+    """Serves a Broker to remote worker processes over an authenticated socket."""
+
+
+def serve_broker(broker, address, authkey):
+    """Start serving broker on address from a daemon thread in this process."""
+    BrokerManager.register("broker", callable=lambda: broker,
+                           exposed=("lease", "renew", "complete", "fail"))
+    server = BrokerManager(address=address, authkey=authkey).get_server()
+    thread = threading.Thread(target=server.serve_forever, name="broker-server", daemon=True)
+    thread.start()
+    return server
+
+
+def connect_broker(address, authkey, timeout=BROKER_CONNECT_TIMEOUT):
+    """Return a proxy to the Broker served at address.
+
+    The proxy opens one connection per calling thread, so worker threads in
+    one process can share it.
+    """
+    BrokerManager.register("broker")
+    manager = BrokerManager(address=address, authkey=authkey)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            manager.connect()
+            break
+        except ConnectionError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+    return manager.broker()
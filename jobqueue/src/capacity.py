@@ -0,0 +1,138 @@
+import math
+import threading
+import time
+
+# Shedding starts once unfinished jobs fill this fraction of max_jobs.
+SHED_FRACTION = 0.8
+# The drain rate behind Retry-After is re-measured over windows of at least
+# this long and smoothed across windows.
+DRAIN_WINDOW_SECONDS = 1.0
+MAX_RETRY_AFTER_SECONDS = 60
+
+
+class CapacityError(Exception):
+    """Jobs were not admitted because a capacity limit is reached.
+
+    retry_after is the number of seconds, at the current drain rate, until
+    there is room for them.
+    """
+
+    def __init__(self, message, retry_after):
+        # Both go in args so the error survives pickling through store proxies.
+        super().__init__(message, retry_after)
+        self.retry_after = retry_after
+
+    def __str__(self):
+        return self.args[0]
+
+
+class CapacityLimits:
+    """Admission control on the number of unfinished jobs, overall and per task.
+
+    A job counts from creation until it succeeds or fails, whether blocked,
+    waiting in the queue or running, so the limits bound the memory held by
+    work that has not finished. admit reserves room for a whole submission
+    or raises CapacityError; the JobStore calls release as jobs finish.
+
+    With shed_below_priority, jobs of lower priority are refused once the
+    store holds SHED_FRACTION of max_jobs, keeping the remaining room for
+    more important work.
+    """
+
+    def __init__(self, max_jobs=None, max_jobs_per_task=None, shed_below_priority=None,
+                 shed_fraction=SHED_FRACTION):
+        self.max_jobs = max_jobs
+        self.max_jobs_per_task = dict(max_jobs_per_task or {})
+        self.shed_below_priority = shed_below_priority
+        self.shed_fraction = shed_fraction
+        self._lock = threading.Lock()
+        self._unfinished = 0
+        self._unfinished_by_task = {}
+        self._finished = 0
+        self._finished_by_task = {}
+        # Drain rate (jobs/sec), overall and per task, as of the last window.
+        self._window_start = time.monotonic()
+        self._window_finished = 0
+        self._window_finished_by_task = {}
+        self._rate = None
+        self._rate_by_task = {}
+
+    def admit(self, specs):
+        """Reserve room for every spec (dicts with task_name and priority), or raise CapacityError."""
+        counts = {}
+        for spec in specs:
+            task_name = spec["task_name"]
+            counts[task_name] = counts.get(task_name, 0) + 1
+        lowest_priority = min((spec.get("priority", 0) for spec in specs), default=0)
+        total = len(specs)
+
+        with self._lock:
+            self._measure_drain()
+            if self.max_jobs is not None:
+                if self._unfinished + total > self.max_jobs:
+                    raise CapacityError(f"Too many unfinished jobs (limit {self.max_jobs})",
+                                        self._retry_after(self._unfinished + total - self.max_jobs, self._rate))
+                shed_at = self.max_jobs * self.shed_fraction
+                if (self.shed_below_priority is not None and lowest_priority < self.shed_below_priority
+                        and self._unfinished + total > shed_at):
+                    raise CapacityError(f"Shedding jobs below priority {self.shed_below_priority} under load",
+                                        self._retry_after(self._unfinished + total - shed_at, self._rate))
+            for task_name, count in counts.items():
+                limit = self.max_jobs_per_task.get(task_name)
+                unfinished = self._unfinished_by_task.get(task_name, 0)
+                if limit is not None and unfinished + count > limit:
+                    raise CapacityError(f"Too many unfinished {task_name} jobs (limit {limit})",
+                                        self._retry_after(unfinished + count - limit, self._rate_by_task.get(task_name)))
+
+            self._unfinished += total
+            for task_name, count in counts.items():
+                self._unfinished_by_task[task_name] = self._unfinished_by_task.get(task_name, 0) + count
+
+    def release(self, task_name, count=1, finished=True):
+        """Free room held by count jobs of task_name.
+
+        finished is False for reservations returned unused (a duplicate
+        client_job_id), which do not count towards the drain rate.
+        """
+        with self._lock:
+            self._unfinished -= count
+            self._unfinished_by_task[task_name] -= count
+            if finished:
+                self._finished += count
+                self._finished_by_task[task_name] = self._finished_by_task.get(task_name, 0) + count
+
+    def restore(self, unfinished_by_task):
+        """Set the unfinished counts, from the jobs recovered at startup."""
+        with self._lock:
+            self._unfinished_by_task = dict(unfinished_by_task)
+            self._unfinished = sum(self._unfinished_by_task.values())
+
+    def unfinished(self, task_name=None):
+        with self._lock:
+            if task_name is None:
+                return self._unfinished
+            return self._unfinished_by_task.get(task_name, 0)
+
+    def _measure_drain(self):
+        # Called with the lock held.
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed < DRAIN_WINDOW_SECONDS:
+            return
+        rate = (self._finished - self._window_finished) / elapsed
+        self._rate = rate if self._rate is None else (self._rate + rate) / 2
+        for task_name, finished in self._finished_by_task.items():
+            rate = (finished - self._window_finished_by_task.get(task_name, 0)) / elapsed
+            previous = self._rate_by_task.get(task_name)
+            self._rate_by_task[task_name] = rate if previous is None else (previous + rate) / 2
+        self._window_start = now
+        self._window_finished = self._finished
+        self._window_finished_by_task = dict(self._finished_by_task)
+
+    def _retry_after(self, excess, rate):
+        """Whole seconds until excess jobs have drained at rate; 1 before any rate is known."""
+        if rate is None:
+            return 1
+        if rate <= 0:
+            return MAX_RETRY_AFTER_SECONDS
+        return max(1, min(MAX_RETRY_AFTER_SECONDS, math.ceil(excess / rate)))
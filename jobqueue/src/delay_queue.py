@@ -0,0 +1,31 @@
+import heapq
+import itertools
+
+class DelayQueue:
+    """Min-heap of items keyed by due time.
+
+    Not thread-safe and runs no threads of its own: the owner calls pop_due
+    from whatever loop already waits on it (JobQueue.dequeue), using
+    next_due to bound how long to sleep.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+
+    def schedule(self, due, item):
+        heapq.heappush(self._heap, (due, next(self._seq), item))
+
+    def next_due(self):
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now):
+        """Remove and return every item due at or before now, earliest first."""
+        due_items = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            due_items.append(heapq.heappop(heap)[2])
+        return due_items
+
+    def __len__(self):
+        return len(self._heap)
@@ -0,0 +1,319 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from timeouts import get_watchdog
+
+logger = logging.getLogger(__name__)
+
+PROCESS_POOL_SIZE = os.cpu_count() or 1
+
+# Upper bound on coroutine tasks running at once on the shared event loop.
+# A worker handing it one more blocks until a slot frees.
+EVENT_LOOP_MAX_IN_FLIGHT = 10_000
+# Threads recording async task outcomes (journal fsync waits, result
+# offload, listeners), so none of that blocks the event loop.
+EVENT_LOOP_OUTCOME_THREADS = 8
+
+# Upper bound on threads running tasks that have a timeout, until
+# size_timeout_pool sets it from the number of workers. A timed-out thread
+# task cannot be interrupted, so it keeps its slot until it returns; once
+# every slot is stuck, new timed jobs time out while queued instead of
+# growing the thread count.
+TIMEOUT_THREAD_POOL_SIZE = 16
+# Slots beyond one per worker, left for timed-out tasks still running.
+TIMEOUT_THREAD_HEADROOM = 16
+
+
+class TaskProcessError(Exception):
+    """A task raised inside a pool process; the message is the task's error."""
+
+
+class ProcessPool:
+    """Fixed-size pool of forked processes that can be killed on timeout.
+
+    Each child serves one task at a time over its own pipe. A timeout
+    registers a kill with the shared DeadlineWatchdog; a killed or crashed
+    child is replaced, so the pool never shrinks and no thread is left
+    running the abandoned task.
+    """
+
+    def __init__(self, size=PROCESS_POOL_SIZE):
+        self.size = size
+        self._context = multiprocessing.get_context("fork")
+        self._idle = queue.LifoQueue()
+        self._started = 0
+        self._lock = threading.Lock()
+        self._spawn_lock = threading.Lock()
+        self._children = set()
+        self._closed = False
+
+    def run(self, func, payload, timeout=None):
+        """Run func(payload) in a child and return its result.
+
+        Raises TimeoutError if timeout passes first (the child is killed) and
+        TaskProcessError if the task raised.
+        """
+        child = self._acquire()
+        try:
+            child.conn.send((func, payload))
+            deadline = get_watchdog().watch(timeout, child.kill) if timeout else None
+            try:
+                status, value = child.conn.recv()
+            except (EOFError, OSError):
+                if deadline is not None and deadline.fired:
+                    raise TimeoutError(f"Job exceeded timeout of {timeout} seconds")
+                raise TaskProcessError("Task process exited unexpectedly")
+            finally:
+                if deadline is not None and not get_watchdog().cancel(deadline):
+                    # The kill raced with the result; never reuse that child.
+                    child.kill()
+
+            if status == "error":
+                raise TaskProcessError(value)
+            return value
+        finally:
+            self._release(child)
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            children = list(self._children)
+            self._children.clear()
+        for child in children:
+            child.kill()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._started < self.size:
+                self._started += 1
+                spawn = True
+            else:
+                spawn = False
+        return self._spawn() if spawn else self._idle.get()
+
+    def _release(self, child):
+        if child.alive():
+            self._idle.put(child)
+            return
+        child.kill()
+        with self._lock:
+            self._children.discard(child)
+            closed = self._closed
+        if not closed:
+            self._idle.put(self._spawn())
+
+    def _spawn(self):
+        # Serialized so no other child is forked while this pipe's child end
+        # is still open here; a stray copy would hide the child's exit.
+        with self._spawn_lock:
+            parent_conn, child_conn = self._context.Pipe()
+            process = self._context.Process(target=_child_main, args=(child_conn,), daemon=True)
+            process.start()
+            child_conn.close()
+        child = _Child(process, parent_conn)
+        with self._lock:
+            self._children.add(child)
+        return child
+
+
+class _Child:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.killed = False
+
+    def alive(self):
+        return not self.killed and self.process.is_alive()
+
+    def kill(self):
+        self.killed = True
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+def _child_main(conn):
+    # Shutdown is driven by the parent; do not run its SIGINT handler here.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while True:
+        try:
+            func, payload = conn.recv()
+        except EOFError:
+            return
+        try:
+            result = ("ok", func(payload))
+        except Exception as e:
+            result = ("error", str(e))
+        try:
+            conn.send(result)
+        except Exception as e:
+            conn.send(("error", f"Task result could not be sent to the worker: {e}"))
+
+
+class EventLoopRunner:
+    """Runs async def tasks on one event loop thread, thousands at a time.
+
+    submit starts a coroutine and returns at once, so the worker thread that
+    called it is free to take the next job; the outcome is handed to a
+    callback on one of outcome_threads when the coroutine ends. Its slot is
+    held until the callback returns, so outcomes cannot pile up faster than
+    they are recorded. Timeouts cancel the coroutine with asyncio.wait_for,
+    so a timed-out task needs no thread and stops at its next await.
+    """
+
+    def __init__(self, max_in_flight=EVENT_LOOP_MAX_IN_FLIGHT, outcome_threads=EVENT_LOOP_OUTCOME_THREADS):
+        self._loop = asyncio.new_event_loop()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._tasks = set()
+        self._outcomes = ThreadPoolExecutor(max_workers=outcome_threads, thread_name_prefix="task-outcome")
+        self.thread = threading.Thread(target=self._loop.run_forever, name="task-event-loop", daemon=True)
+        self.thread.start()
+
+    def submit(self, func, payload, timeout, callback):
+        """Start func(payload) on the loop; callback(result or exception) is called on an outcome thread."""
+        self._slots.acquire()
+        self._loop.call_soon_threadsafe(self._start, func, payload, timeout, callback)
+
+    def in_flight(self):
+        return len(self._tasks)
+
+    def shutdown(self, wait=True):
+        """Stop the loop, after the running coroutines finish if wait, else cancelling them."""
+        asyncio.run_coroutine_threadsafe(self._finish(wait), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self.thread.join()
+        self._loop.close()
+        self._outcomes.shutdown()
+
+    def _start(self, func, payload, timeout, callback):
+        task = self._loop.create_task(self._run(func, payload, timeout, callback))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, func, payload, timeout, callback):
+        stopped = None
+        try:
+            try:
+                if timeout:
+                    outcome = await asyncio.wait_for(func(payload), timeout)
+                else:
+                    outcome = await func(payload)
+            except asyncio.TimeoutError:
+                outcome = TimeoutError(f"Job exceeded timeout of {timeout} seconds")
+            except Exception as e:
+                outcome = e
+            except BaseException as e:
+                # Cancelled by shutdown(wait=False), or the task raised
+                # SystemExit: still a failed attempt, so the job does not
+                # stay running. Re-raised once the outcome is recorded.
+                outcome = RuntimeError(f"Job was stopped by {type(e).__name__}")
+                stopped = e
+            await asyncio.shield(self._loop.run_in_executor(self._outcomes, self._deliver, callback, outcome))
+        finally:
+            self._slots.release()
+        if stopped is not None:
+            raise stopped
+
+    @staticmethod
+    def _deliver(callback, outcome):
+        try:
+            callback(outcome)
+        except Exception:
+            logger.exception("Recording the outcome of an async task failed")
+
+    async def _finish(self, wait):
+        tasks = list(self._tasks)
+        if not wait:
+            for task in tasks:
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+_process_pool = None
+_thread_pool = None
+_thread_pool_size = TIMEOUT_THREAD_POOL_SIZE
+_event_loop = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool():
+    """Return the shared process pool, creating it on first use.
+
+    Children are forked so they inherit the already-imported task modules and
+    never re-run the application entry point.
+    """
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPool(PROCESS_POOL_SIZE)
+        return _process_pool
+
+
+def get_event_loop_runner():
+    """Return the shared EventLoopRunner for async def tasks, starting it on first use."""
+    global _event_loop
+    with _pool_lock:
+        if _event_loop is None:
+            _event_loop = EventLoopRunner(EVENT_LOOP_MAX_IN_FLIGHT)
+        return _event_loop
+
+
+def size_timeout_pool(max_workers):
+    """Give the timeout thread pool a slot per worker plus TIMEOUT_THREAD_HEADROOM; call before it is used."""
+    global _thread_pool_size
+    with _pool_lock:
+        _thread_pool_size = max_workers + TIMEOUT_THREAD_HEADROOM
+
+
+def run_with_timeout(func, payload, timeout):
+    """Run func(payload) on the shared bounded thread pool.
+
+    The timeout runs from when the task starts, not from when it was
+    queued. A task still waiting for a slot after timeout (every slot is
+    held by a timed-out task) times out without running.
+    """
+    global _thread_pool
+    with _pool_lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(max_workers=_thread_pool_size,
+                                              thread_name_prefix="task-timeout")
+        pool = _thread_pool
+
+    started = threading.Event()
+
+    def run(payload):
+        started.set()
+        return func(payload)
+
+    future = pool.submit(run, payload)
+    try:
+        if not started.wait(timeout):
+            raise FutureTimeoutError()
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        raise TimeoutError(f"Job exceeded timeout of {timeout} seconds")
+
+
+def shutdown_executors(wait=True):
+    global _process_pool, _thread_pool, _event_loop
+    with _pool_lock:
+        process_pool, _process_pool = _process_pool, None
+        thread_pool, _thread_pool = _thread_pool, None
+        event_loop, _event_loop = _event_loop, None
+    if event_loop is not None:
+        event_loop.shutdown(wait=wait)
+    if process_pool is not None:
+        process_pool.shutdown()
+    if thread_pool is not None:
+        thread_pool.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,404 @@
+from metrics import REGISTRY, CallbackMetric
+from job_store import JOB_STATUSES, DEFAULT_PAGE_SIZE, DEPENDENCY_POLICIES
+from result_store import ResultRef, resolve
+from payloads import compile_schema
+from capacity import CapacityError
+from log_pipeline import log_event
+from profiling import MAX_SAMPLE_SECONDS, TASK_PROFILES, format_collapsed, sample_stacks
+from tasks import TASKS, TASK_OPTIONS
+from datetime import datetime
+import json
+import logging
+import math
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+MAX_WAIT_SECONDS = 30
+MAX_PAGE_SIZE = 1000
+# run_at, delay and retry backoff may reach at most this far ahead.
+MAX_SCHEDULE_SECONDS = 365 * 24 * 3600
+# Tenant names are interned for the life of the process, so their length is bounded.
+MAX_TENANT_LENGTH = 128
+# Length of a POST /admin/profile sample when ?seconds= is not given.
+DEFAULT_PROFILE_SECONDS = 10
+
+job_store = None
+job_queue = None
+registry = REGISTRY
+
+# Payload validators for tasks that declare a schema in TASK_OPTIONS.
+payload_validators = {
+    task_name: compile_schema(options["schema"])
+    for task_name, options in TASK_OPTIONS.items()
+    if "schema" in options
+}
+
+def init(store, queue, metrics_registry=REGISTRY):
+    """Set the store, queue and metrics registry the handlers operate on.
+
+    Any object with the JobStore / JobQueue / Registry methods works, including
+    multiprocessing proxies to instances living in another process.
+    """
+    global job_store, job_queue, registry
+    job_store = store
+    job_queue = queue
+    registry = metrics_registry
+
+# Read at scrape time from the instances passed to init.
+CallbackMetric("jobqueue_queue_depth", "Jobs ready to run in the JobQueue",
+               lambda: job_queue.qsize() if job_queue else 0)
+CallbackMetric("jobqueue_throttled_jobs", "Ready jobs held back by their task's concurrency or rate limit",
+               lambda: job_queue.throttled_count() if job_queue else 0)
+CallbackMetric("jobqueue_delayed_jobs", "Jobs waiting for their run_at in the JobQueue",
+               lambda: job_queue.delayed_count() if job_queue else 0)
+CallbackMetric("jobqueue_enqueued_total", "Jobs added to the JobQueue, including delayed jobs",
+               lambda: job_queue.enqueued if job_queue else 0, metric_type="counter")
+CallbackMetric("jobqueue_dequeued_total", "Jobs handed to workers by the JobQueue",
+               lambda: job_queue.dequeued if job_queue else 0, metric_type="counter")
+CallbackMetric("jobqueue_store_lock_acquisitions_total", "JobStore shard lock acquisitions",
+               lambda: job_store.lock_acquisitions() if job_store else 0, metric_type="counter")
+
+# Each handler takes already-decoded request data and returns (body, status),
+# so the Flask app and the asyncio server share one implementation.
+
+def submit_job(data):
+    spec, error = parse_job_spec(data)
+    if error:
+        return {"error": error}, 400
+
+    try:
+        [(job_id, status, created)] = job_store.create_jobs([spec])
+    except CapacityError as e:
+        return _over_capacity(e)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    # Blocked jobs are enqueued by the store once their dependencies succeed.
+    if created and status == "pending":
+        job_queue.enqueue(job_id, spec["priority"], spec["tenant"], spec["run_at"], spec["task_name"])
+        log_event(logger, logging.INFO, "job.submitted", "Job %s created and enqueued - task: %s", job_id,
+                  spec["task_name"], job_id=job_id, task=spec["task_name"])
+    elif created:
+        log_event(logger, logging.INFO, "job.submitted", "Job %s created, waiting for %s dependencies", job_id,
+                  len(spec["depends_on"]), job_id=job_id, task=spec["task_name"])
+    else:
+        log_event(logger, logging.INFO, "job.duplicate", "Job %s already exists - returning existing job "
+                  "(client_job_id: %s)", job_id, spec["client_job_id"], job_id=job_id)
+
+    return {"job_id": job_id, "status": status}, 201
+
+def submit_batch(data):
+    items = data.get("jobs") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return {"error": "jobs must be a non-empty list"}, 400
+
+    specs = []
+    refs = {}
+    for index, item in enumerate(items):
+        spec, error = parse_job_spec(item)
+        if error:
+            return {"error": f"jobs[{index}]: {error}"}, 400
+        ref = item.get("ref")
+        if ref is not None:
+            if not isinstance(ref, str) or ref in refs:
+                return {"error": f"jobs[{index}]: ref must be a string unique within the batch"}, 400
+            refs[ref] = index
+        specs.append(spec)
+
+    order = _dependency_order(specs, refs)
+    if order is None:
+        return {"error": "jobs contain a dependency cycle"}, 400
+    # Create parents before children, with refs replaced by batch positions.
+    position = {index: i for i, index in enumerate(order)}
+    ordered = []
+    for index in order:
+        spec = specs[index]
+        if spec["depends_on"]:
+            spec = dict(spec, depends_on=[position[refs[parent]] if parent in refs else parent
+                                          for parent in spec["depends_on"]])
+        ordered.append(spec)
+
+    batch_id = str(uuid.uuid4())
+    try:
+        created_in_order = job_store.create_jobs(ordered, batch_id=batch_id)
+    except CapacityError as e:
+        return _over_capacity(e)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    results = [created_in_order[position[index]] for index in range(len(specs))]
+
+    new_entries = [
+        (job_id, spec["priority"], spec["tenant"], spec["run_at"], spec["task_name"])
+        for spec, (job_id, status, created) in zip(specs, results)
+        if created and status == "pending"
+    ]
+    job_queue.enqueue_many(new_entries)
+    log_event(logger, logging.INFO, "batch.submitted", "Batch of %s jobs requested - %s created and enqueued",
+              len(specs), len(new_entries), batch_id=batch_id, jobs=len(specs))
+
+    return {
+        "batch_id": batch_id,
+        "jobs": [
+            {"job_id": job_id, "status": status, "created": created}
+            for job_id, status, created in results
+        ]
+    }, 201
+
+def lookup_job(job_id, wait=None, include_result=False):
+    """Return a job, long-polling up to wait seconds (capped) for it to finish.
+
+    wait is the raw ?wait= value (see parse_wait). The result is only
+    included when include_result is set; status polls then cost the same
+    however large the result is.
+    """
+    wait, error = parse_wait(wait)
+    if error:
+        return {"error": error}, 400
+    if wait:
+        job = job_store.wait_for_job(job_id, wait)
+    else:
+        job = job_store.get_job(job_id)
+
+    if job is None:
+        return {"error": "Job not found"}, 404
+
+    return serialize_job(job, include_result), 200
+
+def list_jobs(params):
+    """List jobs filtered by ?status=, ?task= and ?created_after=, one page per call.
+
+    params maps query parameter names to single string values. Pages are
+    oldest first; pass next_cursor back as ?cursor= for the next one. counts
+    holds the number of jobs in each status for the task filter (or for all
+    tasks), regardless of the other filters.
+    """
+    status = params.get("status") or None
+    if status is not None and status not in JOB_STATUSES:
+        return {"error": f"status must be one of {', '.join(JOB_STATUSES)}"}, 400
+    task_name = params.get("task") or None
+
+    created_after = params.get("created_after")
+    if created_after:
+        created_after = _parse_timestamp(created_after)
+        if created_after is None:
+            return {"error": "created_after must be an ISO 8601 timestamp or epoch seconds"}, 400
+    else:
+        created_after = None
+
+    try:
+        cursor = int(params.get("cursor") or 0)
+        limit = int(params.get("limit") or DEFAULT_PAGE_SIZE)
+    except ValueError:
+        return {"error": "cursor and limit must be integers"}, 400
+    if cursor < 0 or not 0 < limit <= MAX_PAGE_SIZE:
+        return {"error": f"cursor must be non-negative and limit between 1 and {MAX_PAGE_SIZE}"}, 400
+
+    jobs, next_cursor = job_store.list_jobs(status, task_name, created_after, cursor, limit)
+    return {
+        "jobs": [serialize_job(job) for job in jobs],
+        "next_cursor": None if next_cursor is None else str(next_cursor),
+        "counts": job_store.count_jobs(task_name)
+    }, 200
+
+def lookup_result(job_id):
+    """Return a successful job's JSON-encoded result as bytes, or an mmap of its blob.
+
+    Callers stream the body with result_store.iter_chunks, which also
+    closes the mmap.
+    """
+    job = job_store.get_job(job_id)
+    if job is None:
+        return {"error": "Job not found"}, 404
+    if job["status"] != "success":
+        return {"error": "Job has not succeeded", "status": job["status"]}, 409
+
+    result = job["result"]
+    if isinstance(result, ResultRef):
+        try:
+            return result.open(), 200
+        except FileNotFoundError:
+            logger.error(f"Result blob {result.digest} for job {job_id} is missing")
+            return {"error": "Result is no longer available"}, 410
+    return json.dumps(result).encode(), 200
+
+def render_metrics():
+    return registry.render()
+
+def profile_threads(seconds=None):
+    """Sample every thread of this process for seconds; collapsed stacks as text."""
+    try:
+        seconds = DEFAULT_PROFILE_SECONDS if seconds is None else float(seconds)
+    except ValueError:
+        return {"error": "seconds must be a number"}, 400
+    if not 0 < seconds <= MAX_SAMPLE_SECONDS:
+        return {"error": f"seconds must be greater than 0 and at most {MAX_SAMPLE_SECONDS}"}, 400
+    stacks = sample_stacks(seconds)
+    if stacks is None:
+        return {"error": "A profile is already running"}, 409
+    return format_collapsed(stacks), 200
+
+def task_profile(task_name=None):
+    """Merged cProfile stats of the profiled executions of one task, or of every task."""
+    report = TASK_PROFILES.report(task_name)
+    if report is None:
+        return {"error": f"No profiled executions of {task_name}" if task_name else "No profiled executions"}, 404
+    return report, 200
+
+def reset_task_profiles():
+    TASK_PROFILES.reset()
+    return {"status": "reset"}, 200
+
+def parse_job_spec(data):
+    """Validate a job submission body and map it to JobStore.create_job arguments.
+
+    Returns (spec, None) on success or (None, error message).
+    """
+    if not isinstance(data, dict) or not data.get("task"):
+        return None, "task is required"
+    if not isinstance(data["task"], str) or data["task"] not in TASKS:
+        return None, f"Unknown task: {data['task']}"
+
+    payload = data.get("payload", {})
+    validate = payload_validators.get(data["task"])
+    if validate is not None:
+        error = validate(payload)
+        if error:
+            return None, error
+
+    priority = data.get("priority", 0)
+    if not isinstance(priority, int) or isinstance(priority, bool):
+        return None, "priority must be an integer"
+
+    tenant = data.get("tenant")
+    if tenant is not None and (not isinstance(tenant, str) or not tenant or len(tenant) > MAX_TENANT_LENGTH):
+        return None, f"tenant must be a non-empty string of at most {MAX_TENANT_LENGTH} characters"
+
+    run_at = data.get("run_at")
+    delay = data.get("delay")
+    if run_at is not None and delay is not None:
+        return None, "use either run_at or delay, not both"
+    if isinstance(run_at, str):
+        try:
+            run_at = datetime.fromisoformat(run_at).timestamp()
+        except ValueError:
+            return None, "run_at must be an ISO 8601 timestamp or epoch seconds"
+    elif run_at is not None and (not _is_number(run_at) or not math.isfinite(run_at)):
+        return None, "run_at must be an ISO 8601 timestamp or epoch seconds"
+    if run_at is not None and run_at > time.time() + MAX_SCHEDULE_SECONDS:
+        return None, f"run_at must be at most {MAX_SCHEDULE_SECONDS} seconds ahead"
+    if delay is not None:
+        if not _is_duration(delay):
+            return None, f"delay must be a number of seconds from 0 to {MAX_SCHEDULE_SECONDS}"
+        run_at = time.time() + delay
+
+    for field in ("retry_delay", "max_retry_delay"):
+        value = data.get(field)
+        if value is not None and not _is_duration(value):
+            return None, f"{field} must be a number of seconds from 0 to {MAX_SCHEDULE_SECONDS}"
+
+    depends_on = data.get("depends_on")
+    if depends_on is not None:
+        if not isinstance(depends_on, list) or not all(isinstance(parent, str) and parent for parent in depends_on):
+            return None, "depends_on must be a list of job ids"
+        depends_on = list(dict.fromkeys(depends_on))
+    on_parent_failure = data.get("on_parent_failure")
+    if on_parent_failure is not None and on_parent_failure not in DEPENDENCY_POLICIES:
+        return None, f"on_parent_failure must be one of {', '.join(DEPENDENCY_POLICIES)}"
+
+    return {
+        "task_name": data["task"],
+        "payload": payload,
+        "max_retries": data.get("max_retries", 3),
+        "client_job_id": data.get("client_job_id"),
+        "timeout": data.get("timeout"),
+        "priority": priority,
+        "tenant": tenant,
+        "run_at": run_at,
+        "retry_delay": data.get("retry_delay"),
+        "max_retry_delay": data.get("max_retry_delay"),
+        "depends_on": depends_on or None,
+        "on_parent_failure": on_parent_failure
+    }, None
+
+def _over_capacity(error):
+    """429 for a submission refused by admission control; the API servers copy retry_after to Retry-After."""
+    # Debug, not warning: under overload this fires for most submissions.
+    log_event(logger, logging.DEBUG, "job.rejected", "Submission rejected: %s - retry after %ss", error,
+              error.retry_after)
+    return {"error": str(error), "retry_after": error.retry_after}, 429
+
+def _dependency_order(specs, refs):
+    """Return spec indexes with every ref'd parent before its children, or None on a cycle."""
+    children = {}
+    waiting = []
+    for index, spec in enumerate(specs):
+        parents = [refs[parent] for parent in spec["depends_on"] or () if parent in refs]
+        for parent in parents:
+            children.setdefault(parent, []).append(index)
+        waiting.append(len(parents))
+    # Jobs without parents in the batch keep their submission order.
+    order = [index for index, count in enumerate(waiting) if count == 0]
+    for index in order:
+        for child in children.get(index, ()):
+            waiting[child] -= 1
+            if waiting[child] == 0:
+                order.append(child)
+    return order if len(order) == len(specs) else None
+
+def _parse_timestamp(value):
+    """Parse epoch seconds or an ISO 8601 timestamp from a query string; None if invalid."""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return None
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _is_duration(value):
+    # Also rules out inf and nan, which json.loads accepts as Infinity and NaN.
+    return _is_number(value) and 0 <= value <= MAX_SCHEDULE_SECONDS
+
+def serialize_job(job, include_result=False):
+    body = {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "task_name": job["task_name"],
+        "attempts": job["attempts"],
+        "max_retries": job["max_retries"],
+        "priority": job["priority"],
+        "tenant": job["tenant"],
+        "run_at": job["run_at"],
+        "error": job.get("error"),
+        "created_at": str(datetime.fromtimestamp(job["created_at"])),
+        "updated_at": str(datetime.fromtimestamp(job["updated_at"]))
+    }
+    if include_result:
+        body["result"] = resolve(job.get("result"))
+    return body
+
+def parse_wait(value):
+    """Parse ?wait= into seconds, capped at MAX_WAIT_SECONDS.
+
+    Returns (seconds or None, None), or (None, error message) for anything
+    but a finite number of at least 0.
+    """
+    if value is None or value == "":
+        return None, None
+    try:
+        wait = float(value)
+    except (TypeError, ValueError):
+        return None, "wait must be a number of seconds"
+    if not math.isfinite(wait) or wait < 0:
+        return None, "wait must be a finite number of seconds, at least 0"
+    return min(wait, MAX_WAIT_SECONDS), None
+
+def parse_flag(value):
+    """Interpret a query string flag such as ?include_result=1."""
+    return value is not None and value.lower() in ("1", "true", "yes")
@@ -0,0 +1,45 @@
+import pickle
+import sqlite3
+import threading
+from job_record import JobRecord
+
+
+class JobArchive:
+    """On-disk store for finished jobs evicted from memory.
+
+    A single SQLite table maps job_id to the pickled job tuple. Writes are
+    batched into one transaction per eviction pass; reads only happen when
+    get_job misses in memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, record BLOB NOT NULL)")
+
+    def put_many(self, jobs):
+        rows = [(job.job_id, pickle.dumps(job.to_tuple(), protocol=pickle.HIGHEST_PROTOCOL)) for job in jobs]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("INSERT OR REPLACE INTO jobs (job_id, record) VALUES (?, ?)", rows)
+            self._conn.execute("COMMIT")
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT record FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return JobRecord.from_tuple(pickle.loads(row[0]))
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
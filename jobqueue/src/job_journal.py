@@ -0,0 +1,190 @@
+import logging
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct("<II")
+
+
+class WriteAheadLog:
+    """Append-only, checksummed record log with group commit.
+
+    Records are appended to an in-memory buffer by the caller and written by a
+    single flusher thread, which fsyncs once per group of records. Callers
+    that need durability wait on the sequence number append returned, so many
+    concurrent writers share one fsync instead of each paying for their own.
+    """
+
+    def __init__(self, path, flush_interval=0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._next_seq = 0
+        self._durable_seq = 0
+        self._cond = threading.Condition(threading.Lock())
+        self._file = None
+        self._flusher = None
+        self._closed = False
+        self._stopped = False
+        self._error = None
+        self._valid_length = None
+
+    def replay(self):
+        """Yield every intact record in the log, oldest first.
+
+        A torn record at the tail (from a crash mid-write) ends the replay and
+        is truncated away once the log is reopened.
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            data = memoryview(f.read())
+
+        offset = 0
+        end = len(data)
+        while offset + _HEADER.size <= end:
+            length, checksum = _HEADER.unpack_from(data, offset)
+            start = offset + _HEADER.size
+            body = data[start:start + length]
+            if len(body) < length or zlib.crc32(body) != checksum:
+                break
+            yield pickle.loads(body)
+            offset = start + length
+        self._valid_length = offset
+
+    def rewrite(self, records):
+        """Atomically replace the log with records and open it for appends.
+
+        Used after recovery, before the first append, to compact the log down
+        to one record per live job so the next replay is proportional to live
+        state rather than history.
+        """
+        tmp_path = self.path + ".compact"
+        with open(tmp_path, "wb") as f:
+            chunk = []
+            for record in records:
+                chunk.append(self._encode(record))
+                if len(chunk) >= 10000:
+                    f.write(b"".join(chunk))
+                    chunk = []
+            f.write(b"".join(chunk))
+            f.flush()
+            os.fsync(f.fileno())
+            length = f.tell()
+        os.replace(tmp_path, self.path)
+        with self._cond:
+            self._valid_length = length
+            if self._file is None:
+                self._open_locked()
+
+    def append(self, record):
+        """Buffer a record and return its sequence number for wait_durable."""
+        return self.append_many((record,))
+
+    def append_many(self, records):
+        encoded = [self._encode(record) for record in records]
+        with self._cond:
+            if self._file is None:
+                self._open_locked()
+            self._buffer.extend(encoded)
+            self._next_seq += len(encoded)
+            self._cond.notify_all()
+            return self._next_seq
+
+    def wait_durable(self, seq):
+        """Block until every record up to seq has been fsynced.
+
+        Raises the flusher's error if writing the log failed.
+        """
+        with self._cond:
+            while self._durable_seq < seq:
+                if self._error is not None:
+                    raise self._error
+                if self._stopped:
+                    raise RuntimeError("Write-ahead log is closed")
+                self._cond.wait()
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self._flusher is not None:
+            self._flusher.join()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _encode(self, record):
+        body = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        return _HEADER.pack(len(body), zlib.crc32(body)) + body
+
+    def _open_locked(self):
+        if self._valid_length is None:
+            self._valid_length = self._scan_valid_length()
+        valid_length = self._valid_length
+        self._file = open(self.path, "ab")
+        if self._file.tell() != valid_length:
+            self._file.truncate(valid_length)
+            self._file.seek(valid_length)
+        self._flusher = threading.Thread(target=self._flush_loop, name="wal-flusher", daemon=True)
+        self._flusher.start()
+
+    def _scan_valid_length(self):
+        if not os.path.exists(self.path):
+            return 0
+        length = 0
+        with open(self.path, "rb") as f:
+            while True:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    break
+                size, checksum = _HEADER.unpack(header)
+                body = f.read(size)
+                if len(body) < size or zlib.crc32(body) != checksum:
+                    break
+                length += _HEADER.size + size
+        return length
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while not self._buffer and not self._closed:
+                    self._cond.wait()
+                if not self._buffer and self._closed:
+                    self._stopped = True
+                    self._cond.notify_all()
+                    return
+
+            # Give concurrent writers a moment to join this group.
+            if self.flush_interval:
+                time.sleep(self.flush_interval)
+
+            with self._cond:
+                chunk = self._buffer
+                self._buffer = []
+                target_seq = self._next_seq
+
+            try:
+                self._file.write(b"".join(chunk))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except OSError as e:
+                # Nothing after this can be made durable; fail every waiter
+                # now instead of leaving them blocked.
+                logger.error(f"Write-ahead log {self.path} failed, no further records are durable: {e}")
+                with self._cond:
+                    self._error = e
+                    self._stopped = True
+                    self._cond.notify_all()
+                return
+
+            with self._cond:
+                self._durable_seq = target_seq
+                self._cond.notify_all()
@@ -1,11 +1,264 @@
-from queue import Queue
+import heapq
+import itertools
+import math
+import threading
+import time
+from delay_queue import DelayQueue
+
+DEFAULT_TENANT = "default"
+
+# A job waiting this many seconds gains one priority level over new arrivals,
+# so low-priority work is delayed but never starved.
+AGING_SECONDS_PER_LEVEL = 10.0
 
 class JobQueue:
-    def __init__(self):
-        self._queue = Queue()
-    
-    def enqueue(self, job_id):
-        self._queue.put(job_id)
-
-    def dequeue(self):
-        return self._queue.get()
\ No newline at end of file
+    """Priority queue with weighted fair-share across tenants.
+
+    Each tenant has its own heap ordered by an aged priority key: the enqueue
+    time minus priority * aging_seconds. Tenants with queued work sit in a
+    second heap ordered by stride-scheduling pass values; every dequeue serves
+    the tenant with the lowest pass and advances it by 1 / weight. Enqueue and
+    dequeue are O(log n) in the tenant's queue plus O(log t) in the tenant count.
+
+    Jobs given a future run_at (epoch seconds) wait in a DelayQueue and are
+    released into their tenant's heap by dequeue once due, so scheduled jobs
+    and retry backoff need no timer thread.
+
+    wait_seconds totals the time dequeued jobs spent ready in the queue, so
+    the mean queue wait over an interval is the change in wait_seconds over
+    the change in dequeued.
+
+    task_limits maps task names to TaskLimits (see task_limits.py). A ready
+    job whose task is at its in-flight limit or out of rate tokens is parked
+    when dequeue reaches it, and dequeue moves on to the next job, so a
+    throttled task never holds up other tasks. Parked jobs keep their place
+    and go back to their tenant's heap as the task's limit frees up: on
+    task_done, which consumers call for every job they took, or when the
+    task's next token is due. qsize counts ready jobs that are not parked.
+    """
+
+    def __init__(self, tenant_weights=None, aging_seconds=AGING_SECONDS_PER_LEVEL, task_limits=None):
+        self.aging_seconds = aging_seconds
+        self._weights = dict(tenant_weights or {})
+        self._limits = dict(task_limits or {})
+        # Parked jobs of throttled tasks, a heap per task, and the handed-out
+        # jobs holding an in-flight slot of a limited task.
+        self._parked = {}
+        self._throttled = 0
+        self._in_flight = {}
+        self._tenant_queues = {}
+        self._tenant_pass = {}
+        self._active_tenants = []
+        # (pass, tenant) of emptied tenants still ahead of the virtual time;
+        # their passes are dropped once it catches up.
+        self._idle_tenants = []
+        self._virtual_time = 0.0
+        self._size = 0
+        # Totals for metrics, updated under the queue lock already held.
+        self.enqueued = 0
+        self.dequeued = 0
+        self.wait_seconds = 0.0
+        self._seq = itertools.count()
+        self._delayed = DelayQueue()
+        self._not_empty = threading.Condition(threading.Lock())
+
+    def enqueue(self, job_id, priority=0, tenant=None, run_at=None, task_name=None):
+        self.enqueue_many(((job_id, priority, tenant, run_at, task_name),))
+
+    def enqueue_many(self, entries):
+        """Enqueue (job_id, priority, tenant, run_at, task_name) entries under a single lock acquisition.
+
+        run_at is an epoch timestamp or None to make the job ready immediately.
+        task_name selects the job's TaskLimit; None means unlimited.
+        """
+        entries = list(entries)
+        if not entries:
+            return
+        now = time.monotonic()
+        wall_now = time.time()
+        with self._not_empty:
+            self.enqueued += len(entries)
+            delayed = False
+            for job_id, priority, tenant, run_at, task_name in entries:
+                if run_at is not None and run_at > wall_now:
+                    self._delayed.schedule(now + (run_at - wall_now), (job_id, priority, tenant, task_name))
+                    delayed = True
+                else:
+                    self._push(job_id, priority, tenant, task_name, now)
+            if delayed:
+                # Every idle consumer re-arms its wait for the new earliest due time.
+                self._not_empty.notify_all()
+            else:
+                self._not_empty.notify(len(entries))
+
+    def dequeue(self, timeout=None, cancelled=None):
+        """Return the next ready job_id, blocking until one is ready.
+
+        With a timeout, gives up after that many seconds and returns None.
+        Also returns None once the cancelled Event is set and wake_all is
+        called, which is how a Worker blocked here is stopped.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._not_empty:
+            while True:
+                if cancelled is not None and cancelled.is_set():
+                    return None
+                self._release_due()
+                if self._size:
+                    job_id = self._pop()
+                    if job_id is not None:
+                        return job_id
+                wake_at = self._delayed.next_due()
+                if self._parked:
+                    unthrottle_at = self._next_unthrottle()
+                    if unthrottle_at is not None:
+                        wake_at = unthrottle_at if wake_at is None else min(wake_at, unthrottle_at)
+                if deadline is not None:
+                    if time.monotonic() >= deadline:
+                        return None
+                    wake_at = deadline if wake_at is None else min(wake_at, deadline)
+                # Condition.wait overflows on timeouts beyond TIMEOUT_MAX.
+                self._not_empty.wait(None if wake_at is None else min(wake_at - time.monotonic(), threading.TIMEOUT_MAX))
+
+    def dequeue_nowait(self):
+        """Return the next ready job_id, or None if none is ready."""
+        with self._not_empty:
+            self._release_due()
+            if self._size:
+                return self._pop()
+            return None
+
+    def task_done(self, job_id):
+        """Free the in-flight slot job_id took from its task's limit when it was dequeued.
+
+        Consumers call this once they are done with every job they dequeued,
+        whatever happened to it. Jobs of unlimited tasks hold no slot, and
+        extra calls are ignored.
+        """
+        if job_id not in self._in_flight:
+            return
+        with self._not_empty:
+            task_name = self._in_flight.pop(job_id, None)
+            if task_name is None:
+                return
+            self._limits[task_name].release()
+            if task_name in self._parked:
+                size = self._size
+                self._unpark(task_name, time.monotonic())
+                self._not_empty.notify(self._size - size)
+
+    def wake_all(self):
+        """Wake every blocked dequeue so it re-checks its cancelled Event."""
+        with self._not_empty:
+            self._not_empty.notify_all()
+
+    def qsize(self):
+        return self._size
+
+    def delayed_count(self):
+        return len(self._delayed)
+
+    def throttled_count(self):
+        """Ready jobs parked because their task is at its concurrency or rate limit."""
+        return self._throttled
+
+    def set_tenant_weight(self, tenant, weight):
+        if weight <= 0:
+            raise ValueError("weight must be positive")
+        with self._not_empty:
+            self._weights[tenant or DEFAULT_TENANT] = weight
+
+    def _release_due(self):
+        now = time.monotonic()
+        if self._parked:
+            for task_name in list(self._parked):
+                self._unpark(task_name, now)
+        if self._delayed.next_due() is None or self._delayed.next_due() > now:
+            return
+        released = self._delayed.pop_due(now)
+        for job_id, priority, tenant, task_name in released:
+            self._push(job_id, priority, tenant, task_name, now)
+        # The caller takes one; wake other consumers for the rest.
+        self._not_empty.notify(len(released) - 1)
+
+    def _unpark(self, task_name, now):
+        """Move as many parked jobs of task_name back to their tenants' heaps as its limit allows now."""
+        parked = self._parked[task_name]
+        count = self._limits[task_name].available(now)
+        while count > 0 and parked:
+            key, seq, job_id, ready_at, tenant = heapq.heappop(parked)
+            self._push_entry(tenant, (key, seq, job_id, ready_at, task_name))
+            self._throttled -= 1
+            count -= 1
+        if not parked:
+            del self._parked[task_name]
+
+    def _next_unthrottle(self):
+        """Earliest time a parked job's task gets a rate token, ignoring tasks waiting on task_done."""
+        now = time.monotonic()
+        times = [self._limits[task_name].ready_at(now) for task_name in self._parked]
+        return min((at for at in times if at is not None), default=None)
+
+    def _push(self, job_id, priority, tenant, task_name, now):
+        key = now - (priority or 0) * self.aging_seconds
+        self._push_entry(tenant or DEFAULT_TENANT, (key, next(self._seq), job_id, now, task_name))
+
+    def _push_entry(self, tenant, entry):
+        tenant_queue = self._tenant_queues.get(tenant)
+        if tenant_queue is None:
+            tenant_queue = self._tenant_queues[tenant] = []
+        if not tenant_queue:
+            # A tenant returning from idle starts at the current virtual time
+            # instead of cashing in the turns it skipped while empty.
+            tenant_pass = max(self._tenant_pass.get(tenant, 0.0), self._virtual_time)
+            self._tenant_pass[tenant] = tenant_pass
+            heapq.heappush(self._active_tenants, (tenant_pass, next(self._seq), tenant))
+
+        heapq.heappush(tenant_queue, entry)
+        self._size += 1
+
+    def _pop(self):
+        """Hand out the next job, parking throttled ones on the way; None if every ready job is throttled."""
+        while self._active_tenants:
+            tenant_pass, _, tenant = heapq.heappop(self._active_tenants)
+            tenant_queue = self._tenant_queues[tenant]
+            key, seq, job_id, ready_at, task_name = heapq.heappop(tenant_queue)
+            self._size -= 1
+
+            limit = self._limits.get(task_name) if self._limits else None
+            served = limit is None or limit.available(time.monotonic()) > 0
+            if served:
+                self._virtual_time = tenant_pass
+                self._forget_idle_tenants()
+                self.dequeued += 1
+                self.wait_seconds += time.monotonic() - ready_at
+                tenant_pass += 1.0 / self._weights.get(tenant, 1.0)
+                self._tenant_pass[tenant] = tenant_pass
+                if limit is not None:
+                    limit.acquire()
+                    self._in_flight[job_id] = task_name
+            else:
+                # The tenant keeps its turn; only served jobs advance its pass.
+                heapq.heappush(self._parked.setdefault(task_name, []), (key, seq, job_id, ready_at, tenant))
+                self._throttled += 1
+
+            if tenant_queue:
+                heapq.heappush(self._active_tenants, (tenant_pass, next(self._seq), tenant))
+            else:
+                del self._tenant_queues[tenant]
+                # A returning tenant restarts at the virtual time anyway, so
+                # only a pass still ahead of it needs remembering.
+                if tenant_pass <= self._virtual_time:
+                    del self._tenant_pass[tenant]
+                else:
+                    heapq.heappush(self._idle_tenants, (tenant_pass, tenant))
+            if served:
+                return job_id
+        return None
+
+    def _forget_idle_tenants(self):
+        idle = self._idle_tenants
+        while idle and idle[0][0] <= self._virtual_time:
+            _, tenant = heapq.heappop(idle)
+            if tenant not in self._tenant_queues and self._tenant_pass.get(tenant, math.inf) <= self._virtual_time:
+                del self._tenant_pass[tenant]
@@ -0,0 +1,91 @@
+import sys
+from operator import attrgetter
+from payloads import decode_payload
+
+# Field order for journaled and archived jobs; to_tuple and from_tuple use it.
+JOB_FIELDS = ("job_id", "task_name", "payload", "status", "attempts", "max_retries",
+              "result", "error", "timeout", "priority", "tenant", "run_at", "retry_delay", "max_retry_delay",
+              "created_at", "updated_at", "depends_on", "on_parent_failure")
+
+_FIELD_SET = frozenset(JOB_FIELDS)
+_get_fields = attrgetter(*JOB_FIELDS)
+
+
+class JobRecord:
+    """Compact job state with dict-style field access.
+
+    A slotted object is about a third of the size of the equivalent dict, and
+    timestamps are epoch floats rather than datetime objects. Task names,
+    statuses and tenants are interned so millions of jobs share one copy of
+    each string. job["status"], job.get("timeout") and dict(job) all work, so
+    callers treat it like the dicts jobs used to be.
+
+    The payload attribute holds the payload as the JobStore encoded it (see
+    payloads.py); job["payload"] and job.get("payload") decode it.
+    """
+
+    # seq is the job's creation number in the JobStore listing index, and
+    # waiting the number of parents a blocked job still waits for. Neither is
+    # journaled or copied; both are rebuilt on recovery.
+    __slots__ = JOB_FIELDS + ("seq", "waiting")
+
+    def __init__(self, job_id, task_name, payload, status="pending", attempts=0, max_retries=3,
+                 result=None, error=None, timeout=None, priority=0, tenant=None, run_at=None,
+                 retry_delay=None, max_retry_delay=None, created_at=0.0, updated_at=0.0,
+                 depends_on=None, on_parent_failure=None):
+        self.job_id = job_id
+        self.task_name = sys.intern(task_name)
+        self.payload = payload
+        self.status = sys.intern(status)
+        self.attempts = attempts
+        self.max_retries = max_retries
+        self.result = result
+        self.error = error
+        self.timeout = timeout
+        self.priority = priority
+        self.tenant = sys.intern(tenant) if tenant else tenant
+        self.run_at = run_at
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.depends_on = depends_on
+        self.on_parent_failure = on_parent_failure
+        self.seq = None
+        self.waiting = 0
+
+    @classmethod
+    def from_tuple(cls, fields):
+        return cls(*fields)
+
+    def to_tuple(self):
+        return _get_fields(self)
+
+    def copy(self):
+        return JobRecord(*self.to_tuple())
+
+    def keys(self):
+        return JOB_FIELDS
+
+    def get(self, key, default=None):
+        if key in _FIELD_SET:
+            return self[key]
+        return default
+
+    def __getitem__(self, key):
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        if key == "payload":
+            return decode_payload(self.payload)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in _FIELD_SET
+
+    def __repr__(self):
+        return f"JobRecord({self.job_id!r}, {self.task_name!r}, status={self.status!r})"
@@ -1,69 +1,1010 @@
+import bisect
+import gc
+import heapq
+import itertools
 import threading
+import time
 import uuid
-from datetime import date, datetime
+from collections import OrderedDict
+from operator import attrgetter, itemgetter
+from job_record import JobRecord
+from payloads import encode_payload
+from metrics import Histogram, LOCK_BUCKETS, timed_lock
+
+TERMINAL_STATUSES = ("success", "failed")
+# Blocked jobs wait for the jobs they depend on and are not in the queue.
+JOB_STATUSES = ("blocked", "pending", "running") + TERMINAL_STATUSES
+
+# What a dependent job does when a parent fails: fail too, or run once every
+# parent has finished either way.
+DEPENDENCY_POLICIES = ("fail", "run")
+
+# Number of lock stripes for jobs and, separately, for client_job_ids. Must be
+# a power of two.
+NUM_SHARDS = 64
+
+# The listing index groups jobs into blocks of this many consecutive creation
+# numbers, so a listing skips a block with no matching jobs in one lookup.
+INDEX_BLOCK_SIZE = 1024
+DEFAULT_PAGE_SIZE = 100
+
+
+LOCK_WAIT = Histogram("jobqueue_store_lock_wait_seconds",
+                      "Time spent blocked acquiring a JobStore shard lock (contended acquisitions only)",
+                      ["lock"], buckets=LOCK_BUCKETS)
+LOCK_HOLD = Histogram("jobqueue_store_lock_hold_seconds",
+                      "Time a JobStore shard lock was held, sampled", ["lock"], buckets=LOCK_BUCKETS)
+QUEUE_WAIT = Histogram("jobqueue_job_queue_wait_seconds",
+                       "Time from a job becoming ready to a worker starting it", ["task"])
+
+
+class _JobShard:
+    __slots__ = ("lock", "jobs", "waiters", "finished", "leases", "lease_deadlines", "index", "blocks",
+                 "status_counts", "children", "archiving")
 
-class JobStore:
     def __init__(self):
-        self._jobs = {}
-        self._lock = threading.Lock()
-        self._client_job_ids = {}
+        self.lock = timed_lock(LOCK_WAIT, LOCK_HOLD, ("job",))
+        self.jobs = {}
+        self.waiters = {}
+        # Finished job_id -> time it finished or was last read, least recent first.
+        self.finished = OrderedDict()
+        # Running job_id -> (owner, monotonic deadline), and a min-heap of
+        # (deadline, job_id) over them. Renewals push a new entry; entries
+        # that no longer match the lease are skipped when popped.
+        self.leases = {}
+        self.lease_deadlines = []
+        # Listing index: (task_name, status, block) -> {seq: job_id}, the
+        # sorted blocks that have a bucket for each (task_name, status), and
+        # (task_name, status) -> number of jobs.
+        self.index = {}
+        self.blocks = {}
+        self.status_counts = {}
+        # Unfinished job_id -> ids of blocked jobs that depend on it.
+        self.children = {}
+        # Evicted job_id -> job, until its archive write commits.
+        self.archiving = {}
+
+
+class _ClientIdShard:
+    __slots__ = ("lock", "job_ids")
+
+    def __init__(self):
+        self.lock = timed_lock(LOCK_WAIT, LOCK_HOLD, ("client_id",))
+        self.job_ids = {}
+
+
+class JobStore:
+    """Thread-safe job state, striped across NUM_SHARDS locks.
+
+    Jobs are placed in a shard by the hash of their job_id and client_job_ids
+    in an independently sharded index, so API threads and workers touching
+    different jobs rarely contend on the same lock.
+
+    Finished jobs are retained for retention_seconds after they finish or
+    were last read, and at most max_retained_jobs of them are kept, least
+    recently used first out. Evicted jobs are written to archive if one is
+    given, where get_job still finds them, and are otherwise dropped. Both
+    limits default to None (keep everything).
+
+    With a result_store, large results are written there and the job keeps a
+    ResultRef in place of the result (see result_store.resolve).
 
-    def create_job(self, task_name, payload, max_retries=3, client_job_id=None, timeout=None):
+    A job can be started under a lease held by an owner until a deadline.
+    Updates passing owner= are ignored once that owner has lost the lease,
+    and reap_expired_leases returns the jobs of owners that stopped renewing.
+    Leases are not journaled: on recovery every running job is pending again.
 
-        if client_job_id:
-            with self._lock:
-                existing_job_id = self._client_job_ids.get(client_job_id)
-                if existing_job_id:
-                    return existing_job_id
+    Every retained job is also in a listing index by status, by task_name and
+    by creation order, updated with each status transition under the same
+    shard lock, which list_jobs and count_jobs read without scanning jobs.
 
-        job_id = str(uuid.uuid4())
+    A job created with depends_on stays blocked until those jobs finish. Each
+    unfinished parent keeps a list of its blocked children and each child a
+    count of parents it still waits for, so a parent finishing touches only
+    its own children. Children released to pending are passed to the
+    callback set with set_ready_callback, normally JobQueue.enqueue_many.
 
-        now = datetime.now()
+    With capacity (a CapacityLimits), create_jobs raises CapacityError
+    instead of creating jobs beyond its limits, and every job that finishes
+    frees its room again.
+    """
 
-        job = {
-            "job_id": job_id,
+    def __init__(self, journal=None, num_shards=NUM_SHARDS, archive=None,
+                 retention_seconds=None, max_retained_jobs=None, result_store=None, capacity=None):
+        self._shard_mask = num_shards - 1
+        self._shards = [_JobShard() for _ in range(num_shards)]
+        self._client_shards = [_ClientIdShard() for _ in range(num_shards)]
+        self._batches = {}
+        self._batch_lock = threading.Lock()
+        self._listeners = ()
+        self._listener_lock = threading.Lock()
+        self._ready_callback = None
+        self._journal = journal
+        self._archive = archive
+        self._result_store = result_store
+        self._capacity = capacity
+        self.retention_seconds = retention_seconds
+        self._max_retained_per_shard = None
+        self._sweep_order = itertools.count()
+        self._seq_lock = threading.Lock()
+        self._next_seq = 0
+        # Latest created_at in each index block; never decreases, so
+        # created_after maps to a starting block by bisection.
+        self._block_created = []
+        if max_retained_jobs is not None:
+            self._max_retained_per_shard = max(1, max_retained_jobs // num_shards)
+
+    def create_job(self, task_name, payload, max_retries=3, client_job_id=None, timeout=None,
+                   priority=0, tenant=None, run_at=None, retry_delay=None, max_retry_delay=None,
+                   depends_on=None, on_parent_failure=None):
+        spec = {
             "task_name": task_name,
             "payload": payload,
-            "status": "pending",
-            "attempts": 0,
             "max_retries": max_retries,
-            "result": None,
-            "error": None,
+            "client_job_id": client_job_id,
             "timeout": timeout,
-            "created_at": now,
-            "updated_at": now
+            "priority": priority,
+            "tenant": tenant,
+            "run_at": run_at,
+            "retry_delay": retry_delay,
+            "max_retry_delay": max_retry_delay,
+            "depends_on": depends_on,
+            "on_parent_failure": on_parent_failure
         }
+        return self.create_jobs([spec])[0][0]
 
-        with self._lock:
-            self._jobs[job_id] = job
-            if client_job_id:
-                self._client_job_ids[client_job_id] = job_id
+    def create_jobs(self, specs, batch_id=None):
+        """Create many jobs with one lock acquisition per shard touched.
 
-        return job_id
-    
-    def get_job(self, job_id):
-        with self._lock:
-            return self._jobs.get(job_id)
+        Each spec is a dict with the same keys as create_job's arguments
+        (task_name, payload, max_retries, client_job_id, timeout, priority,
+        tenant, run_at, retry_delay, max_retry_delay, depends_on,
+        on_parent_failure). Returns a list of (job_id, status, created)
+        tuples in spec order; created is False when the spec's client_job_id
+        already maps to an existing job. When batch_id is given, the resulting
+        job ids are recorded under it.
+
+        depends_on lists existing job ids, or the int index of an earlier spec
+        in the same call, so a whole DAG can be created at once. Jobs with
+        dependencies are created blocked and released to the ready callback,
+        never returned as pending, so callers enqueue only pending jobs.
+        Raises ValueError, before creating anything, for unknown dependencies,
+        and CapacityError when the jobs would exceed the capacity limits.
+
+        New jobs are inserted before their client_job_ids are claimed, so a
+        claimed id always resolves to a stored job. Jobs that lose the claim
+        to an earlier submission are removed again before anyone sees them.
+        """
+        self._check_dependencies(specs)
+        if self._capacity is not None:
+            # A resubmission of an already claimed client_job_id creates
+            # nothing, so it needs no room; this check is only a shortcut,
+            # and a claim lost to a concurrent submission is released below.
+            admitted = [not self._is_claimed(spec.get("client_job_id")) for spec in specs]
+            self._capacity.admit([spec for spec, reserved in zip(specs, admitted) if reserved])
+        jobs = [_new_job(spec) for spec in specs]
+        self._number_jobs(jobs, stamp=True)
+
+        for shard, group in self._group_by_shard(jobs, lambda job: job.job_id):
+            with shard.lock:
+                for job in group:
+                    shard.jobs[job.job_id] = job
+                    self._index_job(shard, job, 1)
+
+        results = [(job.job_id, job.status, True) for job in jobs]
+        claimed = [(index, spec["client_job_id"]) for index, spec in enumerate(specs) if spec.get("client_job_id")]
+        losers = []
+        for client_shard, group in self._group_by_client_shard(claimed):
+            with client_shard.lock:
+                for index, client_job_id in group:
+                    existing_job_id = client_shard.job_ids.get(client_job_id)
+                    if existing_job_id:
+                        results[index] = (existing_job_id, None, False)
+                        losers.append(index)
+                    else:
+                        client_shard.job_ids[client_job_id] = jobs[index]["job_id"]
+
+        for shard, group in self._group_by_shard([jobs[index] for index in losers], lambda job: job.job_id):
+            with shard.lock:
+                for job in group:
+                    del shard.jobs[job.job_id]
+                    self._index_job(shard, job, -1)
+        if self._capacity is not None:
+            for index in losers:
+                if admitted[index]:
+                    self._capacity.release(jobs[index].task_name, finished=False)
+
+        for index, (job_id, status, created) in enumerate(results):
+            if status is None:
+                existing = self.get_job(job_id)
+                results[index] = (job_id, existing["status"] if existing else "pending", False)
+
+        # Dependencies on earlier specs resolve to the job that won the
+        # client_job_id claim, which may be one created before this call.
+        children = []
+        for spec, job, (_, _, created) in zip(specs, jobs, results):
+            if created and spec.get("depends_on"):
+                job.depends_on = [results[parent][0] if isinstance(parent, int) else parent
+                                  for parent in spec["depends_on"]]
+                children.append(job)
+
+        records = [
+            ("create", job.to_tuple(), spec.get("client_job_id"))
+            for spec, job, (_, _, created) in zip(specs, jobs, results)
+            if created
+        ]
+        if batch_id:
+            job_ids = [job_id for job_id, _, _ in results]
+            with self._batch_lock:
+                self._batches[batch_id] = job_ids
+            records.append(("batch", batch_id, job_ids))
+
+        # Creation records are appended before any job id is returned, so
+        # they always precede the job's later updates in the journal.
+        self._sync(self._log(records))
+        if children:
+            self._release(self._link_dependencies(children))
+        return results
 
-    def update_job_status(self, job_id, status, result=None, error=None):
-        with self._lock:
-            job = self._jobs.get(job_id)
+    def get_batch(self, batch_id):
+        with self._batch_lock:
+            return self._batches.get(batch_id)
+
+    def get_job(self, job_id):
+        """Return the live job, or a copy read back from the archive if it was evicted."""
+        shard = self._shard(job_id)
+        with shard.lock:
+            job = shard.jobs.get(job_id)
             if job is not None:
-                job["status"] = status
-                job["updated_at"] = datetime.now()
-                if result is not None:
-                    job["result"] = result
-                if error is not None:
-                    job["error"] = error
+                if job_id in shard.finished:
+                    shard.finished[job_id] = time.monotonic()
+                    shard.finished.move_to_end(job_id)
+                return job
+            job = shard.archiving.get(job_id)
+            if job is not None:
+                return job
+        if self._archive is not None:
+            return self._archive.get(job_id)
+        return None
+
+    def update_job_status(self, job_id, status, result=None, error=None, owner=None):
+        """Set a job's status; False if it does not exist or owner no longer holds its lease."""
+        # Large results are written out before taking the lock.
+        result = self.store_result(result)
+        shard = self._shard(job_id)
+        with shard.lock:
+            job = shard.jobs.get(job_id)
+            if job is None or not self._check_lease(shard, job_id, owner):
+                return False
+            newly_finished = job.status not in TERMINAL_STATUSES
+            self._set_status(shard, job, status)
+            job.updated_at = time.time()
+            if result is not None:
+                job.result = result
+            if error is not None:
+                job.error = error
+            seq = self._log([self._update_record(job)])
+            if status not in TERMINAL_STATUSES:
+                shard.finished.pop(job_id, None)
                 return True
-            else:
+            waiters = shard.waiters.pop(job_id, ())
+            children = shard.children.pop(job_id, ())
+            snapshot = job.copy()
+            self._retire(shard, job_id)
+
+        self._archive_evicted(shard)
+        self._sweep_expired()
+        self._notify_finished(seq, waiters, children, snapshot, newly_finished)
+        return True
+
+    def start_job(self, job_id, owner=None, lease_seconds=None):
+        """Mark a job running and return a snapshot of it, or None if unknown.
+
+        With lease_seconds, owner holds a lease on the job that expires
+        unless renewed with renew_lease.
+        """
+        shard = self._shard(job_id)
+        with shard.lock:
+            job = shard.jobs.get(job_id)
+            if job is None:
+                return None
+            ready_at = max(job.updated_at, job.run_at or 0)
+            self._set_status(shard, job, "running")
+            job.updated_at = time.time()
+            if lease_seconds is not None:
+                self._grant_lease(shard, job_id, owner, lease_seconds)
+            self._log([self._update_record(job)])
+            snapshot = job.copy()
+
+        QUEUE_WAIT.observe(max(0.0, snapshot.updated_at - ready_at), (snapshot.task_name,))
+        return snapshot
+
+    def fail_attempt(self, job_id, error, retry_at=None, owner=None):
+        """Count a failed attempt and move the job to pending or failed atomically.
+
+        Replaces increment_attempts + get_job + update_job_status with one
+        lock acquisition. The job goes back to pending, with run_at set to
+        retry_at, while attempts remain below max_retries, otherwise to failed
+        with error recorded. Returns a snapshot of the updated job, or None if
+        it does not exist or owner no longer holds its lease.
+        """
+        shard = self._shard(job_id)
+        with shard.lock:
+            job = shard.jobs.get(job_id)
+            if job is None or not self._check_lease(shard, job_id, owner):
+                return None
+            snapshot, finished = self._count_failure(shard, job, error, retry_at)
+
+        if finished is not None:
+            self._archive_evicted(shard)
+            self._sweep_expired()
+            self._notify_finished(*finished, snapshot)
+        return snapshot
+
+    def renew_lease(self, job_id, owner, lease_seconds):
+        """Extend owner's lease on a running job; False if the lease was lost."""
+        shard = self._shard(job_id)
+        with shard.lock:
+            lease = shard.leases.get(job_id)
+            if lease is None or lease[0] != owner:
                 return False
-    
+            self._grant_lease(shard, job_id, owner, lease_seconds)
+        return True
+
+    def reap_expired_leases(self):
+        """Fail the current attempt of every running job whose lease has expired.
+
+        Only the head of each shard's deadline heap is examined, so a pass
+        costs O(expired log n) plus one lock acquisition per shard. Returns
+        snapshots of the reaped jobs; the caller enqueues those that went back
+        to pending.
+        """
+        now = time.monotonic()
+        reaped = []
+        for shard in self._shards:
+            notifications = []
+            with shard.lock:
+                deadlines = shard.lease_deadlines
+                while deadlines and deadlines[0][0] <= now:
+                    deadline, job_id = heapq.heappop(deadlines)
+                    lease = shard.leases.get(job_id)
+                    if lease is None or lease[1] != deadline:
+                        continue
+                    del shard.leases[job_id]
+                    job = shard.jobs.get(job_id)
+                    if job is None or job.status != "running":
+                        continue
+                    snapshot, finished = self._count_failure(shard, job, f"Lease held by {lease[0]} expired", None)
+                    reaped.append(snapshot)
+                    if finished is not None:
+                        notifications.append((finished, snapshot))
+
+            self._archive_evicted(shard)
+            for finished, snapshot in notifications:
+                self._notify_finished(*finished, snapshot)
+        return reaped
+
+    def list_jobs(self, status=None, task_name=None, created_after=None, cursor=0, limit=DEFAULT_PAGE_SIZE):
+        """Return (jobs, next_cursor) for retained jobs matching the filters, oldest first.
+
+        Index blocks are read in windows that double in size, each with one
+        lock acquisition per shard. Within a window only blocks holding a
+        match are visited, so a page costs about O(limit) plus a few bisections
+        per shard, rather than a pass over every job. Pass next_cursor back as cursor for
+        the following page; it is None once there are no more. Jobs already
+        evicted to the archive are not listed.
+        """
+        start = cursor
+        if created_after is not None:
+            start = max(start, self._first_seq_after(created_after))
+        with self._seq_lock:
+            end_block = (self._next_seq - 1) // INDEX_BLOCK_SIZE
+
+        jobs = []
+        block = start // INDEX_BLOCK_SIZE
+        window = 1
+        while len(jobs) < limit and block <= end_block:
+            window_end = min(block + window, end_block + 1)
+            need = limit - len(jobs)
+            found = []
+            for shard in self._shards:
+                with shard.lock:
+                    found.extend(_scan_index(shard, task_name, status, block, window_end, start, created_after, need))
+            found.sort(key=itemgetter(0))
+            jobs.extend(job for _, job in found[:need])
+            block += window
+            window *= 2
+
+        next_cursor = jobs[-1].seq + 1 if jobs and len(jobs) == limit else None
+        return jobs, next_cursor
+
+    def count_jobs(self, task_name=None):
+        """Return {status: count} over retained jobs, optionally of one task."""
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        for shard in self._shards:
+            with shard.lock:
+                for (job_task, status), count in shard.status_counts.items():
+                    if task_name is None or job_task == task_name:
+                        counts[status] += count
+        return counts
+
+    def wait_for_job(self, job_id, timeout):
+        """Block until the job reaches a terminal status or timeout elapses.
+
+        Returns the job (terminal or not), or None if it does not exist.
+        """
+        shard = self._shard(job_id)
+        event = None
+        with shard.lock:
+            job = shard.jobs.get(job_id)
+            if job is not None and job.status not in TERMINAL_STATUSES:
+                event = threading.Event()
+                shard.waiters.setdefault(job_id, []).append(event)
+
+        if event is not None and not event.wait(timeout):
+            with shard.lock:
+                waiters = shard.waiters.get(job_id)
+                if waiters and event in waiters:
+                    waiters.remove(event)
+                    if not waiters:
+                        del shard.waiters[job_id]
+
+        return self.get_job(job_id)
+
+    def add_listener(self, callback):
+        """Register callback(job) to be called when a job reaches success or failed.
+
+        Callbacks run on the thread that made the transition, outside the
+        store locks, and must not block.
+        """
+        with self._listener_lock:
+            self._listeners = self._listeners + (callback,)
+
+    def remove_listener(self, callback):
+        with self._listener_lock:
+            self._listeners = tuple(listener for listener in self._listeners if listener != callback)
+
+    def set_ready_callback(self, callback):
+        """Set callback(entries) for blocked jobs whose dependencies are satisfied.
+
+        entries are (job_id, priority, tenant, run_at, task_name) tuples, as
+        for JobQueue.enqueue_many. Like listeners, it runs on the thread that
+        finished the last parent, outside the store locks.
+        """
+        self._ready_callback = callback
+
     def increment_attempts(self, job_id):
-        with self._lock:
-            job = self._jobs.get(job_id)
+        shard = self._shard(job_id)
+        with shard.lock:
+            job = shard.jobs.get(job_id)
             if job is None:
                 return False
-            job["attempts"] += 1
-            job["updated_at"] = datetime.now()
-        return True
\ No newline at end of file
+            job.attempts += 1
+            job.updated_at = time.time()
+            self._log([self._update_record(job)])
+        return True
+
+    def store_result(self, result):
+        """Offload result to the result store if it is large enough; returns what the job will hold."""
+        if self._result_store is None:
+            return result
+        return self._result_store.offload(result)
+
+    def is_durable(self):
+        """True when creation and completion wait for a journal fsync."""
+        return self._journal is not None
+
+    def lock_acquisitions(self):
+        """Total shard lock acquisitions, for the lock contention ratio."""
+        shards = self._shards + self._client_shards
+        return sum(getattr(shard.lock, "acquisitions", 0) for shard in shards)
+
+    def recover(self):
+        """Rebuild the store from its journal and return jobs to re-enqueue.
+
+        Returns (job_id, priority, tenant, run_at, task_name) entries for
+        JobQueue.enqueue_many. Jobs that were pending or running when the
+        process stopped come back as pending, in creation order, followed by
+        blocked jobs whose dependencies finished before the stop. The journal
+        is then compacted to one record per retained job so the next recovery
+        replays only live state. Finished jobs beyond the retention limits are
+        evicted as they would have been at runtime.
+        """
+        if self._journal is None:
+            return []
+
+        jobs = {}
+        client_job_ids = {}
+        batches = {}
+        replayed = 0
+        # Replay allocates millions of long-lived containers; pausing the
+        # cyclic GC avoids repeated full collections over them.
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for record in self._journal.replay():
+                replayed += 1
+                kind = record[0]
+                if kind == "create":
+                    job, client_job_id = JobRecord.from_tuple(record[1]), record[2]
+                    jobs[job.job_id] = job
+                    if client_job_id:
+                        client_job_ids[client_job_id] = job.job_id
+                elif kind == "update":
+                    job = jobs.get(record[1])
+                    if job is not None:
+                        job.status, job.attempts, job.result, job.error, job.updated_at = record[2:7]
+                        # Logs written before run_at was journaled end here.
+                        if len(record) > 7:
+                            job.run_at = record[7]
+                elif kind == "client":
+                    client_job_ids[record[1]] = record[2]
+                elif kind == "batch":
+                    batches[record[1]] = record[2]
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+        pending_entries = []
+        finished = []
+        for job_id, job in jobs.items():
+            if job.status == "running":
+                job.status = "pending"
+            if job.status == "pending":
+                pending_entries.append((job_id, job.priority, job.tenant, job.run_at, job.task_name))
+            elif job.status in TERMINAL_STATUSES:
+                finished.append(job)
+
+        self._number_jobs(sorted(jobs.values(), key=attrgetter("created_at")))
+        for job_id, job in jobs.items():
+            shard = self._shard(job_id)
+            with shard.lock:
+                shard.jobs[job_id] = job
+                self._index_job(shard, job, 1)
+        # Rebuild dependency edges from the parents' current statuses, before
+        # retention can evict a finished parent that is not archived.
+        blocked = [job for job in jobs.values() if job.status == "blocked"]
+        if blocked:
+            pending_entries.extend(self._link_dependencies(blocked))
+        # Restart retention clocks from now, oldest finished first.
+        finished.sort(key=lambda job: job.updated_at)
+        for job in finished:
+            shard = self._shard(job.job_id)
+            with shard.lock:
+                self._retire(shard, job.job_id)
+        for shard in self._shards:
+            self._archive_evicted(shard)
+        if self._capacity is not None:
+            unfinished = {}
+            for job in jobs.values():
+                if job.status not in TERMINAL_STATUSES:
+                    unfinished[job.task_name] = unfinished.get(job.task_name, 0) + 1
+            self._capacity.restore(unfinished)
+        for client_job_id, job_id in client_job_ids.items():
+            client_shard = self._client_shard(client_job_id)
+            with client_shard.lock:
+                client_shard.job_ids[client_job_id] = job_id
+        with self._batch_lock:
+            self._batches.update(batches)
+
+        retained = sum(len(shard.jobs) for shard in self._shards)
+        # Compact only when the log holds more than one record per live entry.
+        if replayed > retained + len(batches):
+            client_job_id_by_job = {job_id: client_job_id for client_job_id, job_id in client_job_ids.items()}
+            records = []
+            for shard in self._shards:
+                records.extend(("create", job.to_tuple(), client_job_id_by_job.pop(job_id, None))
+                               for job_id, job in shard.jobs.items())
+            # Evicted jobs keep their idempotency keys.
+            records.extend(("client", client_job_id, job_id) for job_id, client_job_id in client_job_id_by_job.items())
+            records.extend(("batch", batch_id, job_ids) for batch_id, job_ids in batches.items())
+            self._journal.rewrite(records)
+
+        return pending_entries
+
+    def _shard(self, job_id):
+        return self._shards[hash(job_id) & self._shard_mask]
+
+    def _is_claimed(self, client_job_id):
+        if not client_job_id:
+            return False
+        client_shard = self._client_shard(client_job_id)
+        with client_shard.lock:
+            return client_job_id in client_shard.job_ids
+
+    def _client_shard(self, client_job_id):
+        return self._client_shards[hash(client_job_id) & self._shard_mask]
+
+    def _group_by_shard(self, items, key):
+        groups = {}
+        for item in items:
+            groups.setdefault(hash(key(item)) & self._shard_mask, []).append(item)
+        return [(self._shards[index], group) for index, group in groups.items()]
+
+    def _group_by_client_shard(self, claims):
+        groups = {}
+        for claim in claims:
+            groups.setdefault(hash(claim[1]) & self._shard_mask, []).append(claim)
+        return [(self._client_shards[index], group) for index, group in groups.items()]
+
+    def _number_jobs(self, jobs, stamp=False):
+        """Give jobs the next creation numbers, in order.
+
+        With stamp, new jobs also get created_at and updated_at here, under
+        the same lock, so created_at never decreases along the numbers.
+        Recovered jobs must come sorted by created_at.
+        """
+        with self._seq_lock:
+            marks = self._block_created
+            if stamp:
+                now = max(time.time(), marks[-1] if marks else 0.0)
+                for job in jobs:
+                    job.created_at = job.updated_at = now
+            for job in jobs:
+                job.seq = self._next_seq
+                block = self._next_seq // INDEX_BLOCK_SIZE
+                if block == len(marks):
+                    marks.append(job.created_at)
+                else:
+                    marks[block] = job.created_at
+                self._next_seq += 1
+
+    def _first_seq_after(self, created_after):
+        # Every job in a block before this one was created at or before created_after.
+        with self._seq_lock:
+            return bisect.bisect_right(self._block_created, created_after) * INDEX_BLOCK_SIZE
+
+    def _index_job(self, shard, job, delta):
+        """Add job to the listing index under its status (delta 1) or remove it (delta -1).
+
+        Called with shard.lock held. Each job sits in one bucket, keyed by
+        task, status and block, so a transition moves one entry; listings
+        filtered on fewer fields merge buckets when reading.
+        """
+        pair = (job.task_name, job.status)
+        block = job.seq // INDEX_BLOCK_SIZE
+        key = pair + (block,)
+        index = shard.index
+        if delta > 0:
+            bucket = index.get(key)
+            if bucket is None:
+                index[key] = {job.seq: job.job_id}
+                _add_block(shard, pair, block)
+            else:
+                bucket[job.seq] = job.job_id
+        else:
+            bucket = index[key]
+            del bucket[job.seq]
+            if not bucket:
+                del index[key]
+                _remove_block(shard, pair, block)
+        counts = shard.status_counts
+        counts[pair] = counts.get(pair, 0) + delta
+
+    def _set_status(self, shard, job, status):
+        """Move job to status in the record and the listing index; called with shard.lock held."""
+        old = job.status
+        if status == old:
+            return
+        job.status = status
+        # _index_job(-1) then _index_job(1), inlined: this runs on every transition.
+        index = shard.index
+        seq = job.seq
+        block = seq // INDEX_BLOCK_SIZE
+        task_name = job.task_name
+        key = (task_name, old, block)
+        bucket = index[key]
+        del bucket[seq]
+        if not bucket:
+            del index[key]
+            _remove_block(shard, (task_name, old), block)
+        key = (task_name, status, block)
+        bucket = index.get(key)
+        if bucket is None:
+            index[key] = {seq: job.job_id}
+            _add_block(shard, (task_name, status), block)
+        else:
+            bucket[seq] = job.job_id
+        counts = shard.status_counts
+        counts[(task_name, old)] -= 1
+        counts[(task_name, status)] = counts.get((task_name, status), 0) + 1
+
+    def _grant_lease(self, shard, job_id, owner, lease_seconds):
+        deadline = time.monotonic() + lease_seconds
+        shard.leases[job_id] = (owner, deadline)
+        heapq.heappush(shard.lease_deadlines, (deadline, job_id))
+
+    def _check_lease(self, shard, job_id, owner):
+        """True if an update from owner may proceed, dropping the job's lease if so.
+
+        Called with shard.lock held. Updates without an owner always proceed.
+        """
+        lease = shard.leases.get(job_id)
+        if owner is not None and (lease is None or lease[0] != owner):
+            return False
+        if lease is not None:
+            del shard.leases[job_id]
+        return True
+
+    def _count_failure(self, shard, job, error, retry_at):
+        """Apply a failed attempt to job; returns (snapshot, (seq, waiters, children) or None).
+
+        Called with shard.lock held. The second value is set when the job
+        failed for good, and is passed to _notify_finished after the lock is
+        released.
+        """
+        job.attempts += 1
+        job.updated_at = time.time()
+        if job.attempts < job.max_retries:
+            self._set_status(shard, job, "pending")
+            job.run_at = retry_at
+            self._log([self._update_record(job)])
+            return job.copy(), None
+        self._set_status(shard, job, "failed")
+        job.error = error
+        seq = self._log([self._update_record(job)])
+        waiters = shard.waiters.pop(job.job_id, ())
+        children = shard.children.pop(job.job_id, ())
+        snapshot = job.copy()
+        self._retire(shard, job.job_id)
+        return snapshot, (seq, waiters, children)
+
+    def _retire(self, shard, job_id):
+        """Start job_id's retention clock and evict what the limits no longer allow.
+
+        Called with shard.lock held.
+        """
+        shard.finished[job_id] = time.monotonic()
+        shard.finished.move_to_end(job_id)
+        self._evict(shard)
+
+    def _sweep_expired(self):
+        # Each finishing job also checks one other shard in turn, so expired
+        # jobs in shards that see no new completions are still evicted.
+        if self.retention_seconds is None:
+            return
+        shard = self._shards[next(self._sweep_order) & self._shard_mask]
+        with shard.lock:
+            self._evict(shard)
+        self._archive_evicted(shard)
+
+    def _evict(self, shard):
+        """Evict finished jobs over the retention limits from shard, least recent first.
+
+        Called with shard.lock held. With an archive, evicted jobs move to
+        shard.archiving, where reads still find them, and the caller writes
+        them out with _archive_evicted once the lock is released.
+        """
+        now = time.monotonic()
+        max_count = self._max_retained_per_shard
+        expire_before = None if self.retention_seconds is None else now - self.retention_seconds
+        evicted = []
+        for oldest_id, touched in shard.finished.items():
+            if max_count is not None and len(shard.finished) - len(evicted) > max_count:
+                evicted.append(oldest_id)
+            elif expire_before is not None and touched < expire_before:
+                evicted.append(oldest_id)
+            else:
+                break
+        if not evicted:
+            return
+
+        archiving = shard.archiving if self._archive is not None else None
+        for oldest_id in evicted:
+            del shard.finished[oldest_id]
+            job = shard.jobs.pop(oldest_id)
+            self._index_job(shard, job, -1)
+            if archiving is not None:
+                archiving[oldest_id] = job
+
+    def _archive_evicted(self, shard):
+        """Write shard's evicted jobs to the archive; called without shard.lock.
+
+        Jobs leave shard.archiving only after their write commits, so a job
+        is always findable in memory or in the archive. Two threads may
+        write the same job; the archive replaces rows by job_id.
+        """
+        if not shard.archiving:
+            return
+        with shard.lock:
+            jobs = list(shard.archiving.values())
+        self._archive.put_many(jobs)
+        with shard.lock:
+            for job in jobs:
+                if shard.archiving.get(job.job_id) is job:
+                    del shard.archiving[job.job_id]
+
+    def _notify_finished(self, seq, waiters, children, job, newly_finished=True):
+        # Only terminal transitions wait for fsync; losing an intermediate
+        # status in a crash just means the job is re-run on recovery.
+        self._sync(seq)
+        if newly_finished and self._capacity is not None:
+            self._capacity.release(job.task_name)
+        for event in waiters:
+            event.set()
+        for listener in self._listeners:
+            listener(job)
+        if children:
+            succeeded = job.status == "success"
+            self._release(self._settle_children([(child_id, job.job_id, succeeded) for child_id in children]))
+
+    def _check_dependencies(self, specs):
+        """Raise ValueError if a spec depends on a job that does not exist."""
+        parent_ids = []
+        for index, spec in enumerate(specs):
+            for parent in spec.get("depends_on") or ():
+                if isinstance(parent, int):
+                    if not 0 <= parent < index:
+                        raise ValueError(f"Job {index} can only depend on earlier jobs in the batch, not {parent}")
+                else:
+                    parent_ids.append(parent)
+        missing = []
+        for shard, group in self._group_by_shard(parent_ids, lambda job_id: job_id):
+            with shard.lock:
+                missing.extend(job_id for job_id in group if job_id not in shard.jobs and job_id not in shard.archiving)
+        for job_id in missing:
+            if self._archive is None or self._archive.get(job_id) is None:
+                raise ValueError(f"Unknown dependency {job_id}")
+
+    def _link_dependencies(self, children):
+        """Register blocked children with their unfinished parents; returns jobs now ready.
+
+        Each child waits for one more parent than it has while its edges are
+        registered, so parents finishing meanwhile cannot release it early;
+        that extra count is settled last, together with the parents that had
+        already finished.
+        """
+        for child in children:
+            child.waiting = len(child.depends_on) + 1
+        edges = [(parent_id, child) for child in children for parent_id in child.depends_on]
+        settled = []
+        evicted = []
+        for shard, group in self._group_by_shard(edges, itemgetter(0)):
+            with shard.lock:
+                for parent_id, child in group:
+                    parent = shard.jobs.get(parent_id) or shard.archiving.get(parent_id)
+                    if parent is None:
+                        evicted.append((parent_id, child))
+                    elif parent.status in TERMINAL_STATUSES:
+                        settled.append((child.job_id, parent_id, parent.status == "success"))
+                    else:
+                        shard.children.setdefault(parent_id, []).append(child.job_id)
+        for parent_id, child in evicted:
+            parent = self._archive.get(parent_id) if self._archive is not None else None
+            # A parent evicted without an archive is gone for good; only a
+            # recorded failure fails the child.
+            settled.append((child.job_id, parent_id, parent is None or parent.status == "success"))
+        settled.extend((child.job_id, None, True) for child in children)
+        return self._settle_children(settled)
+
+    def _settle_children(self, settled):
+        """Apply (child_id, parent_id, succeeded) outcomes to blocked children.
+
+        A child whose count reaches zero becomes pending and is returned as a
+        queue entry. A child of a failed parent fails too, unless its
+        on_parent_failure is "run", and its own children are settled in turn.
+        """
+        ready = []
+        while settled:
+            finished = []
+            cascade = []
+            for shard, group in self._group_by_shard(settled, itemgetter(0)):
+                with shard.lock:
+                    for child_id, parent_id, succeeded in group:
+                        child = shard.jobs.get(child_id)
+                        if child is None or child.status != "blocked":
+                            continue
+                        if succeeded or child.on_parent_failure == "run":
+                            child.waiting -= 1
+                            if child.waiting:
+                                continue
+                            self._set_status(shard, child, "pending")
+                            child.updated_at = time.time()
+                            self._log([self._update_record(child)])
+                            ready.append((child_id, child.priority, child.tenant, child.run_at, child.task_name))
+                            continue
+                        self._set_status(shard, child, "failed")
+                        child.updated_at = time.time()
+                        child.error = f"Dependency {parent_id} failed"
+                        seq = self._log([self._update_record(child)])
+                        waiters = shard.waiters.pop(child_id, ())
+                        grandchildren = shard.children.pop(child_id, ())
+                        cascade.extend((grandchild, child_id, False) for grandchild in grandchildren)
+                        finished.append((seq, waiters, child.copy()))
+                        self._retire(shard, child_id)
+                self._archive_evicted(shard)
+            for seq, waiters, snapshot in finished:
+                self._notify_finished(seq, waiters, (), snapshot)
+            settled = cascade
+        return ready
+
+    def _release(self, ready):
+        if ready and self._ready_callback is not None:
+            self._ready_callback(ready)
+
+    def _update_record(self, job):
+        return ("update", job.job_id, job.status, job.attempts, job.result, job.error, job.updated_at, job.run_at)
+
+    def _log(self, records):
+        """Append records to the journal.
+
+        Updates are appended with the job's shard lock held so the journal
+        order matches the order changes were applied in memory.
+        """
+        if self._journal is None or not records:
+            return 0
+        return self._journal.append_many(records)
+
+    def _sync(self, seq):
+        if seq:
+            self._journal.wait_durable(seq)
+
+
+def _add_block(shard, pair, block):
+    blocks = shard.blocks.get(pair)
+    if blocks is None:
+        shard.blocks[pair] = [block]
+    elif not blocks or blocks[-1] < block:
+        # The common case: jobs enter the newest block.
+        blocks.append(block)
+    else:
+        bisect.insort(blocks, block)
+
+
+def _remove_block(shard, pair, block):
+    blocks = shard.blocks[pair]
+    del blocks[bisect.bisect_left(blocks, block)]
+
+
+def _scan_index(shard, task_name, status, first_block, end_block, start, created_after, limit):
+    """Return up to limit (seq, job) pairs from shard's index blocks [first_block, end_block), in creation order.
+
+    Called with shard.lock held.
+    """
+    pairs = [pair for pair, blocks in shard.blocks.items()
+             if blocks and task_name in (None, pair[0]) and status in (None, pair[1])]
+    # Every listed block holds at least one match, so limit blocks per pair
+    # is always enough.
+    candidates = set()
+    for pair in pairs:
+        blocks = shard.blocks[pair]
+        low = bisect.bisect_left(blocks, first_block)
+        high = bisect.bisect_left(blocks, end_block, low)
+        candidates.update(blocks[low:min(high, low + limit)])
+
+    found = []
+    index = shard.index
+    for block in sorted(candidates):
+        entries = []
+        for job_task, job_status in pairs:
+            bucket = index.get((job_task, job_status, block))
+            if bucket:
+                entries.extend(bucket.items())
+        entries.sort()
+        for seq, job_id in entries:
+            if seq < start:
+                continue
+            job = shard.jobs[job_id]
+            if created_after is not None and job.created_at <= created_after:
+                continue
+            found.append((seq, job))
+            if len(found) == limit:
+                return found
+    return found
+
+
+def _new_job(spec):
+    return JobRecord(
+        str(uuid.uuid4()),
+        spec["task_name"],
+        encode_payload(spec.get("payload", {})),
+        max_retries=spec.get("max_retries", 3),
+        timeout=spec.get("timeout"),
+        priority=spec.get("priority", 0),
+        tenant=spec.get("tenant"),
+        run_at=spec.get("run_at"),
+        retry_delay=spec.get("retry_delay"),
+        max_retry_delay=spec.get("max_retry_delay"),
+        status="blocked" if spec.get("depends_on") else "pending",
+        on_parent_failure=spec.get("on_parent_failure")
+    )
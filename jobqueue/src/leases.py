@@ -0,0 +1,129 @@
+import logging
+import threading
+import time
+from metrics import Counter
+from worker import JOBS_FINISHED
+
+logger = logging.getLogger(__name__)
+
+# A leased job returns to the queue this long after its holder's last renewal.
+DEFAULT_LEASE_SECONDS = 30
+# Must stay well below the lease duration.
+HEARTBEAT_SECONDS = 5.0
+REAP_INTERVAL_SECONDS = 1.0
+
+LEASES_EXPIRED = Counter("jobqueue_leases_expired_total", "Leased jobs whose holder stopped renewing the lease", ["task"])
+
+
+class LeaseSet:
+    """Leases held by the worker threads of one process, for the Heartbeat to renew.
+
+    Each job_id maps to its owner, the thread running it, and the time after
+    which the lease is no longer renewed (None for no limit). A lease whose
+    thread has died, or whose job has run past its timeout, is left to
+    expire so the reaper hands the job to another worker.
+    """
+
+    def __init__(self):
+        self._leases = {}
+        self._lock = threading.Lock()
+
+    def add(self, job_id, owner, thread, renew_until=None):
+        with self._lock:
+            self._leases[job_id] = (owner, thread, renew_until)
+
+    def discard(self, job_id):
+        with self._lock:
+            self._leases.pop(job_id, None)
+
+    def renewable(self):
+        """Return {owner: [job_id, ...]} for leases that should still be renewed."""
+        now = time.monotonic()
+        by_owner = {}
+        with self._lock:
+            for job_id, (owner, thread, renew_until) in self._leases.items():
+                if thread.is_alive() and (renew_until is None or now < renew_until):
+                    by_owner.setdefault(owner, []).append(job_id)
+        return by_owner
+
+    def __len__(self):
+        with self._lock:
+            return len(self._leases)
+
+
+class Heartbeat(threading.Thread):
+    """Renews the renewable leases in a LeaseSet every interval seconds.
+
+    renew(owner, job_ids) extends the leases and returns the ids whose lease
+    was already lost: JobStore-backed for local workers, Broker.renew for
+    remote ones.
+    """
+
+    def __init__(self, renew, leases, interval=HEARTBEAT_SECONDS):
+        super().__init__(name="lease-heartbeat", daemon=True)
+        self.renew = renew
+        self.leases = leases
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            for owner, job_ids in self.leases.renewable().items():
+                try:
+                    lost = self.renew(owner, job_ids)
+                except (ConnectionError, EOFError) as e:
+                    logger.error(f"Lease renewal for {owner} failed: {e}")
+                    continue
+                for job_id in lost:
+                    self.leases.discard(job_id)
+                    logger.warning(f"Lease on job {job_id} held by {owner} was lost; its result will be dropped")
+
+    def stop(self):
+        self._stopped.set()
+
+
+def store_renewer(job_store, lease_seconds):
+    """Heartbeat renew function for workers sharing a process with job_store."""
+    def renew(owner, job_ids):
+        return [job_id for job_id in job_ids if not job_store.renew_lease(job_id, owner, lease_seconds)]
+    return renew
+
+
+def requeue_expired(job_store, job_queue):
+    """Reap expired leases, enqueue the jobs that went back to pending, and return how many were reaped."""
+    reaped = job_store.reap_expired_leases()
+    requeue = []
+    for job in reaped:
+        # Its holder is gone or too late; anything it reports is dropped.
+        job_queue.task_done(job["job_id"])
+        LEASES_EXPIRED.inc(labels=(job["task_name"],))
+        if job["status"] == "pending":
+            requeue.append((job["job_id"], job["priority"], job["tenant"], job["run_at"], job["task_name"]))
+        else:
+            JOBS_FINISHED.inc(labels=(job["task_name"], "failed"))
+    job_queue.enqueue_many(requeue)
+    if reaped:
+        logger.warning(f"Reaped {len(reaped)} jobs with expired leases, {len(requeue)} requeued")
+    return len(reaped)
+
+
+class LeaseReaper(threading.Thread):
+    """Calls requeue_expired every interval seconds."""
+
+    def __init__(self, job_store, job_queue, interval=REAP_INTERVAL_SECONDS):
+        super().__init__(name="lease-reaper", daemon=True)
+        self.job_store = job_store
+        self.job_queue = job_queue
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                requeue_expired(self.job_store, self.job_queue)
+            except Exception:
+                logger.exception("Lease reaper pass failed")
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
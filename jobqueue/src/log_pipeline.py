@@ -0,0 +1,226 @@
+import json
+import logging
+import queue
+import random
+import sys
+import threading
+import time
+from task_limits import TokenBucket
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_DATEFMT = '%Y-%m-%d %H:%M:%S'
+# Records written per stream write and flush, at most.
+LOG_BATCH_SIZE = 512
+# Records waiting for the writer beyond this are dropped (and counted), so a
+# log storm cannot grow memory without bound.
+MAX_PENDING_RECORDS = 100_000
+
+# Attributes every LogRecord has; anything else on a record came from extra=
+# and is job context for the JSON output.
+_RECORD_FIELDS = frozenset(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+_STOP = object()
+_sampler = None
+
+
+class EventSampler:
+    """Samples and rate-limits log events by name.
+
+    rules maps an event to {"sample": fraction kept, "per_second": rate,
+    "burst": tokens}; either key may be left out. Events without a rule are
+    always kept. check returns None for an event to leave out, otherwise
+    how many of that event were left out since the last one kept, so the
+    output still says how much is missing.
+    """
+
+    def __init__(self, rules):
+        self._rules = {}
+        for event, rule in rules.items():
+            bucket = TokenBucket(rule["per_second"], rule.get("burst", 1)) if rule.get("per_second") else None
+            self._rules[event] = (rule.get("sample", 1.0), bucket)
+        self._suppressed = {}
+        self._lock = threading.Lock()
+
+    def check(self, event):
+        rule = self._rules.get(event)
+        if rule is None:
+            return 0
+        sample, bucket = rule
+        keep = sample >= 1.0 or random.random() < sample
+        with self._lock:
+            if keep and bucket is not None:
+                keep = bucket.available(time.monotonic()) >= 1
+                if keep:
+                    bucket.take()
+            if not keep:
+                self._suppressed[event] = self._suppressed.get(event, 0) + 1
+                return None
+            return self._suppressed.pop(event, 0)
+
+
+def set_sampling(rules):
+    """Install the EventSampler used by log_event; None keeps every event."""
+    global _sampler
+    _sampler = EventSampler(rules) if rules else None
+
+
+def log_event(logger, level, event, msg, *args, **context):
+    """Log msg % args as the named event, with context as extra= fields.
+
+    Level and sampling are checked before a LogRecord is built, so an event
+    left out costs a dict lookup and no formatting. Use this for lines
+    logged per job; the arguments are formatted later by the LogWriter.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    sampler = _sampler
+    if sampler is not None:
+        suppressed = sampler.check(event)
+        if suppressed is None:
+            return
+        if suppressed:
+            context["suppressed"] = suppressed
+    context["event"] = event
+    logger.log(level, msg, *args, extra=context, stacklevel=2)
+
+
+class QueueLogHandler(logging.Handler):
+    """Hands records to a LogWriter thread without formatting or writing them.
+
+    The calling thread only appends the record to a queue; the message and
+    its arguments (a job's result, say) are formatted by the writer. Unlike
+    logging.handlers.QueueHandler, nothing is formatted in the caller and no
+    handler lock is taken, so worker threads never wait on each other here.
+    """
+
+    def __init__(self, records, level=logging.NOTSET):
+        super().__init__(level)
+        self.records = records
+        self.dropped = 0
+
+    def handle(self, record):
+        # Skips the handler lock of logging.Handler.handle; the queue is thread-safe.
+        if not self.filter(record):
+            return False
+        self.emit(record)
+        return True
+
+    def emit(self, record):
+        if self.records.qsize() >= MAX_PENDING_RECORDS:
+            self.dropped += 1
+            return
+        self.records.put(record)
+
+
+class LogWriter(threading.Thread):
+    """Formats queued records and writes them to stream in batches.
+
+    Each pass takes every record waiting (up to batch_size), formats them,
+    and writes them with one write and one flush, so the cost of stream I/O
+    is shared by all the records that arrived while the last batch was
+    written.
+    """
+
+    def __init__(self, records, stream, formatter, batch_size=LOG_BATCH_SIZE):
+        super().__init__(name="log-writer", daemon=True)
+        self.records = records
+        self.stream = stream
+        self.formatter = formatter
+        self.batch_size = batch_size
+        self.written = 0
+        self.batches = 0
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            batch = [self.records.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.records.get_nowait())
+                except queue.Empty:
+                    break
+            if _STOP in batch:
+                batch = [record for record in batch if record is not _STOP]
+                stopping = True
+            self._write(batch)
+
+    def stop(self):
+        """Write everything already queued, then exit."""
+        self.records.put(_STOP)
+        self.join()
+
+    def _write(self, batch):
+        lines = []
+        for record in batch:
+            try:
+                lines.append(self.formatter.format(record))
+            except Exception as e:
+                lines.append(f"Could not format log record {record.msg!r}: {e}")
+        if not lines:
+            return
+        try:
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+        except Exception:
+            return
+        self.written += len(lines)
+        self.batches += 1
+
+
+class TextFormatter(logging.Formatter):
+    """The usual text line, noting how many similar records sampling left out."""
+
+    def format(self, record):
+        line = super().format(record)
+        suppressed = record.__dict__.get("suppressed")
+        if suppressed:
+            line += f" [{suppressed} similar suppressed]"
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message and any extra= job context."""
+
+    def format(self, record):
+        entry = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level=logging.INFO, json_format=False, sampling=None, stream=None,
+                      batch_size=LOG_BATCH_SIZE):
+    """Route the root logger through a QueueLogHandler to a background LogWriter.
+
+    Replaces logging.basicConfig. sampling is the rules for log_event (see
+    EventSampler). Returns the LogWriter; call its stop() at shutdown so
+    queued records are written.
+    """
+    # Neither format shows the caller, thread or process, so skip looking
+    # them up for every record (the switches in the logging docs' section on
+    # optimization).
+    logging._srcfile = None
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+    set_sampling(sampling)
+
+    records = queue.SimpleQueue()
+    handler = QueueLogHandler(records)
+    formatter = JsonFormatter() if json_format else TextFormatter(LOG_FORMAT, LOG_DATEFMT)
+    writer = LogWriter(records, stream or sys.stderr, formatter, batch_size)
+    writer.start()
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    return writer
@@ -1,52 +1,179 @@
 from job_store import JobStore
 from job_queue import JobQueue
-from tasks import TASKS
+from job_journal import WriteAheadLog
+from job_archive import JobArchive
+from result_store import ResultStore
+from result_cache import ResultCache
+from capacity import CapacityLimits
+from task_limits import task_limits
+from tasks import TASKS, TASK_OPTIONS
 from worker import Worker
+from worker_pool import WorkerPool
+from executors import shutdown_executors, size_timeout_pool
 from api import app, init_api
+from async_api import AsyncApiServer, serve_store, start_api_processes
+from broker import Broker, serve_broker, AUTHKEY_ENV
+from leases import DEFAULT_LEASE_SECONDS, Heartbeat, LeaseReaper, LeaseSet, store_renewer
+from metrics import REGISTRY
+from log_pipeline import configure_logging
 import logging
+import os
 import signal
 import sys
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+# Log records are handed to a background writer and written in batches.
+# LOG_JSON writes one JSON object per line with the job context. LOG_SAMPLING
+# keeps a fraction ("sample") and/or at most "per_second" of the records of
+# an event, so per-job lines and retry storms cannot flood the log; the
+# number left out is noted on the next record kept.
+LOG_JSON = False
+LOG_SAMPLING = {
+    "job.retry": {"per_second": 10, "burst": 20},
+    "job.failed": {"per_second": 10, "burst": 20}
+}
+
+log_writer = configure_logging(logging.INFO, LOG_JSON, LOG_SAMPLING)
 
 logger = logging.getLogger(__name__)
 
-job_store = JobStore()
-job_queue = JobQueue()
+# Set to a file path to persist jobs across restarts. On startup the log is
+# replayed and pending or interrupted jobs are enqueued again.
+WAL_PATH = None
+
+# Finished jobs are kept in memory for RETAIN_FINISHED_SECONDS after they
+# finish or were last read, up to MAX_RETAINED_FINISHED_JOBS. Evicted jobs go
+# to the SQLite archive at ARCHIVE_PATH if set, otherwise they are dropped.
+RETAIN_FINISHED_SECONDS = 24 * 3600
+MAX_RETAINED_FINISHED_JOBS = 100_000
+ARCHIVE_PATH = None
+
+# Set to a directory to keep results of RESULT_OFFLOAD_BYTES or more (JSON
+# encoded) on disk, deduplicated by content hash, instead of in the job.
+RESULT_DIR = None
+RESULT_OFFLOAD_BYTES = 64 * 1024
+
+# Results of tasks with "memoize" in TASK_OPTIONS are reused for later jobs
+# with the same task and payload, for up to MEMO_TTL_SECONDS.
+MEMO_CACHE_SIZE = 10_000
+MEMO_TTL_SECONDS = 3600
+
+# Admission control: at most MAX_UNFINISHED_JOBS jobs, and
+# MAX_UNFINISHED_PER_TASK[task] of one task, may be waiting or running at once.
+# Submissions beyond that get 429 with a Retry-After from the drain rate. With
+# SHED_BELOW_PRIORITY set, lower-priority jobs are refused once 80% full.
+MAX_UNFINISHED_JOBS = 100_000
+MAX_UNFINISHED_PER_TASK = {}
+SHED_BELOW_PRIORITY = None
+
+journal = WriteAheadLog(WAL_PATH) if WAL_PATH else None
+archive = JobArchive(ARCHIVE_PATH) if ARCHIVE_PATH else None
+result_store = ResultStore(RESULT_DIR, RESULT_OFFLOAD_BYTES, fsync=journal is not None) if RESULT_DIR else None
+job_store = JobStore(journal=journal, archive=archive,
+                     retention_seconds=RETAIN_FINISHED_SECONDS,
+                     max_retained_jobs=MAX_RETAINED_FINISHED_JOBS,
+                     result_store=result_store,
+                     capacity=CapacityLimits(MAX_UNFINISHED_JOBS, MAX_UNFINISHED_PER_TASK, SHED_BELOW_PRIORITY))
+result_cache = ResultCache(MEMO_CACHE_SIZE, MEMO_TTL_SECONDS)
+job_queue = JobQueue(task_limits=task_limits(TASK_OPTIONS))
+# Jobs submitted with depends_on are enqueued once their parents succeed.
+job_store.set_ready_callback(job_queue.enqueue_many)
 tasks = TASKS
 
+recovered_jobs = job_store.recover()
+if recovered_jobs:
+    job_queue.enqueue_many(recovered_jobs)
+    logger.info(f"Recovered {len(recovered_jobs)} pending jobs from {WAL_PATH}")
+
 init_api(job_store, job_queue)
 
-NUM_WORKERS = 2
+# "flask" runs the Flask development server (the only mode serving
+# GET /jobs/events). "async" runs the asyncio server; with API_PROCESSES > 1
+# it forks that many API processes sharing the port, which reach this
+# process's store through a local manager on STORE_ADDRESS.
+API_MODE = "flask"
+API_PORT = 5001
+API_PROCESSES = 1
+STORE_ADDRESS = ("127.0.0.1", 5002)
 
-workers = []
-for i in range(NUM_WORKERS):
-    worker = Worker(job_queue, job_store, tasks)
-    worker.start()
-    workers.append(worker)
-    logger.info(f"Worker {i+1} started")
+api_processes = []
+
+# Every worker, local or remote, runs jobs under a lease renewed by a
+# heartbeat. A job whose lease is not renewed for LEASE_SECONDS (its worker
+# died, or overran its timeout) counts a failed attempt and is requeued.
+LEASE_SECONDS = DEFAULT_LEASE_SECONDS
+
+leases = LeaseSet()
+heartbeat = Heartbeat(store_renewer(job_store, LEASE_SECONDS), leases)
+heartbeat.start()
+reaper = LeaseReaper(job_store, job_queue)
+reaper.start()
+
+# Set to (host, port) to accept remote workers (src/remote_worker.py), which
+# lease jobs over the network using the authkey in $JOBQUEUE_BROKER_AUTHKEY.
+BROKER_ADDRESS = None
+
+broker = None
+if BROKER_ADDRESS:
+    broker = Broker(job_store, job_queue, LEASE_SECONDS)
+    serve_broker(broker, BROKER_ADDRESS, os.environ[AUTHKEY_ENV].encode())
+    logger.info(f"Broker accepting remote workers on {BROKER_ADDRESS[0]}:{BROKER_ADDRESS[1]}")
+
+# The worker pool grows from MIN_WORKERS up to MAX_WORKERS while jobs back up
+# in the queue and shrinks back once workers sit idle (see WorkerPool).
+# Process-backed tasks need at least one worker thread per core to keep the
+# process pool busy.
+MIN_WORKERS = max(2, os.cpu_count() or 1)
+MAX_WORKERS = 8 * MIN_WORKERS
+size_timeout_pool(MAX_WORKERS)
+
+worker_pool = WorkerPool(lambda: Worker(job_queue, job_store, tasks, TASK_OPTIONS, result_cache, leases, LEASE_SECONDS),
+                         job_queue, MIN_WORKERS, MAX_WORKERS)
+worker_pool.start()
+logger.info(f"Worker pool started with {MIN_WORKERS} workers (up to {MAX_WORKERS})")
 
 def signal_handler(sig, frame):
     logger.info("Shutting down gracefully...")
     logger.info("Waiting for workers to finish current jobs...")
 
-    for worker in workers:
-        worker.stop()
+    worker_pool.stop(timeout=5)
 
-    for worker in workers:
-        worker.join(timeout=5)
+    heartbeat.stop()
+    reaper.stop()
+    shutdown_executors(wait=False)
+    if journal is not None:
+        journal.close()
+    if archive is not None:
+        archive.close()
+    for process in api_processes:
+        process.terminate()
 
     logger.info("All workers stopped. Exiting.")
+    log_writer.stop()
     sys.exit(0)
 
 signal.signal(signal.SIGINT, signal_handler)
 
 if __name__ == '__main__':
-    logger.info("Starting API server on http://localhost:5001")
+    logger.info(f"Starting {API_MODE} API server on http://localhost:{API_PORT}")
     logger.info("POST /jobs - Submit a job")
-    logger.info("GET /jobs/<job_id> - Get job status")
-    app.run(debug=True, port=5001, host='0.0.0.0')
\ No newline at end of file
+    logger.info("POST /jobs/batch - Submit many jobs in one request")
+    logger.info("GET /jobs - List jobs (?status=, ?task=, ?created_after=, ?cursor=)")
+    logger.info("GET /jobs/<job_id> - Get job status (?wait=<seconds> to long-poll, ?include_result=1 for the result)")
+    logger.info("GET /jobs/<job_id>/result - Stream a finished job's result")
+    if API_MODE == "flask":
+        logger.info("GET /jobs/events - Stream completion events for job_ids or a batch_id")
+    logger.info("GET /metrics - Prometheus metrics")
+    logger.info("POST /admin/profile?seconds=N - Sample thread stacks (collapsed, for flame graphs)")
+    logger.info("GET /admin/profile/tasks - cProfile stats of tasks with profile_every")
+
+    if API_MODE == "async" and API_PROCESSES > 1:
+        authkey = os.urandom(32)
+        serve_store(job_store, job_queue, REGISTRY, STORE_ADDRESS, authkey)
+        api_processes.extend(start_api_processes(API_PROCESSES, '0.0.0.0', API_PORT, STORE_ADDRESS, authkey))
+        logger.info(f"Started {API_PROCESSES} API processes")
+        for process in api_processes:
+            process.join()
+    elif API_MODE == "async":
+        AsyncApiServer('0.0.0.0', API_PORT, offload=job_store.is_durable()).serve_forever()
+    else:
+        app.run(debug=True, port=API_PORT, host='0.0.0.0')
\ No newline at end of file
@@ -0,0 +1,244 @@
+import bisect
+import threading
+import time
+from threading import get_ident
+
+# Bucket upper bounds in seconds.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+LOCK_BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 0.1)
+
+# One in this many lock acquisitions has its hold time measured.
+LOCK_HOLD_SAMPLE_EVERY = 16
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def unregister(self, metric):
+        with self._lock:
+            if metric in self._metrics:
+                self._metrics.remove(metric)
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _PerThreadMetric:
+    """Base for metrics updated without locks.
+
+    Each thread writes to its own dict of label values -> state, so updates
+    are plain dict and list operations with no lock and no cross-thread
+    contention. Scrapes merge the per-thread dicts; dicts of finished threads
+    are kept so totals never go down.
+    """
+
+    def __init__(self, name, help, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._by_thread = {}
+        self._per_thread = []
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _new_values(self):
+        values = {}
+        with self._lock:
+            self._by_thread[threading.get_ident()] = values
+            self._per_thread.append(values)
+        return values
+
+    def _snapshots(self):
+        with self._lock:
+            per_thread = list(self._per_thread)
+        # dict() copies in one step under the GIL, so a concurrent insert by
+        # the owning thread cannot break the iteration.
+        return [dict(values) for values in per_thread]
+
+    def _label_text(self, labels, extra=()):
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels)]
+        pairs.extend(f'{name}="{value}"' for name, value in extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter(_PerThreadMetric):
+    metric_type = "counter"
+
+    def inc(self, amount=1, labels=()):
+        values = self._by_thread.get(get_ident()) or self._new_values()
+        values[labels] = values.get(labels, 0) + amount
+
+    def value(self, labels=()):
+        return sum(values.get(labels, 0) for values in self._snapshots())
+
+    def samples(self):
+        totals = {}
+        for values in self._snapshots():
+            for labels, value in values.items():
+                totals[labels] = totals.get(labels, 0) + value
+        return [f"{self.name}{self._label_text(labels)} {_format(value)}" for labels, value in sorted(totals.items())]
+
+
+class Histogram(_PerThreadMetric):
+    metric_type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS, registry=REGISTRY):
+        super().__init__(name, help, labelnames, registry)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, labels=()):
+        values = self._by_thread.get(get_ident()) or self._new_values()
+        state = values.get(labels)
+        if state is None:
+            # One count per bucket plus +Inf, then the running sum.
+            state = values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def count(self, labels=()):
+        return sum(sum(values[labels][:-1]) for values in self._snapshots() if labels in values)
+
+    def samples(self):
+        merged = {}
+        for values in self._snapshots():
+            for labels, state in values.items():
+                total = merged.get(labels)
+                if total is None:
+                    merged[labels] = list(state)
+                else:
+                    for i, value in enumerate(state):
+                        total[i] += value
+
+        lines = []
+        for labels, state in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), state):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{self._label_text(labels, (('le', bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(labels)} {_format(state[-1])}")
+            lines.append(f"{self.name}_count{self._label_text(labels)} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """A metric read from callback() at scrape time, so it costs nothing between scrapes.
+
+    callback returns a number, or a dict of label value tuples -> number.
+    """
+
+    def __init__(self, name, help, callback, labelnames=(), metric_type="gauge", registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+        self.metric_type = metric_type
+        if registry is not None:
+            registry.register(self)
+
+    def samples(self):
+        value = self.callback()
+        if not isinstance(value, dict):
+            return [f"{self.name} {_format(value)}"]
+        lines = []
+        for labels, number in sorted(value.items()):
+            pairs = ",".join(f'{name}="{_escape(label)}"' for name, label in zip(self.labelnames, labels))
+            lines.append(f"{self.name}{{{pairs}}} {_format(number)}")
+        return lines
+
+
+class TimedLock:
+    """Lock that records wait time when contended and samples hold time.
+
+    An uncontended acquire is one non-blocking attempt and no clock read, so
+    wait_histogram only sees acquisitions that actually blocked. Hold time is
+    measured on one in sample_every acquisitions. acquisitions is updated
+    while the lock is held, so it is exact.
+    """
+
+    __slots__ = ("_acquire", "_release", "_wait", "_hold", "_labels", "_sample_every", "_acquired_at", "acquisitions")
+
+    def __init__(self, wait_histogram, hold_histogram, labels=(), sample_every=LOCK_HOLD_SAMPLE_EVERY):
+        lock = threading.Lock()
+        self._acquire = lock.acquire
+        self._release = lock.release
+        self._wait = wait_histogram
+        self._hold = hold_histogram
+        self._labels = labels
+        self._sample_every = sample_every
+        self._acquired_at = None
+        self.acquisitions = 0
+
+    def __enter__(self):
+        if not self._acquire(False):
+            start = time.perf_counter()
+            self._acquire()
+            self._wait.observe(time.perf_counter() - start, self._labels)
+        self.acquisitions += 1
+        if not self.acquisitions % self._sample_every:
+            self._acquired_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._acquired_at is not None:
+            self._hold.observe(time.perf_counter() - self._acquired_at, self._labels)
+            self._acquired_at = None
+        self._release()
+
+
+_enabled = True
+
+
+def timed_lock(wait_histogram, hold_histogram, labels=()):
+    """Return a TimedLock, or a plain Lock while instrumentation is disabled."""
+    if not _enabled:
+        return threading.Lock()
+    return TimedLock(wait_histogram, hold_histogram, labels)
+
+
+def set_enabled(enabled):
+    """Turn instrumentation on or off process-wide, for overhead comparisons.
+
+    Disabling swaps the update methods for no-ops and makes timed_lock return
+    plain locks for objects created afterwards, so the hot path pays nothing.
+    """
+    global _enabled
+    _enabled = enabled
+    Counter.inc = _counter_inc if enabled else _noop
+    Histogram.observe = _histogram_observe if enabled else _noop
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+_counter_inc = Counter.inc
+_histogram_observe = Histogram.observe
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
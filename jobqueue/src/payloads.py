@@ -0,0 +1,117 @@
+import itertools
+import pickle
+
+# Payloads are encoded once, when the job is created, and stay encoded in
+# the JobStore, the journal, the archive and on the way to process and
+# remote workers; only the code that runs the task decodes them. Protocol 5
+# is readable by every Python version this project supports.
+PAYLOAD_PROTOCOL = 5
+
+_TYPES = {
+    "object": (dict,),
+    "array": (list,),
+    "string": (str,),
+    "number": (int, float),
+    "integer": (int,),
+    "boolean": (bool,)
+}
+
+
+def encode_payload(payload):
+    """Encode a JSON payload to bytes; already encoded payloads are returned as is."""
+    if isinstance(payload, bytes):
+        return payload
+    return pickle.dumps(payload, protocol=PAYLOAD_PROTOCOL)
+
+
+def decode_payload(payload):
+    """Decode an encoded payload. Payloads are JSON values, so only encoded ones are bytes."""
+    if isinstance(payload, bytes):
+        return pickle.loads(payload)
+    return payload
+
+
+def run_task(func, payload):
+    """func(payload) with payload decoded here, in whichever process runs the task."""
+    return func(decode_payload(payload))
+
+
+def run_batch(func, payloads):
+    return func([decode_payload(payload) for payload in payloads])
+
+
+def compile_schema(schema):
+    """Compile a payload schema into validate(value), which returns an error message or None.
+
+    Schemas are a small subset of JSON Schema: "type" (object, array, string,
+    number, integer, boolean), "required" and "properties" for objects,
+    "items" for arrays and "minimum" for numbers. Booleans are not numbers.
+
+    The schema is turned into the source of one Python function, with nested
+    loops for arrays and every check inlined, and compiled once. Validating
+    a payload is then a single call with no schema lookups; the error
+    location is only formatted when a check fails.
+    """
+    lines = ["def check(value):"]
+    constants = {}
+    _emit(schema, "value", [], lines, 1, constants, itertools.count())
+    lines.append("    return None")
+    exec("\n".join(lines), constants)
+    check = constants["check"]
+
+    def validate(value):
+        error = check(value)
+        if error:
+            location, message = error
+            return f"payload{location} {message}"
+        return None
+
+    return validate
+
+
+def _emit(schema, var, location, lines, depth, constants, names):
+    """Append the checks of schema against the variable var to lines.
+
+    location is a list of expressions whose concatenation is var's path
+    below the payload, and constants maps the names the code uses for
+    schema values to those values.
+    """
+    def constant(value):
+        name = f"_c{next(names)}"
+        constants[name] = value
+        return name
+
+    pad = "    " * depth
+    path = " + ".join(location) or '""'
+    start = len(lines)
+
+    expected = schema.get("type")
+    if expected is not None:
+        condition = f"not isinstance({var}, {constant(_TYPES[expected])})"
+        if expected in ("number", "integer"):
+            condition += f" or {var}.__class__ is bool"
+        message = constant(f"must be {'an' if expected[0] in 'aeiou' else 'a'} {expected}")
+        lines += [f"{pad}if {condition}:", f"{pad}    return {path}, {message}"]
+
+    if "minimum" in schema:
+        message = constant(f"must be at least {schema['minimum']}")
+        lines += [f"{pad}if {var} < {constant(schema['minimum'])}:", f"{pad}    return {path}, {message}"]
+
+    for field in schema.get("required", ()):
+        field_path = " + ".join(location + [constant(f".{field}")])
+        lines += [f"{pad}if {constant(field)} not in {var}:", f"{pad}    return {field_path}, {constant('is required')}"]
+
+    for name, subschema in schema.get("properties", {}).items():
+        value = f"_v{next(names)}"
+        key = constant(name)
+        lines += [f"{pad}if {key} in {var}:", f"{pad}    {value} = {var}[{key}]"]
+        _emit(subschema, value, location + [constant(f".{name}")], lines, depth + 1, constants, names)
+
+    if "items" in schema:
+        number = next(names)
+        index, item = f"_i{number}", f"_v{number}"
+        lines.append(f"{pad}for {index}, {item} in enumerate({var}):")
+        _emit(schema["items"], item, location + [f"'[%d]' % {index}"], lines, depth + 1, constants, names)
+
+    if len(lines) == start:
+        lines.append(f"{pad}pass")
@@ -0,0 +1,167 @@
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+
+# Seconds between stack samples; 200 samples a second of every thread.
+SAMPLE_INTERVAL = 0.005
+MAX_SAMPLE_SECONDS = 60
+# Functions listed per task in a task profile report.
+REPORT_LIMIT = 30
+
+_sampling = threading.Lock()
+_frame_labels = {}
+
+
+def sample_stacks(seconds, interval=SAMPLE_INTERVAL):
+    """Sample the stack of every other thread in this process for seconds.
+
+    Returns {collapsed stack: samples}, where a collapsed stack is the
+    thread's label followed by its frames, outermost first, joined by ";"
+    (the input format of flamegraph.pl and speedscope). Sampling runs on
+    the calling thread and only reads sys._current_frames: no thread is
+    traced, and nothing runs between calls. Returns None if another sample
+    is already running.
+    """
+    if not _sampling.acquire(blocking=False):
+        return None
+    try:
+        me = threading.get_ident()
+        labels = {}
+        stacks = {}
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                label = labels.get(ident)
+                if label is None:
+                    label = labels[ident] = _thread_label(ident)
+                stack = _collapse(label, frame)
+                stacks[stack] = stacks.get(stack, 0) + 1
+            time.sleep(interval)
+        return stacks
+    finally:
+        _sampling.release()
+
+
+def format_collapsed(stacks):
+    """One "stack count" line per stack, most sampled first."""
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items(), key=lambda item: -item[1]))
+
+
+def _thread_label(ident):
+    # Threads of one kind share a label (Worker, not Thread-7), so their
+    # samples merge into one tower of the flame graph.
+    for thread in threading.enumerate():
+        if thread.ident == ident:
+            if type(thread) is not threading.Thread:
+                return type(thread).__name__
+            return re.sub(r"[-_]\d.*$", "", thread.name)
+    return "unknown"
+
+
+def _collapse(label, frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        name = _frame_labels.get(code)
+        if name is None:
+            name = _frame_labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        names.append(name)
+        frame = frame.f_back
+    names.append(label)
+    return ";".join(reversed(names))
+
+
+def profile_call(func, payload):
+    """func(payload) under cProfile; returns (result, stats) for TaskProfiles.collect.
+
+    stats is the profile's raw pstats dict, which pickles, so a child
+    process can run this and hand its profile back with the result. It is
+    None if another profiler was already running here.
+    """
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        return func(payload), None
+    try:
+        result = func(payload)
+    finally:
+        profile.disable()
+    profile.create_stats()
+    return result, profile.stats
+
+
+class _RawStats:
+    # pstats.Stats loads anything with create_stats() and a stats dict.
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class TaskProfiles:
+    """cProfile results of sampled task executions, merged by task name.
+
+    Tasks with "profile_every": N in TASK_OPTIONS have every Nth execution
+    run through profile_call, in the worker thread, the timeout pool or the
+    process pool, wherever the task runs. Executions that raise are not
+    counted.
+    """
+
+    def __init__(self):
+        self._counters = {}
+        self._stats = {}
+        self._runs = {}
+        self._lock = threading.Lock()
+
+    def should_profile(self, task_name, every):
+        counter = self._counters.get(task_name)
+        if counter is None:
+            counter = self._counters.setdefault(task_name, itertools.count(1))
+        return next(counter) % every == 0
+
+    def collect(self, task_name, outcome):
+        """Merge the stats of a profile_call outcome and return its result."""
+        result, stats = outcome
+        if stats:
+            with self._lock:
+                merged = self._stats.get(task_name)
+                if merged is None:
+                    self._stats[task_name] = pstats.Stats(_RawStats(stats))
+                else:
+                    merged.add(_RawStats(stats))
+                self._runs[task_name] = self._runs.get(task_name, 0) + 1
+        return result
+
+    def runs(self, task_name):
+        return self._runs.get(task_name, 0)
+
+    def report(self, task_name=None, limit=REPORT_LIMIT):
+        """pstats text sorted by cumulative time, for one task or all; None if nothing was profiled."""
+        out = io.StringIO()
+        with self._lock:
+            for name in [task_name] if task_name else sorted(self._stats):
+                stats = self._stats.get(name)
+                if stats is None:
+                    continue
+                out.write(f"{name}: {self._runs[name]} profiled executions\n")
+                stats.stream = out
+                stats.sort_stats("cumulative").print_stats(limit)
+        return out.getvalue() or None
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._runs.clear()
+
+
+TASK_PROFILES = TaskProfiles()
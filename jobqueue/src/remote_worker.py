@@ -0,0 +1,127 @@
+import argparse
+import logging
+import os
+import signal
+import socket
+import time
+from broker import AUTHKEY_ENV, connect_broker
+from leases import HEARTBEAT_SECONDS, Heartbeat, LeaseSet
+from log_pipeline import configure_logging, log_event
+from tasks import TASKS, TASK_OPTIONS
+from worker import Worker
+
+logger = logging.getLogger(__name__)
+
+# Jobs leased per round trip to the broker.
+PREFETCH = 8
+THREADS = 2
+LEASE_WAIT_SECONDS = 1.0
+
+
+class RemoteWorker(Worker):
+    """Worker thread that leases jobs from a Broker in another process.
+
+    Runs tasks exactly like Worker, including batching and process-pool
+    execution, but takes up to prefetch jobs per round trip and reports
+    outcomes through the broker instead of a local JobStore and JobQueue.
+    The thread name is its worker_id, which owns its leases at the broker.
+    """
+
+    def __init__(self, broker, worker_id, leases, tasks, task_options=None, prefetch=PREFETCH):
+        super().__init__(None, None, tasks, task_options, leases=leases)
+        self.name = worker_id
+        self.broker = broker
+        self.prefetch = prefetch
+
+    def run(self):
+        while self.running:
+            try:
+                jobs = self.broker.lease(self.name, self.prefetch, LEASE_WAIT_SECONDS)
+            except (ConnectionError, EOFError) as e:
+                logger.error(f"Lost connection to broker: {e}")
+                time.sleep(LEASE_WAIT_SECONDS)
+                continue
+            for job in jobs:
+                self.leases.add(job["job_id"], self.name, self)
+
+            # Runs of the same batchable task go through _process_batch, as
+            # _collect_batch would group them for a local worker.
+            index = 0
+            while index < len(jobs):
+                job = jobs[index]
+                options = self.task_options.get(job["task_name"], {})
+                end = index + 1
+                if options.get("batch"):
+                    limit = index + options.get("batch_size", 1)
+                    while end < min(len(jobs), limit) and jobs[end]["task_name"] == job["task_name"]:
+                        end += 1
+                if end - index > 1:
+                    self._process_batch(jobs[index:end])
+                else:
+                    self._process(job)
+                index = end
+
+    def _apply_outcome(self, job, outcome):
+        job_id = job["job_id"]
+        if not isinstance(outcome, Exception):
+            if self.broker.complete(self.name, job_id, outcome):
+                log_event(logger, logging.INFO, "job.succeeded", "Job %s completed successfully", job_id,
+                          job_id=job_id, task=job["task_name"])
+            return
+
+        delay = self._retry_delay(job, job["attempts"] + 1)
+        status = self.broker.fail(self.name, job_id, str(outcome), time.time() + delay,
+                                  isinstance(outcome, TimeoutError))
+        if status == "pending":
+            log_event(logger, logging.WARNING, "job.retry", "Job %s will be retried in %.2fs", job_id, delay,
+                      job_id=job_id, task=job["task_name"])
+        elif status == "failed":
+            log_event(logger, logging.ERROR, "job.failed", "Job %s permanently failed after %s attempts", job_id,
+                      job["attempts"] + 1, job_id=job_id, task=job["task_name"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run job workers against a remote broker.")
+    parser.add_argument("--broker", default="127.0.0.1:5003", help="broker host:port")
+    parser.add_argument("--threads", type=int, default=THREADS)
+    parser.add_argument("--prefetch", type=int, default=PREFETCH)
+    parser.add_argument("--heartbeat", type=float, default=HEARTBEAT_SECONDS)
+    args = parser.parse_args()
+
+    log_writer = configure_logging(logging.INFO)
+
+    authkey = os.environ.get(AUTHKEY_ENV)
+    if not authkey:
+        parser.error(f"{AUTHKEY_ENV} must be set to the broker's authkey")
+    host, port = args.broker.rsplit(":", 1)
+    broker = connect_broker((host, int(port)), authkey.encode())
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    leases = LeaseSet()
+    heartbeat = Heartbeat(broker.renew, leases, args.heartbeat)
+    heartbeat.start()
+    # Each thread owns its leases, so a job reaped from one thread and leased
+    # again by another cannot be finished by the first.
+    workers = [RemoteWorker(broker, f"{worker_id}/{i}", leases, TASKS, TASK_OPTIONS, args.prefetch)
+               for i in range(args.threads)]
+    for worker in workers:
+        worker.start()
+    logger.info(f"Worker {worker_id} started {args.threads} threads against {args.broker}")
+
+    def shutdown(sig, frame):
+        # Threads finish the jobs they have leased, then exit within one lease wait.
+        for worker in workers:
+            worker.stop()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    for worker in workers:
+        while worker.is_alive():
+            worker.join(timeout=1)
+    heartbeat.stop()
+    logger.info(f"Worker {worker_id} stopped")
+    log_writer.stop()
+
+
+if __name__ == "__main__":
+    main()
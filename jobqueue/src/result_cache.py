@@ -0,0 +1,67 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 10_000
+
+
+class ResultCache:
+    """LRU cache of successful task results keyed by (task_name, payload).
+
+    Used for tasks marked "memoize" in TASK_OPTIONS: a job whose task and
+    payload match an earlier success gets that result without running the
+    task. Entries expire ttl_seconds after they were stored (None keeps them
+    until evicted), and at most max_entries are kept, least recently used
+    first out. Values are stored as given, so an offloaded result is cached
+    as its ResultRef and not as a second in-memory copy.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(task_name, payload):
+        """Hash of the task name and payload, or None if the payload is not JSON.
+
+        Encoded payloads are hashed as stored, without decoding; payloads
+        with the same fields in a different order then get different keys.
+        Decoded payloads are hashed as canonical JSON.
+        """
+        if isinstance(payload, bytes):
+            return hashlib.sha256(task_name.encode() + b"\0" + payload).digest()
+        try:
+            encoded = json.dumps([task_name, payload], sort_keys=True, separators=(",", ":"))
+        except (TypeError, ValueError):
+            return None
+        return hashlib.sha256(encoded.encode()).digest()
+
+    def get(self, key):
+        """Return the cached result for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, result = entry
+            if self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return result
+
+    def put(self, key, result):
+        if result is None:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+
+# Results whose JSON encoding is at least this many bytes are written to disk.
+OFFLOAD_THRESHOLD_BYTES = 64 * 1024
+RESULT_CHUNK_BYTES = 64 * 1024
+
+
+class ResultRef:
+    """Reference to a result held in a ResultStore, kept in the job in its place.
+
+    Pickles to a few dozen bytes, so journal records, archived jobs and
+    cached results carry the reference rather than the result itself.
+    """
+
+    __slots__ = ("digest", "size", "path")
+
+    def __init__(self, digest, size, path):
+        self.digest = digest
+        self.size = size
+        self.path = path
+
+    def open(self):
+        """Map the JSON-encoded result read-only. The caller closes the mmap."""
+        with open(self.path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def load(self):
+        with self.open() as data:
+            return json.loads(data[:])
+
+    def __reduce__(self):
+        return ResultRef, (self.digest, self.size, self.path)
+
+    def __eq__(self, other):
+        return isinstance(other, ResultRef) and other.digest == self.digest
+
+    def __hash__(self):
+        return hash(self.digest)
+
+    def __repr__(self):
+        return f"ResultRef({self.digest[:12]!r}, size={self.size})"
+
+
+class ResultStore:
+    """Content-addressed blob store on local disk for large job results.
+
+    Results are stored JSON-encoded under the SHA-256 of that encoding, so
+    identical results (the same bill generated twice) share one file and
+    storing a result that is already there costs only the hash. Files are
+    written to a temporary name and renamed into place, so a reader never
+    sees a partial blob. Blobs are not deleted when their jobs are evicted,
+    since other jobs may point at the same one.
+    """
+
+    def __init__(self, directory, threshold=OFFLOAD_THRESHOLD_BYTES, fsync=False):
+        self.directory = directory
+        self.threshold = threshold
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+
+    def offload(self, result):
+        """Return a ResultRef for a result over the threshold, otherwise result itself."""
+        if result is None or isinstance(result, (ResultRef, bool, int, float)):
+            return result
+        data = json.dumps(result).encode()
+        if len(data) < self.threshold:
+            return result
+
+        digest = hashlib.sha256(data).hexdigest()
+        path = os.path.join(self.directory, digest[:2], digest)
+        if not os.path.exists(path):
+            self._write(path, data)
+        return ResultRef(digest, len(data), path)
+
+    def _write(self, path, data):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+def resolve(result):
+    """Return the result value, loading it from disk if it was offloaded."""
+    if isinstance(result, ResultRef):
+        return result.load()
+    return result
+
+
+def iter_chunks(data, chunk_size=RESULT_CHUNK_BYTES):
+    """Yield data (bytes or an mmap) in chunks, closing an mmap when done."""
+    try:
+        for offset in range(0, len(data), chunk_size):
+            yield data[offset:offset + chunk_size]
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
@@ -0,0 +1,84 @@
+import math
+import time
+
+# Tokens a rate-limited task may save up while idle, unless its options set
+# "rate_burst". 1 spaces its jobs evenly at the rate.
+DEFAULT_RATE_BURST = 1
+
+
+class TokenBucket:
+    """Allows rate events per second on average, and up to burst at once."""
+
+    def __init__(self, rate, burst=DEFAULT_RATE_BURST):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def available(self, now):
+        """Whole tokens available at monotonic time now."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return math.floor(self.tokens)
+
+    def take(self):
+        self.tokens -= 1
+
+    def next_token_at(self, now):
+        """Monotonic time at which the next whole token is available."""
+        return now + max(0.0, 1 - self.available(now)) / self.rate
+
+
+class TaskLimit:
+    """Concurrency and rate limit for one task, enforced by the JobQueue.
+
+    A job holds an in-flight slot from the moment the queue hands it out
+    until JobQueue.task_done is called for it, and takes one token from the
+    bucket when handed out. Not thread-safe; the queue calls it under its
+    lock.
+    """
+
+    def __init__(self, max_in_flight=None, rate=None, burst=DEFAULT_RATE_BURST):
+        if max_in_flight is not None and max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.max_in_flight = max_in_flight
+        self.bucket = TokenBucket(rate, burst) if rate is not None else None
+        self.in_flight = 0
+
+    def available(self, now):
+        """How many jobs of the task could be handed out at now."""
+        count = math.inf
+        if self.max_in_flight is not None:
+            count = self.max_in_flight - self.in_flight
+        if self.bucket is not None and count > 0:
+            count = min(count, self.bucket.available(now))
+        return count
+
+    def acquire(self):
+        self.in_flight += 1
+        if self.bucket is not None:
+            self.bucket.take()
+
+    def release(self):
+        self.in_flight -= 1
+
+    def ready_at(self, now):
+        """When a job can next be handed out without a task_done, or None if only a task_done frees one."""
+        if self.max_in_flight is not None and self.in_flight >= self.max_in_flight:
+            return None
+        if self.bucket is None:
+            return now
+        return self.bucket.next_token_at(now)
+
+
+def task_limits(task_options):
+    """Build {task_name: TaskLimit} from the "max_in_flight", "rate_limit" and "rate_burst" task options."""
+    limits = {}
+    for task_name, options in task_options.items():
+        if options.get("max_in_flight") is None and options.get("rate_limit") is None:
+            continue
+        limits[task_name] = TaskLimit(options.get("max_in_flight"), options.get("rate_limit"),
+                                      options.get("rate_burst", DEFAULT_RATE_BURST))
+    return limits
@@ -1,3 +1,4 @@
+import asyncio
 import time
 
 def sleep_task(payload):
@@ -5,6 +6,11 @@ def sleep_task(payload):
     time.sleep(seconds)
     return f"Slept for {seconds} seconds."
 
+async def async_sleep_task(payload):
+    seconds = payload["seconds"]
+    await asyncio.sleep(seconds)
+    return f"Slept for {seconds} seconds."
+
 def sum_task(payload):
     total = sum(payload["numbers"])
     return f"Sum is {total}"
@@ -12,7 +18,7 @@ def sum_task(payload):
 def fail_task(payload):
     raise Exception("This task always fails!")
 
-def generate_monthly_bill(payload):
+def _validate_bill_fields(payload):
     required_fields = ["user_id", "billing_period", "subscription_plan", "base_price", "purchases"]
     for field in required_fields:
         if field not in payload:
@@ -23,14 +29,13 @@ def generate_monthly_bill(payload):
     if not isinstance(payload["base_price"], (int, float)) or payload["base_price"] < 0:
         raise ValueError("base_price must be a non-negative number")
 
-    purchases_total = 0.0
-    for purchase in payload["purchases"]:
-        if "price" not in purchase:
-            raise ValueError("Each purchase must have a 'price' field")
-        if not isinstance(purchase["price"], (int, float)) or purchase['price'] < 0:
-            raise ValueError("Purchase price must be a non-negative number")
-        purchases_total += purchase["price"]
+def _validate_price(purchase):
+    if "price" not in purchase:
+        raise ValueError("Each purchase must have a 'price' field")
+    if not isinstance(purchase["price"], (int, float)) or purchase['price'] < 0:
+        raise ValueError("Purchase price must be a non-negative number")
 
+def _bill(payload, purchases_total):
     subscription_charge = payload["base_price"]
     total_charge = subscription_charge + purchases_total
 
@@ -43,9 +48,115 @@ def generate_monthly_bill(payload):
         "total_charge": round(total_charge, 2)
     }
 
+def generate_monthly_bill(payload):
+    _validate_bill_fields(payload)
+
+    purchases_total = 0.0
+    for purchase in payload["purchases"]:
+        _validate_price(purchase)
+        purchases_total += purchase["price"]
+
+    return _bill(payload, purchases_total)
+
+def generate_monthly_bills(payloads):
+    """Batch form of generate_monthly_bill.
+
+    Prices from every payload are laid out in one flat column with per-user
+    offsets, so validation is a type-set and min() check over the whole
+    column and each user's total is a sum() over its slice, both in C. Users
+    that fail the fast checks fall back to generate_monthly_bill to get its
+    exact error. Returns one result or exception per payload.
+    """
+    outcomes = [None] * len(payloads)
+    users = []
+    prices = []
+    offsets = [0]
+    for index, payload in enumerate(payloads):
+        try:
+            _validate_bill_fields(payload)
+            prices.extend([purchase["price"] for purchase in payload["purchases"]])
+        except Exception:
+            outcomes[index] = _bill_or_error(payload)
+            continue
+        users.append(index)
+        offsets.append(len(prices))
+
+    column_valid = _valid_prices(prices)
+    for position, index in enumerate(users):
+        user_prices = prices[offsets[position]:offsets[position + 1]]
+        if column_valid or _valid_prices(user_prices):
+            outcomes[index] = _bill(payloads[index], sum(user_prices, 0.0))
+        else:
+            outcomes[index] = _bill_or_error(payloads[index])
+    return outcomes
+
+_PRICE_TYPES = {int, float, bool}
+
+def _valid_prices(prices):
+    return set(map(type, prices)) <= _PRICE_TYPES and (not prices or min(prices) >= 0)
+
+def _bill_or_error(payload):
+    try:
+        return generate_monthly_bill(payload)
+    except Exception as e:
+        return e
+
+BILL_SCHEMA = {
+    "type": "object",
+    "required": ["user_id", "billing_period", "subscription_plan", "base_price", "purchases"],
+    "properties": {
+        "base_price": {"type": "number", "minimum": 0},
+        "purchases": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["price"],
+                "properties": {"price": {"type": "number", "minimum": 0}}
+            }
+        }
+    }
+}
+
+# async def tasks run on the workers' shared event loop (see Worker).
 TASKS = {
     "sleep": sleep_task,
+    "async_sleep": async_sleep_task,
     "sum": sum_task,
     "fail": fail_task,
     "generate_monthly_bill": generate_monthly_bill
-}
\ No newline at end of file
+}
+
+# Per-task execution options, keyed by the same names as TASKS.
+# "executor": "process" runs the task in the shared process pool instead of
+# the worker thread, so CPU-bound tasks are not serialized by the GIL.
+# "batch" names a function taking a list of payloads and returning one result
+# or exception per payload; workers then run up to "batch_size" queued jobs of
+# the task in one call.
+# "memoize": True reuses the result of an earlier successful job with the same
+# payload (see ResultCache); only for tasks whose result depends on nothing else.
+# "schema" is checked against payloads at submission (see payloads.py), so
+# invalid payloads are rejected with 400 instead of failing every retry.
+# "max_in_flight" caps how many jobs of the task run at once, and "rate_limit"
+# (jobs/sec, with bursts of up to "rate_burst") how fast they start; the
+# JobQueue hands out other tasks' jobs meanwhile (see task_limits.py).
+TASK_OPTIONS = {
+    "sleep": {
+        "schema": {"type": "object", "required": ["seconds"], "properties": {"seconds": {"type": "number", "minimum": 0}}},
+        # Long sleeps must not take over the pool.
+        "max_in_flight": 8
+    },
+    "async_sleep": {
+        "schema": {"type": "object", "required": ["seconds"], "properties": {"seconds": {"type": "number", "minimum": 0}}}
+    },
+    "sum": {
+        "schema": {"type": "object", "required": ["numbers"],
+                   "properties": {"numbers": {"type": "array", "items": {"type": "number"}}}}
+    },
+    "generate_monthly_bill": {
+        "schema": BILL_SCHEMA,
+        "executor": "process",
+        "batch": generate_monthly_bills,
+        "batch_size": 64,
+        "memoize": True
+    }
+}
@@ -0,0 +1,113 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Deadline:
+    """Handle for a callback registered with DeadlineWatchdog."""
+
+    __slots__ = ("when", "callback", "cancelled", "fired")
+
+    def __init__(self, when, callback):
+        self.when = when
+        self.callback = callback
+        self.cancelled = False
+        self.fired = False
+
+
+class DeadlineWatchdog:
+    """One thread that runs callbacks when their deadlines pass.
+
+    Deadlines live in a heap, so registering and cancelling are O(log n) and
+    the thread sleeps until the earliest deadline instead of polling. Cancelled
+    entries are dropped lazily, and the heap is rebuilt once they make up most
+    of it, since most deadlines are cancelled by work finishing in time.
+    """
+
+    def __init__(self, name="deadline-watchdog"):
+        self._heap = []
+        self._cancelled = 0
+        self._seq = itertools.count()
+        self._cond = threading.Condition(threading.Lock())
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def watch(self, timeout, callback):
+        """Call callback() on the watchdog thread once timeout seconds pass."""
+        deadline = Deadline(time.monotonic() + timeout, callback)
+        with self._cond:
+            heapq.heappush(self._heap, (deadline.when, next(self._seq), deadline))
+            if self._heap[0][2] is deadline:
+                self._cond.notify()
+        return deadline
+
+    def cancel(self, deadline):
+        """Cancel a pending deadline.
+
+        Returns False if the callback has already fired (or is firing), so the
+        caller knows its effect must be accounted for.
+        """
+        with self._cond:
+            if deadline.fired:
+                return False
+            if deadline.cancelled:
+                return True
+            deadline.cancelled = True
+            self._cancelled += 1
+            if self._cancelled > 1024 and self._cancelled * 2 > len(self._heap):
+                self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+                heapq.heapify(self._heap)
+                self._cancelled = 0
+            return True
+
+    def pending(self):
+        with self._cond:
+            return sum(1 for _, _, deadline in self._heap if not deadline.cancelled)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    while self._heap and self._heap[0][2].cancelled:
+                        heapq.heappop(self._heap)
+                        self._cancelled -= 1
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    wait = self._heap[0][0] - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+
+                now = time.monotonic()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    deadline = heapq.heappop(self._heap)[2]
+                    if deadline.cancelled:
+                        self._cancelled -= 1
+                    else:
+                        deadline.fired = True
+                        due.append(deadline)
+
+            for deadline in due:
+                try:
+                    deadline.callback()
+                except Exception:
+                    logger.exception("Deadline callback failed")
+
+
+_watchdog = None
+_watchdog_lock = threading.Lock()
+
+
+def get_watchdog():
+    """Return the process-wide watchdog, starting it on first use."""
+    global _watchdog
+    with _watchdog_lock:
+        if _watchdog is None:
+            _watchdog = DeadlineWatchdog()
+        return _watchdog
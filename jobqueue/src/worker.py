@@ -1,63 +1,353 @@
 import threading
+import inspect
 import logging
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import random
+import time
+from functools import partial
+from executors import get_event_loop_runner, get_process_pool, run_with_timeout
+from payloads import decode_payload, run_batch, run_task
+from metrics import Counter, Histogram
+from log_pipeline import log_event
+from profiling import TASK_PROFILES, profile_call
 
 logger = logging.getLogger(__name__)
 
+# Retry backoff defaults, overridable per task (TASK_OPTIONS) and per job.
+DEFAULT_RETRY_DELAY = 0.1
+DEFAULT_MAX_RETRY_DELAY = 60.0
+
+# A leased attempt stops being renewed this long after its timeout passes,
+# so the job of a worker stuck past its timeout is reaped and run elsewhere.
+OVERRUN_GRACE_SECONDS = 5.0
+
+EXECUTION_TIME = Histogram("jobqueue_job_execution_seconds",
+                           "Time spent executing a job attempt (a batch's time is split across its jobs)", ["task"])
+JOBS_FINISHED = Counter("jobqueue_jobs_finished_total", "Jobs that reached a terminal status", ["task", "status"])
+RETRIES = Counter("jobqueue_job_retries_total", "Failed attempts scheduled for retry", ["task"])
+TIMEOUTS = Counter("jobqueue_job_timeouts_total", "Attempts that exceeded their timeout", ["task"])
+MEMO_LOOKUPS = Counter("jobqueue_result_cache_lookups_total", "Result cache lookups for memoized tasks", ["task", "result"])
 
 class Worker(threading.Thread):
-    def __init__(self, job_queue, job_store, tasks):
+    """Runs queued jobs on its own thread.
+
+    With a LeaseSet, each job is started under a lease owned by this
+    thread's name and renewed by the pool's Heartbeat while the thread is
+    alive. If the thread dies or overruns the job's timeout, the lease
+    expires and the reaper hands the job to another worker; anything this
+    worker reports for it afterwards is dropped.
+
+    stop lets the current job finish and wakes the thread if it is blocked
+    in dequeue, so a WorkerPool can retire idle workers right away.
+    busy_time is the total time spent running jobs, for utilization.
+
+    Tasks that are async def coroutines are handed to the shared
+    EventLoopRunner instead of run on this thread: the worker moves on to
+    the next job at once, and the outcome is recorded from the loop thread
+    with the same retry and status handling when the coroutine ends. One
+    worker can so keep thousands of I/O-bound jobs in flight.
+    """
+
+    def __init__(self, job_queue, job_store, tasks, task_options=None, result_cache=None,
+                 leases=None, lease_seconds=None):
         super().__init__()
         self.job_queue = job_queue
         self.job_store = job_store
         self.tasks = tasks
+        self.task_options = task_options or {}
+        self.result_cache = result_cache
+        self.leases = leases
+        self.lease_seconds = lease_seconds
         self.running = True
+        self.busy_seconds = 0.0
+        self._busy_since = None
+        self._stopping = threading.Event()
 
     def run(self):
         while self.running:
-            job_id = self.job_queue.dequeue()
-            job = self.job_store.get_job(job_id)
+            job_id = self.job_queue.dequeue(cancelled=self._stopping)
+            if job_id is None:
+                continue
+            self._busy_since = time.perf_counter()
+            try:
+                job = self._start(job_id)
+                if job is None:
+                    continue
+
+                batch, next_job = self._collect_batch(job)
+                if len(batch) > 1:
+                    self._process_batch(batch)
+                else:
+                    self._process(job)
+                if next_job is not None:
+                    self._process(next_job)
+            finally:
+                busy_since, self._busy_since = self._busy_since, None
+                self.busy_seconds += time.perf_counter() - busy_since
+
+    def busy_time(self):
+        """Seconds spent running jobs so far, including the job in progress."""
+        busy_since = self._busy_since
+        current = time.perf_counter() - busy_since if busy_since is not None else 0.0
+        return self.busy_seconds + current
+
+    def is_busy(self):
+        return self._busy_since is not None
+
+    def _collect_batch(self, job):
+        """Take up to batch_size - 1 more ready jobs of job's task off the queue.
+
+        Stops at the first job of another task and returns it separately so
+        it runs right after the batch instead of going back to the queue.
+        """
+        batch = [job]
+        options = self.task_options.get(job["task_name"], {})
+        if not options.get("batch"):
+            return batch, None
+
+        while len(batch) < options.get("batch_size", 1):
+            job_id = self.job_queue.dequeue_nowait()
+            if job_id is None:
+                break
+            other = self._start(job_id)
+            if other is None:
+                continue
+            if other["task_name"] != job["task_name"]:
+                return batch, other
+            batch.append(other)
+        return batch, None
+
+    def _start(self, job_id):
+        if self.leases is None:
+            job = self.job_store.start_job(job_id)
+        else:
+            job = self.job_store.start_job(job_id, owner=self.name, lease_seconds=self.lease_seconds)
+            if job is not None:
+                self.leases.add(job_id, self.name, self)
+        if job is None:
+            self.job_queue.task_done(job_id)
+        return job
+
+    def _arm_lease(self, job, timeout, thread=None):
+        # Called as the attempt starts executing, so time spent queued in a
+        # batch or prefetch does not count against the timeout. thread is
+        # the one running the job, whose death lets the lease expire.
+        if self.leases is None:
+            return
+        renew_until = time.monotonic() + timeout + OVERRUN_GRACE_SECONDS if timeout else None
+        self.leases.add(job["job_id"], self.name, thread or self, renew_until)
+
+    def _process(self, job):
+        memo_key = self._memo_key(job)
+        if memo_key is not None and self._reuse_cached(job, memo_key):
+            return
+
+        job_id = job["job_id"]
+        log_event(logger, logging.INFO, "job.started", "Job %s started - task: %s", job_id, job["task_name"],
+                  job_id=job_id, task=job["task_name"])
+        if inspect.iscoroutinefunction(self.tasks.get(job["task_name"])):
+            self._submit_async(job, memo_key)
+            return
+        self._arm_lease(job, job.get("timeout"))
+
+        start = time.perf_counter()
+        try:
+            result = self._execute(job["task_name"], job.payload, job.get("timeout"))
+        except Exception as e:
+            outcome = e
+        else:
+            outcome = result
+        EXECUTION_TIME.observe(time.perf_counter() - start, (job["task_name"],))
+        self._record_outcome(job, self._memoize(memo_key, outcome))
+
+    def _submit_async(self, job, memo_key):
+        """Start a coroutine task on the event loop; its outcome is recorded on one of the loop's outcome threads."""
+        task_name = job["task_name"]
+        runner = get_event_loop_runner()
+        # The job lives on the loop thread now, and so does its lease.
+        self._arm_lease(job, job.get("timeout"), runner.thread)
+        start = time.perf_counter()
 
-            self.job_store.update_job_status(job_id, "running")
-            logger.info(f"Job {job_id} started - task: {job['task_name']}")
+        def finished(outcome):
+            EXECUTION_TIME.observe(time.perf_counter() - start, (task_name,))
+            self._record_outcome(job, self._memoize(memo_key, outcome))
 
+        runner.submit(self.tasks[task_name], decode_payload(job.payload), job.get("timeout"), finished)
+
+    def _process_batch(self, batch):
+        task_name = batch[0]["task_name"]
+        memo_keys = [self._memo_key(job) for job in batch]
+        uncached = [(job, memo_key) for job, memo_key in zip(batch, memo_keys)
+                    if memo_key is None or not self._reuse_cached(job, memo_key)]
+        if not uncached:
+            return
+        batch = [job for job, _ in uncached]
+        log_event(logger, logging.INFO, "batch.started", "Batch of %s jobs started - task: %s", len(batch), task_name,
+                  task=task_name, jobs=len(batch))
+
+        for job in batch:
+            self._arm_lease(job, job.get("timeout"))
+        timeouts = [job.get("timeout") for job in batch]
+        timeout = None if None in timeouts else max(timeouts)
+        start = time.perf_counter()
+        try:
+            outcomes = self._execute_batch(task_name, [job.payload for job in batch], timeout)
+            if len(outcomes) != len(batch):
+                raise ValueError(f"Batch task returned {len(outcomes)} outcomes for {len(batch)} jobs")
+        except Exception as e:
+            # The whole call failed (timeout, crashed process), so every job
+            # in it used an attempt.
+            outcomes = [e] * len(batch)
+
+        per_job = (time.perf_counter() - start) / len(batch)
+        for (job, memo_key), outcome in zip(uncached, outcomes):
+            EXECUTION_TIME.observe(per_job, (task_name,))
+            self._record_outcome(job, self._memoize(memo_key, outcome))
+
+    def _memo_key(self, job):
+        if self.result_cache is None or not self.task_options.get(job["task_name"], {}).get("memoize"):
+            return None
+        return self.result_cache.key(job["task_name"], job.payload)
+
+    def _reuse_cached(self, job, memo_key):
+        """Finish job with a cached result for its task and payload; False on a cache miss."""
+        result = self.result_cache.get(memo_key)
+        MEMO_LOOKUPS.inc(labels=(job["task_name"], "miss" if result is None else "hit"))
+        if result is None:
+            return False
+        log_event(logger, logging.INFO, "job.cached", "Job %s reused a cached result - task: %s", job["job_id"],
+                  job["task_name"], job_id=job["job_id"], task=job["task_name"])
+        self._record_outcome(job, result)
+        return True
+
+    def _memoize(self, memo_key, outcome):
+        # Cache what the store keeps (a ResultRef for large results), so a
+        # cached result is never a second in-memory copy.
+        if memo_key is None or isinstance(outcome, Exception):
+            return outcome
+        try:
+            outcome = self.job_store.store_result(outcome)
+        except (TypeError, ValueError) as e:
+            # Not JSON-encodable; _apply_outcome counts it as a failed attempt.
+            return e
+        self.result_cache.put(memo_key, outcome)
+        return outcome
+
+    def _record_outcome(self, job, outcome):
+        """Store a result, or count a failed attempt and retry or fail the job."""
+        job_id = job["job_id"]
+        # The attempt is over: free its task slot before a retry is enqueued,
+        # or another worker could take the retry while the slot is held.
+        # Remote workers have no queue; the broker frees it.
+        if self.job_queue is not None:
+            self.job_queue.task_done(job_id)
+        try:
+            self._apply_outcome(job, outcome)
+        finally:
+            if self.leases is not None:
+                self.leases.discard(job_id)
+
+    def _apply_outcome(self, job, outcome):
+        job_id = job["job_id"]
+        task_name = job["task_name"]
+        owner = self.name if self.leases is not None else None
+
+        if not isinstance(outcome, Exception):
             try:
-                task_name = job["task_name"]
-                task_func = self.tasks[task_name]
-
-                payload = job["payload"]
-                timeout = job.get("timeout")
-
-                if timeout:
-                    executor = ThreadPoolExecutor(max_workers=1)
-                    future = executor.submit(task_func, payload)
-
-                    try:
-                        result = future.result(timeout=timeout)
-                        executor.shutdown(wait=True)
-                    except FutureTimeoutError:
-                        executor.shutdown(wait=False)
-                        raise TimeoutError(f"Job exceeded timeout of {timeout} seconds")
-                else:
-                    result = task_func(payload)
+                stored = self.job_store.update_job_status(job_id, "success", result=outcome, owner=owner)
+            except (TypeError, ValueError) as e:
+                # The result store could not JSON-encode the result; that is
+                # a failed attempt like any other.
+                outcome = e
+            else:
+                if not stored:
+                    logger.warning(f"Dropped result for job {job_id}: job missing or lease lost")
+                    return
+                JOBS_FINISHED.inc(labels=(task_name, "success"))
+                log_event(logger, logging.INFO, "job.succeeded", "Job %s completed successfully - result: %s", job_id,
+                          outcome, job_id=job_id, task=task_name)
+                return
 
-                self.job_store.update_job_status(job_id, "success", result=result)
-                logger.info(f"Job {job_id} completed successfully - result: {result}")
+        if isinstance(outcome, TimeoutError):
+            TIMEOUTS.inc(labels=(task_name,))
+        delay = self._retry_delay(job, job["attempts"] + 1)
+        job = self.job_store.fail_attempt(job_id, str(outcome), retry_at=time.time() + delay, owner=owner)
+        if job is None:
+            logger.warning(f"Dropped failure for job {job_id}: job missing or lease lost")
+            return
 
-            except Exception as e:
-                error_message = str(e)
+        if job["status"] == "pending":
+            RETRIES.inc(labels=(task_name,))
+            self.job_queue.enqueue(job_id, job["priority"], job["tenant"], job["run_at"], task_name)
+            log_event(logger, logging.WARNING, "job.retry", "Job %s will be retried in %.2fs (attempt %s/%s)", job_id,
+                      delay, job["attempts"], job["max_retries"], job_id=job_id, task=task_name)
+        else:
+            JOBS_FINISHED.inc(labels=(task_name, "failed"))
+            log_event(logger, logging.ERROR, "job.failed", "Job %s permanently failed after %s attempts", job_id,
+                      job["attempts"], job_id=job_id, task=task_name)
 
-                self.job_store.increment_attempts(job_id)
+    def _retry_delay(self, job, attempts):
+        """Exponential backoff with equal jitter before the retry that follows failed attempt number attempts."""
+        options = self.task_options.get(job["task_name"], {})
+        base = job.get("retry_delay")
+        if base is None:
+            base = options.get("retry_delay", DEFAULT_RETRY_DELAY)
+        cap = job.get("max_retry_delay")
+        if cap is None:
+            cap = options.get("max_retry_delay", DEFAULT_MAX_RETRY_DELAY)
 
-                job = self.job_store.get_job(job_id)
+        delay = min(cap, base * 2 ** min(attempts - 1, 32))
+        return delay / 2 + random.uniform(0, delay / 2)
 
-                if job["attempts"] < job["max_retries"]:
-                    self.job_store.update_job_status(job_id, "pending")
-                    self.job_queue.enqueue(job_id)
-                    logger.warning(f"Job {job_id} will be retried (attempt {job['attempts']}/{job['max_retries']})")
-                else:
-                    self.job_store.update_job_status(job_id, "failed", error=error_message)
-                    logger.error(f"Job {job_id} permanently failed after {job['attempts']} attempts")
+    def _execute(self, task_name, payload, timeout):
+        """Run the task on payload as the store encoded it; it is decoded where the task runs."""
+        task_func = self.tasks.get(task_name)
+        if task_func is None:
+            raise ValueError(f"Unknown task: {task_name}")
+        options = self.task_options.get(task_name, {})
+        if options.get("profile_every") and TASK_PROFILES.should_profile(task_name, options["profile_every"]):
+            return self._execute_profiled(task_name, partial(run_task, task_func), payload, timeout, options)
+
+        if options.get("executor") == "process":
+            # Only the function reference and the encoded payload bytes are
+            # pickled; the child already has the task module loaded from the
+            # fork and decodes the payload itself. On timeout the child is
+            # killed and replaced.
+            return get_process_pool().run(partial(run_task, task_func), payload, timeout)
+
+        payload = decode_payload(payload)
+        if timeout:
+            return run_with_timeout(task_func, payload, timeout)
+
+        return task_func(payload)
+
+    def _execute_batch(self, task_name, payloads, timeout):
+        options = self.task_options[task_name]
+        batch_func = options["batch"]
+        if options.get("profile_every") and TASK_PROFILES.should_profile(task_name, options["profile_every"]):
+            return self._execute_profiled(task_name, partial(run_batch, batch_func), payloads, timeout, options)
+
+        if options.get("executor") == "process":
+            return get_process_pool().run(partial(run_batch, batch_func), payloads, timeout)
+
+        payloads = [decode_payload(payload) for payload in payloads]
+        if timeout:
+            return run_with_timeout(batch_func, payloads, timeout)
+
+        return batch_func(payloads)
+
+    def _execute_profiled(self, task_name, func, payload, timeout, options):
+        """Run func(payload) where _execute would, under cProfile, and add its stats to TASK_PROFILES."""
+        func = partial(profile_call, func)
+        if options.get("executor") == "process":
+            outcome = get_process_pool().run(func, payload, timeout)
+        elif timeout:
+            outcome = run_with_timeout(func, payload, timeout)
+        else:
+            outcome = func(payload)
+        return TASK_PROFILES.collect(task_name, outcome)
 
     def stop(self):
-        self.running = False
\ No newline at end of file
+        self.running = False
+        self._stopping.set()
+        if self.job_queue is not None:
+            self.job_queue.wake_all()
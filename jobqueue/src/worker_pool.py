@@ -0,0 +1,209 @@
+import logging
+import math
+import threading
+import time
+from metrics import CallbackMetric, Counter
+
+logger = logging.getLogger(__name__)
+
+# The pool takes one sample of queue depth, mean queue wait and worker
+# utilization every SCALE_INTERVAL_SECONDS and may resize after each.
+SCALE_INTERVAL_SECONDS = 1.0
+
+# Backlog that triggers a scale-up: more ready jobs than this per worker, or
+# a mean wait in the queue above TARGET_WAIT_SECONDS.
+TARGET_QUEUE_PER_WORKER = 4
+TARGET_WAIT_SECONDS = 0.5
+
+# An empty queue with utilization below SCALE_DOWN_UTILIZATION triggers a
+# scale-down to enough workers to run the observed load at TARGET_UTILIZATION.
+SCALE_DOWN_UTILIZATION = 0.3
+TARGET_UTILIZATION = 0.7
+
+# Consecutive samples a condition must hold before the pool resizes, and
+# samples skipped after every resize.
+SCALE_UP_SAMPLES = 2
+SCALE_DOWN_SAMPLES = 10
+COOLDOWN_SAMPLES = 3
+
+_pool_sizes = {}
+
+POOL_WORKERS = CallbackMetric("jobqueue_pool_workers", "Workers currently in each worker pool",
+                              lambda: dict(_pool_sizes), ["pool"])
+POOL_RESIZES = Counter("jobqueue_pool_resizes_total", "Worker pool resizes by direction", ["pool", "direction"])
+
+
+class ScalingPolicy:
+    """Picks a worker count from one sample per interval, with hysteresis.
+
+    Scaling up needs a backlog for up_samples consecutive samples, and jumps
+    straight to the size that clears it. Scaling down needs an empty queue
+    and low utilization for the much longer down_samples. The gap between
+    the two conditions and the cooldown after each resize keep the pool from
+    flapping when the load sits near a threshold.
+    """
+
+    def __init__(self, min_workers, max_workers, queue_per_worker=TARGET_QUEUE_PER_WORKER,
+                 target_wait=TARGET_WAIT_SECONDS, down_utilization=SCALE_DOWN_UTILIZATION,
+                 target_utilization=TARGET_UTILIZATION, up_samples=SCALE_UP_SAMPLES,
+                 down_samples=SCALE_DOWN_SAMPLES, cooldown_samples=COOLDOWN_SAMPLES):
+        if min_workers < 0 or max_workers < max(1, min_workers):
+            raise ValueError("need 0 <= min_workers <= max_workers and max_workers >= 1")
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.queue_per_worker = queue_per_worker
+        self.target_wait = target_wait
+        self.down_utilization = down_utilization
+        self.target_utilization = target_utilization
+        self.up_samples = up_samples
+        self.down_samples = down_samples
+        self.cooldown_samples = cooldown_samples
+        self._up = 0
+        self._down = 0
+        self._cooldown = 0
+
+    def decide(self, workers, depth, mean_wait, utilization):
+        """Return the worker count to run, given the current count and this interval's sample.
+
+        mean_wait is None when no job was dequeued during the interval.
+        """
+        if workers < self.min_workers or workers > self.max_workers:
+            return self._resized(min(self.max_workers, max(self.min_workers, workers)))
+        if self._cooldown:
+            self._cooldown -= 1
+            return workers
+
+        backlog = depth > workers * self.queue_per_worker or (mean_wait is not None and mean_wait > self.target_wait)
+        idle = depth == 0 and utilization < self.down_utilization
+        self._up = self._up + 1 if backlog else 0
+        self._down = self._down + 1 if idle else 0
+
+        if self._up >= self.up_samples and workers < self.max_workers:
+            needed = math.ceil(depth / self.queue_per_worker)
+            return self._resized(min(self.max_workers, max(workers + 1, needed)))
+        if self._down >= self.down_samples and workers > self.min_workers:
+            needed = math.ceil(utilization * workers / self.target_utilization)
+            return self._resized(max(self.min_workers, min(workers - 1, needed)))
+        return workers
+
+    def _resized(self, workers):
+        self._up = 0
+        self._down = 0
+        self._cooldown = self.cooldown_samples
+        return workers
+
+
+class WorkerPool(threading.Thread):
+    """Grows and shrinks a set of workers as the ScalingPolicy decides.
+
+    worker_factory returns a new, unstarted Worker (or anything with the same
+    start, stop, is_alive, is_busy and busy_time methods). Workers removed on
+    scale-down are stopped gracefully: idle ones are picked first, and a
+    busy one finishes its current job before its thread exits. A worker
+    whose thread dies is dropped and the policy replaces it if the pool
+    falls below min_workers.
+    """
+
+    def __init__(self, worker_factory, job_queue, min_workers, max_workers, policy=None,
+                 interval=SCALE_INTERVAL_SECONDS, name="workers"):
+        super().__init__(name=f"{name}-autoscaler", daemon=True)
+        self.worker_factory = worker_factory
+        self.job_queue = job_queue
+        self.policy = policy or ScalingPolicy(min_workers, max_workers)
+        self.interval = interval
+        self.pool_name = name
+        self.workers = []
+        self._retired = []
+        self._busy_marks = {}
+        self._last_sample = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self.policy.min_workers:
+                self._grow(self.policy.min_workers)
+            _pool_sizes[(self.pool_name,)] = len(self.workers)
+        self._last_sample = (time.monotonic(), self.job_queue.dequeued, self.job_queue.wait_seconds)
+        super().start()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.scale_once()
+            except Exception:
+                logger.exception("Worker pool scaling pass failed")
+
+    def scale_once(self):
+        """Sample the queue and workers, resize if the policy says so, and return the pool size."""
+        with self._lock:
+            self.workers = [worker for worker in self.workers if worker.is_alive()]
+            self._retired = [worker for worker in self._retired if worker.is_alive()]
+
+            now, dequeued, wait_seconds = time.monotonic(), self.job_queue.dequeued, self.job_queue.wait_seconds
+            last_at, last_dequeued, last_wait_seconds = self._last_sample
+            self._last_sample = (now, dequeued, wait_seconds)
+            mean_wait = (wait_seconds - last_wait_seconds) / (dequeued - last_dequeued) if dequeued > last_dequeued else None
+
+            size = len(self.workers)
+            busy = 0.0
+            busy_marks = {}
+            for worker in self.workers:
+                busy_marks[worker] = worker.busy_time()
+                busy += busy_marks[worker] - self._busy_marks.get(worker, 0.0)
+            self._busy_marks = busy_marks
+            elapsed = now - last_at
+            utilization = min(1.0, busy / (elapsed * size)) if size and elapsed > 0 else 0.0
+
+            depth = self.job_queue.qsize()
+            target = self.policy.decide(size, depth, mean_wait, utilization)
+            if target != size:
+                wait_text = "n/a" if mean_wait is None else f"{mean_wait * 1000:.0f}ms"
+                logger.info(f"Scaling pool {self.pool_name} from {size} to {target} workers "
+                            f"(depth {depth}, mean wait {wait_text}, utilization {utilization:.0%})")
+                if target > size:
+                    self._grow(target - size)
+                else:
+                    self._shrink(size - target)
+            return len(self.workers)
+
+    def size(self):
+        with self._lock:
+            return len(self.workers)
+
+    def stop(self, timeout=5):
+        """Stop scaling and every worker, waiting up to timeout seconds for current jobs."""
+        self._stopped.set()
+        if self.is_alive():
+            self.join()
+        with self._lock:
+            workers = self.workers + self._retired
+            self.workers = []
+            self._retired = []
+            self._busy_marks.clear()
+            _pool_sizes.pop((self.pool_name,), None)
+        for worker in workers:
+            worker.stop()
+        deadline = time.monotonic() + timeout
+        for worker in workers:
+            worker.join(max(0, deadline - time.monotonic()))
+
+    def _grow(self, count):
+        for _ in range(count):
+            worker = self.worker_factory()
+            worker.start()
+            self.workers.append(worker)
+            self._busy_marks[worker] = 0.0
+        POOL_RESIZES.inc(labels=(self.pool_name, "up"))
+        _pool_sizes[(self.pool_name,)] = len(self.workers)
+
+    def _shrink(self, count):
+        # sorted is stable and False sorts first, so idle workers go first.
+        retiring = sorted(self.workers, key=lambda worker: worker.is_busy())[:count]
+        for worker in retiring:
+            worker.stop()
+            self.workers.remove(worker)
+            self._busy_marks.pop(worker, None)
+        self._retired.extend(retiring)
+        POOL_RESIZES.inc(labels=(self.pool_name, "down"))
+        _pool_sizes[(self.pool_name,)] = len(self.workers)
@@ -0,0 +1,429 @@
+import unittest
+import http.client
+import json
+import socket
+import threading
+import time
+import sys
+sys.path.insert(0, 'src')
+
+from job_store import JobStore
+from job_queue import JobQueue
+from tasks import TASKS
+from worker import Worker
+from api import app, init_api
+from async_api import AsyncApiServer
+import handlers
+from result_store import ResultStore
+from capacity import CapacityLimits
+from profiling import TASK_PROFILES
+import tempfile
+
+class TestBatchApi(unittest.TestCase):
+    def setUp(self):
+        self.job_store = JobStore()
+        self.job_queue = JobQueue()
+        init_api(self.job_store, self.job_queue)
+        self.client = app.test_client()
+
+    def test_batch_creates_and_enqueues_jobs(self):
+        jobs = [{"task": "sum", "payload": {"numbers": [i]}} for i in range(50)]
+
+        response = self.client.post("/jobs/batch", json={"jobs": jobs})
+
+        self.assertEqual(response.status_code, 201)
+        items = response.get_json()["jobs"]
+        self.assertEqual(len(items), 50)
+        self.assertTrue(all(item["status"] == "pending" and item["created"] for item in items))
+        self.assertEqual(self.job_queue.qsize(), 50)
+
+        job = self.job_store.get_job(items[3]["job_id"])
+        self.assertEqual(job["payload"], {"numbers": [3]})
+
+    def test_unbounded_schedules_are_rejected(self):
+        for fields in ('"delay": Infinity', '"delay": NaN', '"run_at": 1e300', '"run_at": "9999-01-01T00:00:00"',
+                       '"max_retry_delay": Infinity'):
+            response = self.client.post("/jobs", data=f'{{"task": "sum", "payload": {{"numbers": [1]}}, {fields}}}',
+                                        content_type="application/json")
+            self.assertEqual(response.status_code, 400, fields)
+        self.assertEqual(self.job_queue.qsize(), 0)
+
+    def test_unknown_task_is_rejected(self):
+        response = self.client.post("/jobs", json={"task": "nope", "payload": {}})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()["error"], "Unknown task: nope")
+        self.assertEqual(self.job_queue.qsize(), 0)
+
+    def test_batch_submits_a_dag_by_ref(self):
+        self.job_store.set_ready_callback(self.job_queue.enqueue_many)
+        jobs = [
+            {"task": "sum", "payload": {"numbers": [0]}, "ref": "report", "depends_on": ["bill_1", "bill_2"]},
+            {"task": "sum", "payload": {"numbers": [1]}, "ref": "bill_1"},
+            {"task": "sum", "payload": {"numbers": [2]}, "ref": "bill_2"}
+        ]
+
+        items = self.client.post("/jobs/batch", json={"jobs": jobs}).get_json()["jobs"]
+
+        self.assertEqual([item["status"] for item in items], ["blocked", "pending", "pending"])
+        self.assertEqual(self.job_queue.qsize(), 2)
+        for item in items[1:]:
+            self.job_store.update_job_status(item["job_id"], "success", result="ok")
+        self.assertEqual(self.job_store.get_job(items[0]["job_id"])["status"], "pending")
+        self.assertEqual(self.job_queue.qsize(), 3)
+
+        cycle = [{"task": "sum", "payload": {"numbers": [1]}, "ref": "a", "depends_on": ["b"]},
+                 {"task": "sum", "payload": {"numbers": [2]}, "ref": "b", "depends_on": ["a"]}]
+        self.assertEqual(self.client.post("/jobs/batch", json={"jobs": cycle}).status_code, 400)
+        unknown = self.client.post("/jobs", json={"task": "sum", "payload": {"numbers": [1]}, "depends_on": ["no-such-job"]})
+        self.assertEqual(unknown.status_code, 400)
+
+    def test_batch_idempotency_per_item(self):
+        existing_job_id = self.job_store.create_job("sum", {"numbers": [1]}, client_job_id="billing-user_1-2026-01")
+        jobs = [
+            {"task": "sum", "payload": {"numbers": [1]}, "client_job_id": "billing-user_1-2026-01"},
+            {"task": "sum", "payload": {"numbers": [2]}, "client_job_id": "billing-user_2-2026-01"},
+            {"task": "sum", "payload": {"numbers": [2]}, "client_job_id": "billing-user_2-2026-01"}
+        ]
+
+        items = self.client.post("/jobs/batch", json={"jobs": jobs}).get_json()["jobs"]
+
+        self.assertEqual(items[0]["job_id"], existing_job_id)
+        self.assertFalse(items[0]["created"])
+        self.assertTrue(items[1]["created"])
+        self.assertEqual(items[1]["job_id"], items[2]["job_id"])
+        self.assertFalse(items[2]["created"])
+        self.assertEqual(self.job_queue.qsize(), 1)
+
+    def test_delayed_job_is_scheduled(self):
+        response = self.client.post("/jobs", json={"task": "sum", "payload": {"numbers": [1]}, "delay": 60})
+
+        job = self.job_store.get_job(response.get_json()["job_id"])
+        self.assertGreater(job["run_at"], time.time() + 55)
+        self.assertEqual(self.job_queue.qsize(), 0)
+        self.assertEqual(self.job_queue.delayed_count(), 1)
+
+    def test_rejects_run_at_with_delay(self):
+        response = self.client.post("/jobs", json={"task": "sum", "payload": {"numbers": [1]}, "run_at": "2026-01-01T00:00:00", "delay": 5})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_tenant_that_is_not_a_short_string(self):
+        for tenant in (7, ["billing"], "", "t" * 129):
+            response = self.client.post("/jobs", json={"task": "sum", "payload": {"numbers": [1]}, "tenant": tenant})
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.job_queue.qsize(), 0)
+
+    def test_invalid_payload_is_rejected_against_task_schema(self):
+        bill = {"user_id": "user_1", "billing_period": "2026-01", "subscription_plan": "prime",
+                "base_price": 14.99, "purchases": [{"price": 3.99}, {"price": -1}]}
+
+        response = self.client.post("/jobs", json={"task": "generate_monthly_bill", "payload": bill})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()["error"], "payload.purchases[1].price must be at least 0")
+        bill["purchases"][1]["price"] = 1.0
+        job_id = self.client.post("/jobs", json={"task": "generate_monthly_bill", "payload": bill}).get_json()["job_id"]
+        self.assertIsInstance(self.job_store.get_job(job_id).payload, bytes)
+        self.assertEqual(self.job_store.get_job(job_id)["payload"], bill)
+        self.assertEqual(self.job_queue.qsize(), 1)
+
+    def test_batch_rejects_item_without_task(self):
+        response = self.client.post("/jobs/batch", json={"jobs": [{"task": "sum", "payload": {"numbers": [1]}}, {"payload": {}}]})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.job_queue.qsize(), 0)
+
+class TestAdmissionControl(unittest.TestCase):
+    MAX_JOBS = 50
+    WORKERS = 2
+    JOB_SECONDS = 0.005
+    OVERLOAD = 10
+    DURATION = 1.5
+
+    def test_sustained_overload_keeps_memory_and_latency_bounded(self):
+        capacity = CapacityLimits(max_jobs=self.MAX_JOBS)
+        job_store = JobStore(capacity=capacity, max_retained_jobs=64)
+        job_queue = JobQueue()
+        init_api(job_store, job_queue)
+        # Finished jobs are evicted within the run, so latencies are taken as they finish.
+        finished = []
+        job_store.add_listener(lambda job: finished.append(job))
+        workers = [Worker(job_queue, job_store, TASKS) for _ in range(self.WORKERS)]
+        for worker in workers:
+            worker.start()
+
+        # Ten times what the workers can finish, paced in 10 ms ticks.
+        per_tick = round(self.WORKERS / self.JOB_SECONDS * self.OVERLOAD / 100)
+        accepted, rejected, peak_jobs = [], 0, 0
+        body = {"task": "sleep", "payload": {"seconds": self.JOB_SECONDS}}
+        deadline = time.perf_counter() + self.DURATION
+        while time.perf_counter() < deadline:
+            tick = time.perf_counter()
+            for _ in range(per_tick):
+                response, status = handlers.submit_job(body)
+                if status == 201:
+                    accepted.append(response["job_id"])
+                else:
+                    self.assertEqual(status, 429)
+                    self.assertGreaterEqual(response["retry_after"], 1)
+                    rejected += 1
+            peak_jobs = max(peak_jobs, sum(len(shard.jobs) for shard in job_store._shards))
+            self.assertLessEqual(capacity.unfinished(), self.MAX_JOBS)
+            self.assertLessEqual(job_queue.qsize(), self.MAX_JOBS)
+            time.sleep(max(0, 0.01 - (time.perf_counter() - tick)))
+
+        deadline = time.perf_counter() + 5
+        while len(finished) < len(accepted) and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        for worker in workers:
+            worker.stop()
+        for worker in workers:
+            worker.join(timeout=2)
+
+        self.assertGreater(rejected, len(accepted))
+        # Unfinished jobs plus one retained finished job per shard.
+        self.assertLessEqual(peak_jobs, self.MAX_JOBS + len(job_store._shards))
+        # Unbounded, the backlog (and each job's wait) would grow for the whole
+        # run; admitted jobs wait for at most MAX_JOBS jobs ahead of them.
+        self.assertEqual(len(finished), len(accepted))
+        self.assertTrue(all(job["status"] == "success" for job in finished))
+        latencies = [job["updated_at"] - job["created_at"] for job in finished]
+        self.assertLess(max(latencies), 1.0)
+
+    def test_full_store_answers_429_with_retry_after(self):
+        init_api(JobStore(capacity=CapacityLimits(max_jobs=1)), JobQueue())
+        client = app.test_client()
+        body = {"task": "sum", "payload": {"numbers": [1, 2]}}
+        self.assertEqual(client.post("/jobs", json=body).status_code, 201)
+
+        response = client.post("/jobs", json=body)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["Retry-After"], "1")
+        self.assertEqual(response.get_json()["retry_after"], 1)
+        response = client.post("/jobs/batch", json={"jobs": [body]})
+        self.assertEqual(response.status_code, 429)
+
+
+class TestJobListingApi(unittest.TestCase):
+    def setUp(self):
+        self.job_store = JobStore()
+        init_api(self.job_store, JobQueue())
+        self.client = app.test_client()
+
+    def test_lists_failed_jobs_of_a_task_page_by_page(self):
+        job_ids = [self.job_store.create_job("generate_monthly_bill", {"user_id": i}) for i in range(5)]
+        self.job_store.create_job("sum", {"numbers": [1]})
+        for job_id in job_ids[:3]:
+            self.job_store.update_job_status(job_id, "failed", error="missing prices")
+
+        first = self.client.get("/jobs?status=failed&task=generate_monthly_bill&limit=2").get_json()
+        second = self.client.get(f"/jobs?status=failed&task=generate_monthly_bill&limit=2&cursor={first['next_cursor']}").get_json()
+
+        self.assertEqual([job["job_id"] for job in first["jobs"] + second["jobs"]], job_ids[:3])
+        self.assertIsNone(second["next_cursor"])
+        self.assertEqual(first["counts"], {"blocked": 0, "pending": 2, "running": 0, "success": 0, "failed": 3})
+        self.assertEqual(self.client.get("/jobs?status=done").status_code, 400)
+
+class TestProfilingApi(unittest.TestCase):
+    def setUp(self):
+        self.job_store = JobStore()
+        self.job_queue = JobQueue()
+        init_api(self.job_store, self.job_queue)
+        self.client = app.test_client()
+        TASK_PROFILES.reset()
+        self.addCleanup(TASK_PROFILES.reset)
+
+    def test_profiles_worker_threads_and_profiled_tasks(self):
+        worker = Worker(self.job_queue, self.job_store, TASKS, {"sleep": {"profile_every": 1}})
+        worker.start()
+        self.addCleanup(worker.join, 2)
+        self.addCleanup(worker.stop)
+        self.assertEqual(self.client.get("/admin/profile/tasks").status_code, 404)
+        job_id = self.job_store.create_job("sleep", {"seconds": 0.3})
+        self.job_queue.enqueue(job_id, task_name="sleep")
+
+        response = self.client.post("/admin/profile?seconds=0.2")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "text/plain")
+        sleeping = [line for line in response.get_data(as_text=True).splitlines() if "sleep_task (tasks.py" in line]
+        self.assertTrue(sleeping and sleeping[0].startswith("Worker;"))
+        self.assertIn(";run (worker.py", sleeping[0])
+        self.assertEqual(self.job_store.wait_for_job(job_id, 5)["status"], "success")
+        report = self.client.get("/admin/profile/tasks?task=sleep")
+        self.assertEqual(report.status_code, 200)
+        self.assertIn("sleep: 1 profiled executions", report.get_data(as_text=True))
+        self.assertEqual(self.client.delete("/admin/profile/tasks").status_code, 200)
+        self.assertEqual(self.client.get("/admin/profile/tasks?task=sleep").status_code, 404)
+        self.assertEqual(self.client.post("/admin/profile?seconds=600").status_code, 400)
+        self.assertEqual(self.client.post("/admin/profile?seconds=soon").status_code, 400)
+
+class TestJobCompletionApi(unittest.TestCase):
+    def setUp(self):
+        self.job_store = JobStore()
+        self.job_queue = JobQueue()
+        init_api(self.job_store, self.job_queue)
+        self.client = app.test_client()
+        self.worker = Worker(self.job_queue, self.job_store, TASKS)
+        self.worker.start()
+
+    def tearDown(self):
+        self.worker.stop()
+        dummy_job_id = self.job_store.create_job("sum", {"numbers": [0]})
+        self.job_queue.enqueue(dummy_job_id)
+        self.worker.join(timeout=2)
+
+    def test_long_poll_returns_when_job_finishes(self):
+        job_id = self.client.post("/jobs", json={"task": "sleep", "payload": {"seconds": 0.3}}).get_json()["job_id"]
+
+        start = time.time()
+        response = self.client.get(f"/jobs/{job_id}?wait=5")
+        elapsed = time.time() - start
+
+        self.assertEqual(response.get_json()["status"], "success")
+        self.assertLess(elapsed, 2)
+
+    def test_long_poll_times_out_with_current_status(self):
+        job_id = self.job_store.create_job("sum", {"numbers": [1]})
+
+        start = time.time()
+        response = self.client.get(f"/jobs/{job_id}?wait=0.2")
+
+        self.assertGreaterEqual(time.time() - start, 0.2)
+        self.assertEqual(response.get_json()["status"], "pending")
+
+    def test_long_poll_rejects_wait_that_is_not_a_finite_duration(self):
+        job_id = self.job_store.create_job("sum", {"numbers": [1]})
+
+        for wait in ("nan", "inf", "-1", "soon"):
+            response = self.client.get(f"/jobs/{job_id}?wait={wait}")
+            self.assertEqual(response.status_code, 400, wait)
+        self.assertEqual(self.client.get(f"/jobs/{job_id}?wait=0").status_code, 200)
+
+    def test_event_stream_reports_each_job_in_batch(self):
+        jobs = [{"task": "sum", "payload": {"numbers": [i]}} for i in range(5)]
+        jobs.append({"task": "fail", "max_retries": 1})
+        batch = self.client.post("/jobs/batch", json={"jobs": jobs}).get_json()
+
+        response = self.client.get(f"/jobs/events?batch_id={batch['batch_id']}")
+        body = response.get_data(as_text=True)
+
+        self.assertEqual(response.mimetype, "text/event-stream")
+        events = [
+            json.loads(line[len("data: "):])
+            for line in body.splitlines()
+            if line.startswith("data: ") and line != "data: {}"
+        ]
+        self.assertEqual(sorted(event["job_id"] for event in events),
+                         sorted(item["job_id"] for item in batch["jobs"]))
+        self.assertEqual(sum(1 for event in events if event["status"] == "failed"), 1)
+        self.assertTrue(body.rstrip().endswith("event: done\ndata: {}"))
+
+    def test_metrics_endpoint_reports_task_and_queue_metrics(self):
+        job_id = self.client.post("/jobs", json={"task": "sum", "payload": {"numbers": [1]}}).get_json()["job_id"]
+        self.client.get(f"/jobs/{job_id}?wait=5")
+
+        response = self.client.get("/metrics")
+        body = response.get_data(as_text=True)
+
+        self.assertEqual(response.mimetype, "text/plain")
+        self.assertIn("# TYPE jobqueue_job_execution_seconds histogram", body)
+        self.assertIn('jobqueue_jobs_finished_total{task="sum",status="success"}', body)
+        self.assertIn('jobqueue_job_queue_wait_seconds_count{task="sum"}', body)
+        self.assertIn("jobqueue_queue_depth 0", body)
+
+class TestResultApi(unittest.TestCase):
+    def setUp(self):
+        self.job_store = JobStore(result_store=ResultStore(tempfile.mkdtemp(), threshold=1024))
+        init_api(self.job_store, JobQueue())
+        self.client = app.test_client()
+        self.statement = {"user_id": "user_1", "lines": [{"item": i, "price": 1.5} for i in range(200)]}
+        self.job_id = self.job_store.create_job("generate_monthly_bill", {})
+        self.job_store.update_job_status(self.job_id, "success", result=self.statement)
+
+    def test_status_omits_result_unless_requested(self):
+        job = self.client.get(f"/jobs/{self.job_id}").get_json()
+        self.assertEqual(job["status"], "success")
+        self.assertNotIn("result", job)
+
+        job = self.client.get(f"/jobs/{self.job_id}?include_result=true").get_json()
+        self.assertEqual(job["result"], self.statement)
+
+    def test_result_endpoint_streams_offloaded_result(self):
+        response = self.client.get(f"/jobs/{self.job_id}/result")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/json")
+        self.assertEqual(json.loads(response.get_data()), self.statement)
+
+        pending_id = self.job_store.create_job("sum", {})
+        self.assertEqual(self.client.get(f"/jobs/{pending_id}/result").status_code, 409)
+        self.assertEqual(self.client.get("/jobs/missing/result").status_code, 404)
+
+class TestAsyncApi(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.job_store = JobStore()
+        cls.job_queue = JobQueue()
+        init_api(cls.job_store, cls.job_queue)
+        cls.worker = Worker(cls.job_queue, cls.job_store, TASKS)
+        cls.worker.start()
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            cls.port = sock.getsockname()[1]
+        server = AsyncApiServer("127.0.0.1", cls.port)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", cls.port)).close()
+                break
+            except OSError:
+                time.sleep(0.05)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.worker.stop()
+        cls.job_queue.enqueue(cls.job_store.create_job("sum", {"numbers": [0]}))
+        cls.worker.join(timeout=2)
+
+    def request(self, connection, method, path, body=None):
+        connection.request(method, path, body=body, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    def test_submit_and_long_poll_over_one_connection(self):
+        connection = http.client.HTTPConnection("127.0.0.1", self.port)
+        status, body = self.request(connection, "POST", "/jobs",
+                                    json.dumps({"task": "sum", "payload": {"numbers": [2, 3]}}))
+        self.assertEqual((status, body["status"]), (201, "pending"))
+
+        status, job = self.request(connection, "GET", f"/jobs/{body['job_id']}?wait=5&include_result=1")
+        self.assertEqual(status, 200)
+        self.assertEqual(job["status"], "success")
+        self.assertEqual(job["result"], "Sum is 5")
+
+        self.assertEqual(self.request(connection, "GET", f"/jobs/{body['job_id']}/result"), (200, "Sum is 5"))
+        connection.close()
+
+    def test_errors_match_flask_contract(self):
+        connection = http.client.HTTPConnection("127.0.0.1", self.port)
+        self.assertEqual(self.request(connection, "POST", "/jobs", json.dumps({"payload": {}})),
+                         (400, {"error": "task is required"}))
+        self.assertEqual(self.request(connection, "GET", "/jobs/missing"), (404, {"error": "Job not found"}))
+        self.assertEqual(self.request(connection, "POST", "/jobs", "{not json")[0], 400)
+        connection.close()
+
+    def test_wait_and_job_ids_are_parsed_like_flask(self):
+        connection = http.client.HTTPConnection("127.0.0.1", self.port)
+        job_id = self.job_store.create_job("sum", {"numbers": [1]})
+        encoded = job_id.replace("-", "%2D")
+        self.assertEqual(self.request(connection, "GET", f"/jobs/{encoded}")[1]["job_id"], job_id)
+        self.assertEqual(self.request(connection, "GET", f"/jobs/{encoded}/result")[0], 409)
+        for wait in ("nan", "inf", "-1"):
+            self.assertEqual(self.request(connection, "GET", f"/jobs/{job_id}?wait={wait}")[0], 400, wait)
+        connection.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+import os
+import socket
+import subprocess
+import time
+import sys
+sys.path.insert(0, 'src')
+
+from job_store import JobStore
+from job_queue import JobQueue
+from broker import Broker, serve_broker, AUTHKEY_ENV
+
+AUTHKEY = b"test-broker-key"
+REMOTE_WORKER = os.path.join("src", "remote_worker.py")
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_until(condition, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+class TestBrokerLeases(unittest.TestCase):
+    def setUp(self):
+        self.job_store = JobStore()
+        self.job_queue = JobQueue()
+        self.broker = Broker(self.job_store, self.job_queue, lease_seconds=0.1)
+
+    def test_lease_prefetches_up_to_max_jobs(self):
+        job_ids = [self.job_store.create_job("sum", {"numbers": [i]}) for i in range(8)]
+        self.job_queue.enqueue_many((job_id, 0, None, None, "sum") for job_id in job_ids)
+
+        jobs = self.broker.lease("worker-a", max_jobs=5, wait=0)
+
+        self.assertEqual([job["job_id"] for job in jobs], job_ids[:5])
+        self.assertTrue(all(job["status"] == "running" for job in jobs))
+        self.assertEqual(self.job_queue.qsize(), 3)
+        self.assertEqual(self.broker.lease("worker-b", max_jobs=5, wait=0)[0]["job_id"], job_ids[5])
+
+    def test_expired_lease_is_redelivered_and_stale_result_dropped(self):
+        job_id = self.job_store.create_job("sum", {"numbers": [1]})
+        self.job_queue.enqueue(job_id)
+        self.broker.lease("worker-a", wait=0)
+
+        time.sleep(0.15)
+        self.assertEqual(self.broker.reap(), 1)
+        job = self.job_store.get_job(job_id)
+        self.assertEqual((job["status"], job["attempts"]), ("pending", 1))
+
+        self.assertEqual(self.broker.lease("worker-b", wait=0)[0]["job_id"], job_id)
+        self.assertFalse(self.broker.complete("worker-a", job_id, "Sum is 1"))
+        self.assertEqual(self.broker.renew("worker-b", [job_id]), [])
+        self.assertTrue(self.broker.complete("worker-b", job_id, "Sum is 1"))
+        self.assertEqual(self.job_store.get_job(job_id)["status"], "success")
+
+class TestRemoteWorkerProcesses(unittest.TestCase):
+    """Runs the broker in this process and several remote_worker.py processes against it."""
+
+    def setUp(self):
+        self.job_store = JobStore()
+        self.job_queue = JobQueue()
+        self.broker = Broker(self.job_store, self.job_queue, lease_seconds=1)
+        self.port = free_port()
+        serve_broker(self.broker, ("127.0.0.1", self.port), AUTHKEY)
+        self.broker.start_reaper(interval=0.1)
+        self.addCleanup(self.broker.stop)
+        self.processes = []
+        self.addCleanup(self.stop_workers)
+
+    def start_workers(self, count, prefetch=4):
+        env = dict(os.environ, **{AUTHKEY_ENV: AUTHKEY.decode()})
+        for _ in range(count):
+            self.processes.append(subprocess.Popen(
+                [sys.executable, REMOTE_WORKER, "--broker", f"127.0.0.1:{self.port}",
+                 "--threads", "2", "--prefetch", str(prefetch), "--heartbeat", "0.2"],
+                env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+
+    def stop_workers(self):
+        for process in self.processes:
+            process.kill()
+            process.wait()
+
+    def submit(self, task, payload):
+        job_id = self.job_store.create_job(task, payload)
+        self.job_queue.enqueue(job_id)
+        return job_id
+
+    def test_jobs_complete_across_worker_processes(self):
+        self.start_workers(3)
+        job_ids = [self.submit("sum", {"numbers": [i, 1]}) for i in range(60)]
+
+        self.assertTrue(wait_until(lambda: all(self.job_store.get_job(job_id)["status"] == "success"
+                                               for job_id in job_ids)))
+        self.assertEqual(self.job_store.get_job(job_ids[7])["result"], "Sum is 8")
+
+    def test_jobs_of_killed_worker_are_redelivered(self):
+        self.start_workers(1, prefetch=4)
+        job_ids = [self.submit("sleep", {"seconds": 0.3}) for _ in range(4)]
+        self.assertTrue(wait_until(lambda: all(self.job_store.get_job(job_id)["status"] == "running"
+                                               for job_id in job_ids)))
+
+        self.processes[0].kill()
+        self.start_workers(1)
+
+        self.assertTrue(wait_until(lambda: all(self.job_store.get_job(job_id)["status"] == "success"
+                                               for job_id in job_ids)))
+        self.assertTrue(all(self.job_store.get_job(job_id)["attempts"] == 1 for job_id in job_ids))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,34 @@
 import unittest
+import asyncio
+import io
+import datetime
+import json
+import logging
+import os
+import queue
+import tempfile
 import time
 import sys
 sys.path.insert(0, 'src')
 
 from job_store import JobStore
 from job_queue import JobQueue
-from tasks import TASKS
+from job_journal import WriteAheadLog
+from job_archive import JobArchive
+from timeouts import DeadlineWatchdog
+from metrics import Counter, Histogram, Registry
+from executors import EVENT_LOOP_OUTCOME_THREADS, EventLoopRunner, ProcessPool, TIMEOUT_THREAD_POOL_SIZE, run_with_timeout, shutdown_executors
+from result_store import ResultRef, ResultStore, resolve
+from result_cache import ResultCache
+from leases import Heartbeat, LeaseReaper, LeaseSet, store_renewer
+from capacity import CapacityError, CapacityLimits
+from task_limits import TaskLimit, task_limits
+from log_pipeline import JsonFormatter, LogWriter, QueueLogHandler, log_event, set_sampling
+from profiling import TASK_PROFILES, sample_stacks
+import threading
+from tasks import TASKS, generate_monthly_bill, generate_monthly_bills
 from worker import Worker
+from worker_pool import ScalingPolicy, WorkerPool
 
 class TestJobQueue(unittest.TestCase):
     def setUp(self):
@@ -34,6 +56,18 @@ class TestJobQueue(unittest.TestCase):
         self.assertEqual(job["result"], "Sum is 6")
         self.assertEqual(job["attempts"], 0)
 
+    def test_unknown_task_fails_without_stopping_the_worker(self):
+        job_id = self.job_store.create_job("nope", {}, max_retries=1)
+        self.job_queue.enqueue(job_id)
+        next_job_id = self.job_store.create_job("sum", {"numbers": [1, 2]})
+        self.job_queue.enqueue(next_job_id)
+
+        job = self.job_store.wait_for_job(job_id, 2)
+        self.assertEqual(job["status"], "failed")
+        self.assertEqual(job["error"], "Unknown task: nope")
+        self.assertEqual(self.job_store.wait_for_job(next_job_id, 2)["status"], "success")
+        self.assertTrue(self.worker.is_alive())
+
     def test_retry_logic(self):
         job_id = self.job_store.create_job("fail", {}, max_retries=3)
         self.job_queue.enqueue(job_id)
@@ -120,5 +154,1069 @@ class TestJobQueue(unittest.TestCase):
         job = self.job_store.get_job(job_id1)
         self.assertEqual(job["status"], "success")
 
+class TestJobQueueScheduling(unittest.TestCase):
+    def test_far_future_job_does_not_break_waiting_consumers(self):
+        job_queue = JobQueue()
+        got = []
+        consumer = threading.Thread(target=lambda: got.append(job_queue.dequeue()), daemon=True)
+        consumer.start()
+        time.sleep(0.05)
+        job_queue.enqueue("someday", run_at=time.time() + 1e12)
+        time.sleep(0.05)
+        job_queue.enqueue("now")
+        consumer.join(timeout=2)
+
+        self.assertEqual(got, ["now"])
+        self.assertIsNone(job_queue.dequeue(timeout=0.05))
+
+    def test_higher_priority_dequeued_first(self):
+        job_queue = JobQueue()
+        job_queue.enqueue("bulk-1")
+        job_queue.enqueue("bulk-2")
+        job_queue.enqueue("interactive", priority=5)
+
+        self.assertEqual([job_queue.dequeue() for _ in range(3)], ["interactive", "bulk-1", "bulk-2"])
+
+    def test_fair_share_across_tenants(self):
+        job_queue = JobQueue(tenant_weights={"interactive": 2})
+        job_queue.enqueue_many((f"bulk-{i}", 0, "billing-run", None, None) for i in range(100))
+        job_queue.enqueue_many((f"ui-{i}", 0, "interactive", None, None) for i in range(4))
+
+        first_six = [job_queue.dequeue() for _ in range(6)]
+
+        self.assertEqual(sum(1 for job_id in first_six if job_id.startswith("ui-")), 4)
+        self.assertEqual(job_queue.qsize(), 98)
+
+    def test_passes_of_tenants_that_went_idle_are_dropped(self):
+        job_queue = JobQueue()
+        job_queue.enqueue_many((f"job-{i}", 0, f"tenant-{i}", None, None) for i in range(1000))
+        for _ in range(1000):
+            job_queue.dequeue()
+        job_queue.enqueue("again", tenant="tenant-0")
+
+        self.assertEqual(job_queue.dequeue(), "again")
+        self.assertEqual(list(job_queue._tenant_pass), ["tenant-0"])
+
+    def test_aging_prevents_starvation(self):
+        job_queue = JobQueue(aging_seconds=0.05)
+        job_queue.enqueue("old-low-priority", priority=0)
+        time.sleep(0.2)
+        job_queue.enqueue("new-high-priority", priority=2)
+
+        self.assertEqual(job_queue.dequeue(), "old-low-priority")
+
+    def test_delayed_job_released_when_due(self):
+        job_queue = JobQueue()
+        job_queue.enqueue("scheduled", run_at=time.time() + 0.3)
+        job_queue.enqueue("now")
+
+        self.assertEqual(job_queue.dequeue(), "now")
+        self.assertEqual(job_queue.delayed_count(), 1)
+
+        start = time.time()
+        self.assertEqual(job_queue.dequeue(), "scheduled")
+        self.assertGreaterEqual(time.time() - start, 0.25)
+
+    def test_retry_backoff_delays_next_attempt(self):
+        job_store = JobStore()
+        job_queue = JobQueue()
+        worker = Worker(job_queue, job_store, TASKS, {"fail": {"retry_delay": 0.4}})
+        worker.start()
+        try:
+            job_id = job_store.create_job("fail", {}, max_retries=3)
+            job_queue.enqueue(job_id)
+
+            time.sleep(0.1)
+            job = job_store.get_job(job_id)
+            self.assertEqual(job["attempts"], 1)
+            self.assertEqual(job["status"], "pending")
+            self.assertEqual(job_queue.delayed_count(), 1)
+
+            time.sleep(1.5)
+            job = job_store.get_job(job_id)
+            self.assertEqual(job["attempts"], 3)
+            self.assertEqual(job["status"], "failed")
+        finally:
+            worker.stop()
+            job_queue.enqueue(job_store.create_job("sum", {"numbers": [0]}))
+            worker.join(timeout=2)
+
+class TestTaskLimits(unittest.TestCase):
+    def test_throttled_task_is_skipped_without_blocking_others(self):
+        job_queue = JobQueue(task_limits={"sleep": TaskLimit(max_in_flight=1)})
+        job_queue.enqueue("sleep-1", task_name="sleep")
+        job_queue.enqueue("sleep-2", priority=1, task_name="sleep")
+        job_queue.enqueue("sum-1", task_name="sum")
+
+        self.assertEqual(job_queue.dequeue_nowait(), "sleep-2")
+        self.assertEqual(job_queue.dequeue_nowait(), "sum-1")
+        self.assertIsNone(job_queue.dequeue_nowait())
+        self.assertEqual(job_queue.throttled_count(), 1)
+
+        job_queue.task_done("sum-1")
+        self.assertIsNone(job_queue.dequeue_nowait())
+        job_queue.task_done("sleep-2")
+        job_queue.task_done("sleep-2")
+        self.assertEqual(job_queue.dequeue(timeout=1), "sleep-1")
+        self.assertEqual(job_queue.throttled_count(), 0)
+
+    def test_rate_limit_spaces_jobs_after_burst(self):
+        job_queue = JobQueue(task_limits=task_limits({"charge": {"rate_limit": 20, "rate_burst": 2}}))
+        job_queue.enqueue_many((f"charge-{i}", 0, None, None, "charge") for i in range(4))
+
+        start = time.monotonic()
+        taken = [job_queue.dequeue(timeout=1) for _ in range(4)]
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(taken, ["charge-0", "charge-1", "charge-2", "charge-3"])
+        # Two from the burst, then one token every 50 ms.
+        self.assertGreaterEqual(elapsed, 0.09)
+        self.assertLess(elapsed, 0.5)
+
+    def test_workers_respect_max_in_flight_and_keep_other_tasks_moving(self):
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def slow_task(payload):
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.1)
+            with lock:
+                running.pop()
+            return "slow"
+
+        job_store = JobStore()
+        job_queue = JobQueue(task_limits={"slow": TaskLimit(max_in_flight=2)})
+        tasks = dict(TASKS, slow=slow_task)
+        workers = [Worker(job_queue, job_store, tasks) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        try:
+            slow_ids = [job_store.create_job("slow", {}) for _ in range(8)]
+            job_queue.enqueue_many((job_id, 0, None, None, "slow") for job_id in slow_ids)
+            sum_ids = [job_store.create_job("sum", {"numbers": [i]}) for i in range(20)]
+            job_queue.enqueue_many((job_id, 0, None, None, "sum") for job_id in sum_ids)
+
+            start = time.monotonic()
+            for job_id in sum_ids:
+                self.assertEqual(job_store.wait_for_job(job_id, 2)["status"], "success")
+            # The sums ran on the two workers the slow task may not take.
+            self.assertLess(time.monotonic() - start, 0.3)
+            for job_id in slow_ids:
+                self.assertEqual(job_store.wait_for_job(job_id, 2)["status"], "success")
+            self.assertEqual(max(peak), 2)
+        finally:
+            for worker in workers:
+                worker.stop()
+            for worker in workers:
+                worker.join(timeout=2)
+
+
+class TestAsyncTasks(unittest.TestCase):
+    def setUp(self):
+        self.job_store = JobStore()
+        self.job_queue = JobQueue()
+        self.worker = Worker(self.job_queue, self.job_store, TASKS)
+        self.worker.start()
+
+    def tearDown(self):
+        self.worker.stop()
+        self.worker.join(timeout=2)
+
+    def test_one_worker_runs_thousands_of_sleeps_concurrently(self):
+        job_ids = [job_id for job_id, _, _ in self.job_store.create_jobs(
+            [{"task_name": "async_sleep", "payload": {"seconds": 0.5}} for _ in range(2000)])]
+        start = time.monotonic()
+        self.job_queue.enqueue_many((job_id, 0, None, None, "async_sleep") for job_id in job_ids)
+
+        jobs = [self.job_store.wait_for_job(job_id, 10) for job_id in job_ids]
+        self.assertTrue(all(job["status"] == "success" for job in jobs))
+        self.assertEqual(jobs[0]["result"], "Slept for 0.5 seconds.")
+        # Run one after another this would take 1000 seconds.
+        self.assertLess(time.monotonic() - start, 3)
+
+    def test_timeout_cancels_coroutine_and_failures_retry(self):
+        cancelled = []
+
+        async def stuck_task(payload):
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(payload["n"])
+                raise
+
+        async def failing_task(payload):
+            raise ValueError("downstream unavailable")
+
+        self.worker.tasks = dict(TASKS, stuck=stuck_task, failing=failing_task)
+        self.worker.task_options = {"failing": {"retry_delay": 0.01}}
+        threads = threading.active_count()
+        stuck = [self.job_store.create_job("stuck", {"n": i}, max_retries=1, timeout=0.1) for i in range(50)]
+        failing = self.job_store.create_job("failing", {}, max_retries=3)
+        self.job_queue.enqueue_many((job_id, 0, None, None, "stuck") for job_id in stuck)
+        self.job_queue.enqueue(failing)
+
+        for job_id in stuck:
+            job = self.job_store.wait_for_job(job_id, 2)
+            self.assertEqual((job["status"], job["error"]), ("failed", "Job exceeded timeout of 0.1 seconds"))
+        self.assertEqual(sorted(cancelled), list(range(50)))
+        self.assertLessEqual(threading.active_count(), threads + 1 + EVENT_LOOP_OUTCOME_THREADS)
+
+        job = self.job_store.wait_for_job(failing, 2)
+        self.assertEqual((job["status"], job["attempts"], job["error"]), ("failed", 3, "downstream unavailable"))
+
+
+    def test_outcomes_are_recorded_off_the_loop_even_when_cancelled(self):
+        runner = EventLoopRunner()
+        outcomes = []
+
+        def record(outcome):
+            outcomes.append((outcome, threading.current_thread() is runner.thread))
+
+        async def quick(payload):
+            return payload
+
+        runner.submit(quick, "done", None, record)
+        runner.submit(asyncio.sleep, 5, None, record)
+        time.sleep(0.1)
+        runner.shutdown(wait=False)
+
+        self.assertEqual(outcomes[0], ("done", False))
+        stopped, on_loop = outcomes[1]
+        self.assertEqual((str(stopped), on_loop), ("Job was stopped by CancelledError", False))
+
+
+class TestLogPipeline(unittest.TestCase):
+    def setUp(self):
+        self.stream = io.StringIO()
+        records = queue.SimpleQueue()
+        self.handler = QueueLogHandler(records)
+        self.writer = LogWriter(records, self.stream, JsonFormatter())
+        self.writer.start()
+        self.logger = logging.getLogger(f"test.log_pipeline.{self.id()}")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.logger.addHandler(self.handler)
+        self.addCleanup(set_sampling, None)
+
+    def lines(self):
+        self.writer.stop()
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_retry_storm_is_rate_limited_with_suppressed_count(self):
+        set_sampling({"job.retry": {"per_second": 50, "burst": 5}, "job.started": {"sample": 0.0}})
+        for i in range(1000):
+            log_event(self.logger, logging.WARNING, "job.retry", "Job %s will be retried", f"job-{i}", job_id=f"job-{i}")
+            log_event(self.logger, logging.INFO, "job.started", "Job %s started", f"job-{i}")
+        self.logger.info("Server ready")
+        time.sleep(0.05)
+        log_event(self.logger, logging.WARNING, "job.retry", "Job %s will be retried", "job-last", job_id="job-last")
+
+        lines = self.lines()
+        retries = [line for line in lines if line.get("event") == "job.retry"]
+        self.assertLess(len(retries), 100)
+        self.assertEqual(retries[0]["message"], "Job job-0 will be retried")
+        self.assertEqual(retries[-1]["job_id"], "job-last")
+        # Every record left out is accounted for on a later one.
+        self.assertEqual(len(retries) + sum(line.get("suppressed", 0) for line in retries), 1001)
+        self.assertFalse(any(line.get("event") == "job.started" for line in lines))
+        self.assertEqual(lines[-2]["message"], "Server ready")
+
+    def test_arguments_are_formatted_on_the_writer_thread(self):
+        formatted_on = []
+
+        class Result:
+            def __str__(self):
+                formatted_on.append(threading.current_thread().name)
+                return "bill"
+
+        log_event(self.logger, logging.INFO, "job.succeeded", "Job %s completed successfully - result: %s", "job-1",
+                  Result(), job_id="job-1", task="generate_monthly_bill")
+        [line] = self.lines()
+
+        self.assertEqual(formatted_on, ["log-writer"])
+        self.assertEqual(line["message"], "Job job-1 completed successfully - result: bill")
+        self.assertEqual((line["level"], line["task"]), ("INFO", "generate_monthly_bill"))
+        self.assertEqual(self.writer.batches, 1)
+
+
+class TestProcessExecution(unittest.TestCase):
+    def setUp(self):
+        self.job_store = JobStore()
+        self.job_queue = JobQueue()
+        task_options = {
+            "generate_monthly_bill": {"executor": "process"},
+            "sleep": {"executor": "process"},
+            "fail": {"executor": "process"}
+        }
+        self.worker = Worker(self.job_queue, self.job_store, TASKS, task_options)
+        self.worker.start()
+
+    def tearDown(self):
+        self.worker.stop()
+        dummy_job_id = self.job_store.create_job("sum", {"numbers": [0]})
+        self.job_queue.enqueue(dummy_job_id)
+        self.worker.join(timeout=2)
+
+    def test_billing_runs_in_process_pool(self):
+        payload = {
+            "user_id": "user_123",
+            "billing_period": "2026-01",
+            "subscription_plan": "prime",
+            "base_price": 14.99,
+            "purchases": [{"item_id": "movie_001", "price": 3.99}]
+        }
+        job_id = self.job_store.create_job("generate_monthly_bill", payload)
+        self.job_queue.enqueue(job_id)
+
+        time.sleep(1.5)
+
+        job = self.job_store.get_job(job_id)
+        self.assertEqual(job["status"], "success")
+        self.assertEqual(job["result"]["total_charge"], 18.98)
+
+    def test_process_task_retries_and_fails(self):
+        job_id = self.job_store.create_job("fail", {}, max_retries=2)
+        self.job_queue.enqueue(job_id)
+
+        time.sleep(1.5)
+
+        job = self.job_store.get_job(job_id)
+        self.assertEqual(job["status"], "failed")
+        self.assertEqual(job["attempts"], 2)
+        self.assertEqual(job["error"], "This task always fails!")
+
+    def test_process_task_timeout(self):
+        job_id = self.job_store.create_job("sleep", {"seconds": 1}, max_retries=1, timeout=0.2)
+        self.job_queue.enqueue(job_id)
+
+        time.sleep(1.5)
+
+        job = self.job_store.get_job(job_id)
+        self.assertEqual(job["status"], "failed")
+        self.assertIn("timeout", job["error"])
+
+class TestBatchExecution(unittest.TestCase):
+    def bill_payload(self, i, purchases):
+        return {
+            "user_id": f"user_{i}",
+            "billing_period": "2026-01",
+            "subscription_plan": "prime",
+            "base_price": 14.99,
+            "purchases": purchases
+        }
+
+    def test_batch_billing_matches_single_billing(self):
+        payloads = [
+            self.bill_payload(0, [{"price": 3.99}, {"price": 0.1}, {"price": 0.2}]),
+            self.bill_payload(1, []),
+            self.bill_payload(2, [{"price": -1}]),
+            self.bill_payload(3, [{"item_id": "no_price"}]),
+            {"user_id": "user_4"},
+            self.bill_payload(5, [{"price": "free"}, {"price": 2}]),
+            self.bill_payload(6, [{"price": 7}])
+        ]
+
+        outcomes = generate_monthly_bills(payloads)
+
+        for payload, outcome in zip(payloads, outcomes):
+            try:
+                expected = generate_monthly_bill(payload)
+            except ValueError as e:
+                self.assertIsInstance(outcome, ValueError)
+                self.assertEqual(str(outcome), str(e))
+            else:
+                self.assertEqual(outcome, expected)
+
+    def test_worker_coalesces_queued_jobs_of_a_batch_task(self):
+        job_store = JobStore()
+        job_queue = JobQueue()
+        batch_sizes = []
+
+        def record_batch(payloads):
+            batch_sizes.append(len(payloads))
+            return generate_monthly_bills(payloads)
+
+        task_options = {"generate_monthly_bill": {"batch": record_batch, "batch_size": 4}}
+        job_ids = [job_store.create_job("generate_monthly_bill", self.bill_payload(i, [{"price": i}]), max_retries=1)
+                   for i in range(9)]
+        bad_id = job_store.create_job("generate_monthly_bill", self.bill_payload(9, [{"price": -1}]), max_retries=1)
+        job_queue.enqueue_many((job_id, 0, None, None, "generate_monthly_bill") for job_id in job_ids + [bad_id])
+
+        worker = Worker(job_queue, job_store, TASKS, task_options)
+        worker.start()
+        try:
+            time.sleep(0.5)
+            self.assertEqual(batch_sizes, [4, 4, 2])
+            for i, job_id in enumerate(job_ids):
+                self.assertEqual(job_store.get_job(job_id)["result"]["purchases_total"], i)
+            bad_job = job_store.get_job(bad_id)
+            self.assertEqual(bad_job["status"], "failed")
+            self.assertEqual(bad_job["error"], "Purchase price must be a non-negative number")
+        finally:
+            worker.stop()
+            job_queue.enqueue(job_store.create_job("sum", {"numbers": [0]}))
+            worker.join(timeout=2)
+
+class TestTimeouts(unittest.TestCase):
+    def test_watchdog_fires_only_uncancelled_deadlines(self):
+        watchdog = DeadlineWatchdog()
+        fired = []
+        watchdog.watch(0.05, lambda: fired.append("first"))
+        cancelled = watchdog.watch(0.05, lambda: fired.append("cancelled"))
+        watchdog.watch(0.1, lambda: fired.append("second"))
+
+        self.assertTrue(watchdog.cancel(cancelled))
+        time.sleep(0.3)
+
+        self.assertEqual(fired, ["first", "second"])
+
+    def test_process_task_is_killed_on_timeout(self):
+        pool = ProcessPool(size=1)
+        try:
+            start = time.time()
+            with self.assertRaises(TimeoutError):
+                pool.run(TASKS["sleep"], {"seconds": 5}, timeout=0.2)
+            self.assertLess(time.time() - start, 2)
+
+            self.assertEqual(pool.run(TASKS["sum"], {"numbers": [1, 2]}, timeout=5), "Sum is 3")
+        finally:
+            pool.shutdown()
+
+    def test_thread_count_bounded_under_sustained_timeouts(self):
+        job_store = JobStore()
+        job_queue = JobQueue()
+        workers = [Worker(job_queue, job_store, TASKS) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        baseline = threading.active_count()
+        try:
+            job_ids = [job_store.create_job("sleep", {"seconds": 0.5}, max_retries=1, timeout=0.02)
+                       for _ in range(60)]
+            for job_id in job_ids:
+                job_queue.enqueue(job_id)
+
+            peak = baseline
+            deadline = time.time() + 10
+            while time.time() < deadline:
+                peak = max(peak, threading.active_count())
+                if all(job_store.get_job(job_id)["status"] == "failed" for job_id in job_ids):
+                    break
+                time.sleep(0.01)
+
+            self.assertTrue(all(job_store.get_job(job_id)["status"] == "failed" for job_id in job_ids))
+            self.assertLessEqual(peak, baseline + TIMEOUT_THREAD_POOL_SIZE)
+        finally:
+            for worker in workers:
+                worker.stop()
+            for _ in workers:
+                job_queue.enqueue(job_store.create_job("sum", {"numbers": [0]}))
+            for worker in workers:
+                worker.join(timeout=2)
+
+    def test_time_spent_queued_for_a_thread_does_not_count_against_timeout(self):
+        # Start from an empty pool; earlier tests leave timed-out tasks running.
+        shutdown_executors()
+        outcomes = []
+
+        def call():
+            try:
+                outcomes.append(run_with_timeout(time.sleep, 0.2, 0.35))
+            except TimeoutError as e:
+                outcomes.append(e)
+
+        callers = [threading.Thread(target=call) for _ in range(TIMEOUT_THREAD_POOL_SIZE + 4)]
+        for caller in callers:
+            caller.start()
+        for caller in callers:
+            caller.join(timeout=5)
+
+        self.assertEqual(outcomes, [None] * len(callers))
+
+class TestShardedJobStore(unittest.TestCase):
+    def test_concurrent_duplicate_client_ids_create_one_job(self):
+        job_store = JobStore(num_shards=4)
+        results = []
+        barrier = threading.Barrier(16)
+
+        def submit():
+            barrier.wait()
+            specs = [{"task_name": "sum", "payload": {}, "client_job_id": f"client-{i}"} for i in range(50)]
+            results.append(job_store.create_jobs(specs))
+
+        threads = [threading.Thread(target=submit) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for i in range(50):
+            job_ids = {result[i][0] for result in results}
+            self.assertEqual(len(job_ids), 1)
+            self.assertEqual(sum(1 for result in results if result[i][2]), 1)
+            self.assertIsNotNone(job_store.get_job(job_ids.pop()))
+        stored = sum(len(shard.jobs) for shard in job_store._shards)
+        self.assertEqual(stored, 50)
+
+    def test_fail_attempt_retries_then_fails(self):
+        job_store = JobStore()
+        job_id = job_store.create_job("fail", {}, max_retries=2)
+
+        job = job_store.fail_attempt(job_id, "boom")
+        self.assertEqual((job["status"], job["attempts"]), ("pending", 1))
+
+        job = job_store.fail_attempt(job_id, "boom")
+        self.assertEqual((job["status"], job["attempts"], job["error"]), ("failed", 2, "boom"))
+        self.assertEqual(job_store.wait_for_job(job_id, 0)["status"], "failed")
+
+
+class TestJobRetention(unittest.TestCase):
+    def test_max_retained_evicts_least_recently_used_to_archive(self):
+        tmp_dir = tempfile.mkdtemp()
+        archive = JobArchive(os.path.join(tmp_dir, "archive.db"))
+        self.addCleanup(archive.close)
+        job_store = JobStore(num_shards=1, archive=archive, max_retained_jobs=2)
+
+        job_ids = [job_store.create_job("sum", {"numbers": [i]}) for i in range(3)]
+        job_store.update_job_status(job_ids[0], "success", result="first")
+        job_store.update_job_status(job_ids[1], "success")
+        job_store.get_job(job_ids[0])
+        job_store.update_job_status(job_ids[2], "failed", error="boom")
+
+        self.assertNotIn(job_ids[1], job_store._shards[0].jobs)
+        self.assertIn(job_ids[0], job_store._shards[0].jobs)
+        archived = job_store.get_job(job_ids[1])
+        self.assertEqual(archived["status"], "success")
+        self.assertEqual(archived["task_name"], "sum")
+
+    def test_archive_write_runs_outside_the_shard_lock(self):
+        tmp_dir = tempfile.mkdtemp()
+        archive = JobArchive(os.path.join(tmp_dir, "archive.db"))
+        self.addCleanup(archive.close)
+        writing = threading.Event()
+        release = threading.Event()
+        put_many = archive.put_many
+
+        def slow_put_many(jobs):
+            writing.set()
+            release.wait(5)
+            put_many(jobs)
+
+        archive.put_many = slow_put_many
+        job_store = JobStore(num_shards=1, archive=archive, max_retained_jobs=1)
+        first, second = job_store.create_job("sum", {}), job_store.create_job("sum", {})
+        job_store.update_job_status(first, "success", result="first")
+        finisher = threading.Thread(target=job_store.update_job_status, args=(second, "success"))
+        finisher.start()
+        self.assertTrue(writing.wait(5))
+
+        # The shard stays usable, and the evicted job readable, during the write.
+        self.assertEqual(job_store.get_job(first)["result"], "first")
+        self.assertEqual(job_store.get_job(job_store.create_job("sum", {}))["status"], "pending")
+        release.set()
+        finisher.join(timeout=5)
+
+        self.assertEqual(job_store._shards[0].archiving, {})
+        self.assertEqual(archive.get(first)["result"], "first")
+
+    def test_ttl_drops_finished_jobs_without_archive(self):
+        job_store = JobStore(num_shards=4, retention_seconds=0.05)
+        old_id = job_store.create_job("sum", {})
+        pending_id = job_store.create_job("sum", {})
+        job_store.update_job_status(old_id, "success")
+        time.sleep(0.1)
+
+        # One completion per shard sweeps every shard once.
+        for _ in range(4):
+            new_id = job_store.create_job("sum", {})
+            job_store.update_job_status(new_id, "success")
+
+        self.assertIsNone(job_store.get_job(old_id))
+        self.assertEqual(job_store.get_job(new_id)["status"], "success")
+        self.assertEqual(job_store.get_job(pending_id)["status"], "pending")
+
+
+class TestResultStorage(unittest.TestCase):
+    def test_large_results_are_offloaded_and_deduplicated(self):
+        tmp_dir = tempfile.mkdtemp()
+        job_store = JobStore(result_store=ResultStore(tmp_dir, threshold=1024))
+        statement = {"user_id": "user_1", "lines": ["item"] * 500}
+
+        job_ids = [job_store.create_job("sum", {}) for _ in range(3)]
+        job_store.update_job_status(job_ids[0], "success", result=statement)
+        job_store.update_job_status(job_ids[1], "success", result=dict(statement))
+        job_store.update_job_status(job_ids[2], "success", result="small")
+
+        first, second = (job_store.get_job(job_id)["result"] for job_id in job_ids[:2])
+        self.assertIsInstance(first, ResultRef)
+        self.assertEqual(first.path, second.path)
+        self.assertEqual(sum(len(files) for _, _, files in os.walk(tmp_dir)), 1)
+        self.assertEqual(resolve(first), statement)
+        self.assertEqual(job_store.get_job(job_ids[2])["result"], "small")
+
+    def test_result_that_is_not_json_fails_the_attempt(self):
+        job_store = JobStore(result_store=ResultStore(tempfile.mkdtemp()))
+        job_queue = JobQueue()
+        worker = Worker(job_queue, job_store, {"today": lambda payload: datetime.date(2026, 1, 1)},
+                        {"today": {"memoize": True}}, result_cache=ResultCache(max_entries=10))
+        job_ids = [job_store.create_job("today", {"n": n}, max_retries=1) for n in range(2)]
+
+        worker._process(job_store.start_job(job_ids[0]))
+        worker.task_options = {}
+        worker._process(job_store.start_job(job_ids[1]))
+
+        for job_id in job_ids:
+            job = job_store.get_job(job_id)
+            self.assertEqual(job["status"], "failed")
+            self.assertIn("not JSON serializable", job["error"])
+
+    def test_memoized_task_reuses_cached_result(self):
+        calls = []
+
+        def count_task(payload):
+            calls.append(payload)
+            return {"total": sum(payload["numbers"])}
+
+        job_store = JobStore()
+        job_queue = JobQueue()
+        worker = Worker(job_queue, job_store, {"count": count_task}, {"count": {"memoize": True}},
+                        result_cache=ResultCache(max_entries=10))
+
+        job_ids = [job_store.create_job("count", {"numbers": numbers}) for numbers in ([1, 2], [1, 2], [3])]
+        for job_id in job_ids:
+            worker._process(job_store.start_job(job_id))
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual([job_store.get_job(job_id)["result"] for job_id in job_ids],
+                         [{"total": 3}, {"total": 3}, {"total": 3}])
+
+    def test_result_cache_evicts_least_recently_used_and_expired(self):
+        cache = ResultCache(max_entries=2, ttl_seconds=0.05)
+        keys = [ResultCache.key("sum", {"numbers": [i]}) for i in range(3)]
+        cache.put(keys[0], "a")
+        cache.put(keys[1], "b")
+        cache.get(keys[0])
+        cache.put(keys[2], "c")
+
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertEqual(cache.get(keys[0]), "a")
+        time.sleep(0.1)
+        self.assertIsNone(cache.get(keys[2]))
+
+
+class TestWorkerLeases(unittest.TestCase):
+    def setUp(self):
+        self.job_store = JobStore()
+        self.job_queue = JobQueue()
+        self.leases = LeaseSet()
+        heartbeat = Heartbeat(store_renewer(self.job_store, 0.2), self.leases, interval=0.05)
+        reaper = LeaseReaper(self.job_store, self.job_queue, interval=0.05)
+        heartbeat.start()
+        reaper.start()
+        self.addCleanup(heartbeat.stop)
+        self.addCleanup(reaper.stop)
+        self.workers = []
+
+    def tearDown(self):
+        for worker in self.workers:
+            worker.stop()
+            self.job_queue.enqueue(self.job_store.create_job("sum", {"numbers": [0]}))
+        for worker in self.workers:
+            worker.join(timeout=2)
+
+    def start_workers(self, count, tasks, worker_class=Worker):
+        for _ in range(count):
+            worker = worker_class(self.job_queue, self.job_store, tasks, leases=self.leases, lease_seconds=0.2)
+            worker.start()
+            self.workers.append(worker)
+
+    def test_job_of_dead_worker_is_reaped_and_rerun(self):
+        class VanishingWorker(Worker):
+            # Takes one job and exits without finishing it, as a crashed thread would.
+            def _process(self, job):
+                self.running = False
+
+        self.start_workers(1, TASKS, VanishingWorker)
+        job_id = self.job_store.create_job("sum", {"numbers": [2, 2]})
+        self.job_queue.enqueue(job_id)
+        self.workers[0].join(timeout=2)
+        self.assertEqual(self.job_store.get_job(job_id)["status"], "running")
+
+        self.start_workers(1, TASKS)
+        job = self.job_store.wait_for_job(job_id, 5)
+        self.assertEqual((job["status"], job["attempts"], job["result"]), ("success", 1, "Sum is 4"))
+
+    def test_heartbeat_keeps_long_running_job_leased(self):
+        self.start_workers(1, TASKS)
+        job_id = self.job_store.create_job("sleep", {"seconds": 0.6})
+        self.job_queue.enqueue(job_id)
+
+        job = self.job_store.wait_for_job(job_id, 5)
+        self.assertEqual((job["status"], job["attempts"]), ("success", 0))
+        self.assertEqual(len(self.leases), 0)
+
+
+class TestJobListing(unittest.TestCase):
+    def test_listing_follows_transitions_and_pages_with_cursor(self):
+        job_store = JobStore()
+        bills = [job_store.create_job("generate_monthly_bill", {"user_id": i}) for i in range(10)]
+        sums = [job_store.create_job("sum", {"numbers": [i]}) for i in range(5)]
+        for job_id in bills[:4]:
+            job_store.start_job(job_id)
+        for job_id in bills[1:3]:
+            job_store.update_job_status(job_id, "failed", error="bad payload")
+
+        pages, cursor = [], 0
+        while cursor is not None:
+            jobs, cursor = job_store.list_jobs(status="pending", task_name="generate_monthly_bill", cursor=cursor, limit=4)
+            pages.append([job["job_id"] for job in jobs])
+        self.assertEqual(pages, [bills[4:8], bills[8:]])
+
+        failed, _ = job_store.list_jobs(status="failed")
+        self.assertEqual([job["job_id"] for job in failed], bills[1:3])
+        everything, _ = job_store.list_jobs(limit=1000)
+        self.assertEqual([job["job_id"] for job in everything], bills + sums)
+        self.assertEqual(job_store.count_jobs("generate_monthly_bill"),
+                         {"blocked": 0, "pending": 6, "running": 2, "success": 0, "failed": 2})
+        self.assertEqual(job_store.count_jobs()["pending"], 11)
+
+    def test_created_after_and_evicted_jobs(self):
+        job_store = JobStore(num_shards=1, max_retained_jobs=1)
+        early = [job_store.create_job("sum", {"numbers": [i]}) for i in range(3)]
+        time.sleep(0.01)
+        cutoff = time.time()
+        late = [job_store.create_job("sum", {"numbers": [i]}) for i in range(3)]
+
+        jobs, _ = job_store.list_jobs(created_after=cutoff)
+        self.assertEqual([job["job_id"] for job in jobs], late)
+
+        for job_id in early:
+            job_store.update_job_status(job_id, "success", result="done")
+        jobs, _ = job_store.list_jobs(status="success")
+        self.assertEqual([job["job_id"] for job in jobs], early[2:])
+        self.assertEqual(job_store.count_jobs()["success"], 1)
+
+
+class TestJobDependencies(unittest.TestCase):
+    def setUp(self):
+        self.job_store = JobStore()
+        self.released = []
+        self.job_store.set_ready_callback(self.released.extend)
+
+    def test_fan_in_releases_child_once_when_last_parent_succeeds(self):
+        parents = [self.job_store.create_job("sum", {"numbers": [i]}) for i in range(1000)]
+        self.job_store.update_job_status(parents[0], "success", result="done")
+        child = self.job_store.create_job("generate_monthly_bill", {"user_id": "user_1"}, depends_on=parents, priority=5)
+        self.assertEqual(self.job_store.get_job(child)["status"], "blocked")
+
+        for parent in parents[1:]:
+            self.job_store.update_job_status(parent, "success", result="done")
+
+        self.assertEqual(self.released, [(child, 5, None, None, "generate_monthly_bill")])
+        self.assertEqual(self.job_store.get_job(child)["status"], "pending")
+        self.assertEqual(self.job_store.count_jobs("generate_monthly_bill")["pending"], 1)
+
+    def test_parent_failure_cascades_unless_child_runs_anyway(self):
+        parent = self.job_store.create_job("sum", {"numbers": [1]}, max_retries=1)
+        child = self.job_store.create_job("sum", {"numbers": [2]}, depends_on=[parent])
+        grandchild = self.job_store.create_job("sum", {"numbers": [3]}, depends_on=[child])
+        cleanup = self.job_store.create_job("sum", {"numbers": [4]}, depends_on=[child], on_parent_failure="run")
+
+        self.job_store.fail_attempt(parent, "boom")
+
+        self.assertEqual(self.job_store.get_job(child)["error"], f"Dependency {parent} failed")
+        self.assertEqual(self.job_store.get_job(grandchild)["error"], f"Dependency {child} failed")
+        self.assertEqual(self.job_store.get_job(grandchild)["status"], "failed")
+        self.assertEqual(self.released, [(cleanup, 0, None, None, "sum")])
+        with self.assertRaises(ValueError):
+            self.job_store.create_job("sum", {"numbers": [5]}, depends_on=["no-such-job"])
+
+
+class TestCapacityLimits(unittest.TestCase):
+    def test_limits_per_task_and_shedding_of_low_priority_jobs(self):
+        capacity = CapacityLimits(max_jobs=10, max_jobs_per_task={"generate_monthly_bill": 2}, shed_below_priority=0)
+        job_store = JobStore(capacity=capacity)
+        bills = [job_store.create_job("generate_monthly_bill", {"user_id": f"user_{i}"}) for i in range(2)]
+        with self.assertRaises(CapacityError):
+            job_store.create_job("generate_monthly_bill", {"user_id": "user_2"})
+
+        job_store.create_jobs([{"task_name": "sum", "payload": {"numbers": [i]}} for i in range(6)])
+        with self.assertRaises(CapacityError) as shed:
+            job_store.create_job("sum", {"numbers": [9]}, priority=-1)
+        self.assertGreaterEqual(shed.exception.retry_after, 1)
+        job_store.create_jobs([{"task_name": "sum", "payload": {"numbers": [i]}} for i in range(2)])
+        with self.assertRaises(CapacityError):
+            job_store.create_job("sum", {"numbers": [10]}, priority=5)
+
+        job_store.update_job_status(bills[0], "success", result="ok")
+        job_store.update_job_status(bills[0], "success", result="ok")
+        self.assertEqual(capacity.unfinished(), 9)
+        job_store.create_job("generate_monthly_bill", {"user_id": "user_2"}, client_job_id="bill-2")
+        job_store.create_job("generate_monthly_bill", {"user_id": "user_2"}, client_job_id="bill-2")
+        self.assertEqual(capacity.unfinished("generate_monthly_bill"), 2)
+
+
+class TestWorkerPool(unittest.TestCase):
+    def test_stop_wakes_worker_blocked_in_dequeue(self):
+        worker = Worker(JobQueue(), JobStore(), TASKS)
+        worker.start()
+        time.sleep(0.05)
+
+        worker.stop()
+        worker.join(timeout=1)
+        self.assertFalse(worker.is_alive())
+
+    def test_policy_needs_consecutive_samples_and_cools_down(self):
+        policy = ScalingPolicy(1, 8, queue_per_worker=4, up_samples=2, down_samples=3, cooldown_samples=1)
+
+        self.assertEqual(policy.decide(2, 20, None, 1.0), 2)
+        self.assertEqual(policy.decide(2, 0, 0.01, 0.9), 2)
+        self.assertEqual(policy.decide(2, 20, None, 1.0), 2)
+        self.assertEqual(policy.decide(2, 20, None, 1.0), 5)
+        self.assertEqual(policy.decide(5, 40, None, 1.0), 5)
+        self.assertEqual([policy.decide(5, 0, None, 0.1) for _ in range(3)], [5, 5, 1])
+
+    def test_pool_grows_with_backlog_and_retires_idle_workers(self):
+        job_store = JobStore()
+        job_queue = JobQueue()
+        policy = ScalingPolicy(1, 4, queue_per_worker=2, up_samples=1, down_samples=2, cooldown_samples=0)
+        pool = WorkerPool(lambda: Worker(job_queue, job_store, TASKS), job_queue, 1, 4, policy, interval=0.05)
+        pool.start()
+        self.addCleanup(pool.stop)
+
+        job_ids = [job_store.create_job("sleep", {"seconds": 0.05}) for _ in range(40)]
+        job_queue.enqueue_many((job_id, 0, None, None, "sleep") for job_id in job_ids)
+        time.sleep(0.3)
+        self.assertEqual(pool.size(), 4)
+        grown = list(pool.workers)
+
+        for job_id in job_ids:
+            self.assertEqual(job_store.wait_for_job(job_id, 5)["status"], "success")
+        deadline = time.time() + 5
+        while pool.size() > 1 and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(pool.size(), 1)
+        time.sleep(0.1)
+        self.assertEqual(sum(worker.is_alive() for worker in grown), 1)
+
+
+class TestMetrics(unittest.TestCase):
+    def test_counter_sums_updates_from_every_thread(self):
+        registry = Registry()
+        counter = Counter("test_total", "Test counter", ["task"], registry=registry)
+
+        def bump():
+            for _ in range(1000):
+                counter.inc(labels=("sum",))
+
+        threads = [threading.Thread(target=bump) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(counter.value(("sum",)), 8000)
+        self.assertIn('test_total{task="sum"} 8000', registry.render())
+
+    def test_histogram_renders_cumulative_buckets(self):
+        registry = Registry()
+        histogram = Histogram("test_seconds", "Test histogram", buckets=(0.1, 1.0), registry=registry)
+        for value in (0.05, 0.5, 0.5, 5.0):
+            histogram.observe(value)
+
+        lines = registry.render().splitlines()
+        self.assertIn('test_seconds_bucket{le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{le="1.0"} 3', lines)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 4', lines)
+        self.assertIn("test_seconds_count 4", lines)
+        self.assertIn("test_seconds_sum 6.05", lines)
+
+
+def spin_task(payload):
+    deadline = time.monotonic() + payload["seconds"]
+    while time.monotonic() < deadline:
+        pass
+    return "done"
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        TASK_PROFILES.reset()
+        self.addCleanup(TASK_PROFILES.reset)
+        self.job_store = JobStore()
+
+    def run_jobs(self, worker, task_name, payloads):
+        job_ids = [self.job_store.create_job(task_name, payload) for payload in payloads]
+        for job_id in job_ids:
+            worker._process(self.job_store.start_job(job_id))
+        return [self.job_store.get_job(job_id) for job_id in job_ids]
+
+    def test_sampled_stacks_show_where_a_worker_spends_time(self):
+        job_queue = JobQueue()
+        worker = Worker(job_queue, self.job_store, dict(TASKS, spin=spin_task))
+        worker.start()
+        job_queue.enqueue(self.job_store.create_job("spin", {"seconds": 0.5}))
+        time.sleep(0.05)
+
+        busy = []
+        other = threading.Thread(target=lambda: time.sleep(0.05) or busy.append(sample_stacks(0.05)))
+        other.start()
+        stacks = sample_stacks(0.3)
+        other.join()
+        worker.stop()
+        worker.join(timeout=2)
+
+        self.assertEqual(busy, [None])
+        spinning = sum(count for stack, count in stacks.items()
+                       if stack.startswith("Worker;") and stack.split(";")[-1].startswith("spin_task (test_queue.py"))
+        self.assertGreater(spinning, 10)
+        self.assertIn("_process (worker.py", next(stack for stack in stacks if "spin_task" in stack))
+
+    def test_every_nth_execution_is_profiled_in_thread_and_process(self):
+        task_options = {"sum": {"profile_every": 2},
+                        "generate_monthly_bill": {"executor": "process", "profile_every": 1}}
+        worker = Worker(JobQueue(), self.job_store, TASKS, task_options)
+        bill = {"user_id": "user_1", "billing_period": "2026-01", "subscription_plan": "prime", "base_price": 14.99,
+                "purchases": [{"item_id": "movie_001", "price": 3.99}]}
+
+        sums = self.run_jobs(worker, "sum", [{"numbers": [i, 1]} for i in range(6)])
+        [billed] = self.run_jobs(worker, "generate_monthly_bill", [bill])
+
+        self.assertEqual([job["result"] for job in sums], [f"Sum is {i}" for i in range(1, 7)])
+        self.assertEqual(billed["result"]["total_charge"], 18.98)
+        self.assertEqual(TASK_PROFILES.runs("sum"), 3)
+        self.assertEqual(TASK_PROFILES.runs("generate_monthly_bill"), 1)
+        report = TASK_PROFILES.report("generate_monthly_bill")
+        self.assertTrue(report.startswith("generate_monthly_bill: 1 profiled executions"))
+        self.assertIn("(generate_monthly_bill)", report)
+        self.assertIn("(sum_task)", TASK_PROFILES.report())
+
+
+class TestPersistentJobStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.wal_path = os.path.join(self.tmp_dir.name, "jobs.wal")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def open_store(self):
+        journal = WriteAheadLog(self.wal_path)
+        job_store = JobStore(journal=journal)
+        return job_store, journal, job_store.recover()
+
+    def test_recovery_restores_jobs_and_requeues_unfinished(self):
+        job_store, journal, _ = self.open_store()
+        done_id = job_store.create_job("sum", {"numbers": [1]}, client_job_id="billing-user_1-2026-01")
+        running_id = job_store.create_job("sum", {"numbers": [2]})
+        pending_id = job_store.create_job("sum", {"numbers": [3]})
+        job_store.update_job_status(done_id, "success", result="Sum is 1")
+        job_store.update_job_status(running_id, "running")
+        job_store.increment_attempts(running_id)
+        journal.close()
+
+        job_store, journal, recovered = self.open_store()
+
+        self.assertEqual(recovered, [(running_id, 0, None, None, "sum"), (pending_id, 0, None, None, "sum")])
+        self.assertEqual(job_store.get_job(done_id)["result"], "Sum is 1")
+        self.assertEqual(job_store.get_job(running_id)["status"], "pending")
+        self.assertEqual(job_store.get_job(running_id)["attempts"], 1)
+        self.assertEqual(job_store.create_job("sum", {"numbers": [1]}, client_job_id="billing-user_1-2026-01"), done_id)
+        journal.close()
+
+    def test_recovery_keeps_retry_backoff(self):
+        job_store, journal, _ = self.open_store()
+        job_id = job_store.create_job("fail", {}, max_retries=3)
+        job_store.start_job(job_id)
+        retry_at = time.time() + 60
+        job_store.fail_attempt(job_id, "This task always fails!", retry_at=retry_at)
+        journal.close()
+
+        job_store, journal, recovered = self.open_store()
+
+        self.assertEqual(recovered, [(job_id, 0, None, retry_at, "fail")])
+        self.assertEqual(job_store.get_job(job_id)["attempts"], 1)
+        journal.close()
+
+    def test_write_failure_is_raised_to_waiters(self):
+        class FullDisk:
+            def write(self, data):
+                raise OSError(28, "No space left on device")
+
+            def close(self):
+                pass
+
+        journal = WriteAheadLog(self.wal_path)
+        journal.wait_durable(journal.append({"op": "create"}))
+        journal._file.close()
+        journal._file = FullDisk()
+
+        seq = journal.append({"op": "update"})
+        with self.assertRaises(OSError):
+            journal.wait_durable(seq)
+        with self.assertRaises(OSError):
+            journal.wait_durable(journal.append({"op": "update"}))
+        journal.close()
+
+    def test_recovery_rebuilds_dependencies(self):
+        job_store, journal, _ = self.open_store()
+        done = job_store.create_job("sum", {"numbers": [1]})
+        running = job_store.create_job("sum", {"numbers": [2]})
+        ready = job_store.create_job("sum", {"numbers": [3]}, depends_on=[done])
+        waiting = job_store.create_job("sum", {"numbers": [4]}, depends_on=[done, running])
+        job_store.update_job_status(done, "success", result="Sum is 1")
+        journal.close()
+
+        job_store, journal, recovered = self.open_store()
+        released = []
+        job_store.set_ready_callback(released.extend)
+
+        self.assertEqual([entry[0] for entry in recovered], [running, ready])
+        self.assertEqual(job_store.get_job(waiting)["status"], "blocked")
+        job_store.update_job_status(running, "success", result="Sum is 2")
+        self.assertEqual(released, [(waiting, 0, None, None, "sum")])
+        journal.close()
+
+    def test_recovery_links_dependencies_before_evicting_parents(self):
+        journal = WriteAheadLog(self.wal_path)
+        job_store = JobStore(journal=journal, max_retained_jobs=2, num_shards=1)
+        job_store.recover()
+        parent = job_store.create_job("sum", {"numbers": [1]})
+        running = job_store.create_job("sum", {"numbers": [2]})
+        child = job_store.create_job("sum", {"numbers": [3]}, depends_on=[parent, running])
+        job_store.update_job_status(parent, "success", result="Sum is 1")
+        for n in range(2):
+            job_store.update_job_status(job_store.create_job("sum", {"numbers": [n]}), "success", result=f"Sum is {n}")
+        journal.close()
+
+        journal = WriteAheadLog(self.wal_path)
+        job_store = JobStore(journal=journal, max_retained_jobs=2, num_shards=1)
+        job_store.recover()
+        released = []
+        job_store.set_ready_callback(released.extend)
+
+        self.assertEqual(job_store.get_job(child)["status"], "blocked")
+        job_store.update_job_status(running, "success", result="Sum is 2")
+        self.assertEqual(released, [(child, 0, None, None, "sum")])
+        journal.close()
+
+    def test_recovery_ignores_torn_tail_record(self):
+        job_store, journal, _ = self.open_store()
+        job_id = job_store.create_job("sum", {"numbers": [1]})
+        journal.close()
+        with open(self.wal_path, "ab") as f:
+            f.write(b"\x40\x00\x00\x00partial")
+
+        job_store, journal, recovered = self.open_store()
+        job_store.create_job("sum", {"numbers": [2]})
+        journal.close()
+
+        job_store, journal, recovered = self.open_store()
+        self.assertEqual(len(recovered), 2)
+        self.assertEqual(recovered[0][0], job_id)
+        journal.close()
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file